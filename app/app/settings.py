@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "core.apps.CoreConfig",
@@ -33,11 +35,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,9 +84,38 @@ DATABASES = {
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        # Keep connections open across requests instead of reconnecting
+        # each time, and ping them before reuse so a connection dropped
+        # by the server is replaced (see core.signals).
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
     }    
 }
 
+# A read replica of the primary, used by core.routers when DB_REPLICA_HOST
+# is set. Pointing it at the primary's host tests the routing locally.
+DATABASES["replica"] = dict(
+    DATABASES["default"],
+    HOST=os.environ.get("DB_REPLICA_HOST", DATABASES["default"]["HOST"]),
+    OPTIONS={"connect_timeout": 2},
+    TEST={"MIRROR": "default"},
+)
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+# "default" lives in each worker process's memory. "shared" is stored in
+# the primary database, so every worker process sees the same entries;
+# create its table with the createcachetable command.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "core_shared_cache",
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -126,3 +159,82 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = "/vol/web/media/"
 
 AUTH_USER_MODEL = "core.User"
+
+# Token to user resolutions cached by core.authentication. SHARED_CACHE
+# names an entry of CACHES shared by every worker process. Without it each
+# process caches tokens on its own and never sees the other processes'
+# invalidations, so a deleted token or deactivated user keeps working for
+# up to LOCAL_TTL seconds there, in place of TTL.
+TOKEN_CACHE = {
+    "MAX_SIZE": 10000,
+    "TTL": 60,
+    "LOCAL_TTL": 5,
+    "SHARED_CACHE": None,
+}
+
+# Per-user tag and ingredient lists cached by recipe.caching. ALIAS must
+# name a cache shared by every worker process in production.
+LIST_CACHE = {
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+# Background resizing of uploaded recipe images by core.images. EAGER
+# processes images in the request instead of the worker pool.
+IMAGE_PIPELINE = {
+    "WORKERS": 2,
+    "EAGER": False,
+}
+
+# In memory recipe ingredient indexes of recipe.pantry. EAGER builds an
+# index in the request instead of answering with a query meanwhile.
+PANTRY_INDEX = {
+    "MAX_USERS": 1000,
+    "EAGER": False,
+}
+
+# Nearest recipes precomputed by recipe.similarity, K per recipe. EAGER
+# refreshes them in the request instead of a background thread.
+SIMILAR_RECIPES = {
+    "K": 10,
+    "TAG_WEIGHT": 1.0,
+    "INGREDIENT_WEIGHT": 2.0,
+    "EAGER": False,
+}
+
+# Per request timings of core.middleware, sent as a Server-Timing header
+# and recorded in core.metrics. Requests whose slowest statement takes
+# SLOW_QUERY_MS or more log their SLOW_QUERIES slowest with call sites.
+REQUEST_TIMING = {
+    "SERVER_TIMING": True,
+    "SLOW_QUERIES": 5,
+    "SLOW_QUERY_MS": 100,
+}
+
+# Counters and histograms served at /metrics, to be kept internal. Each
+# worker process writes its totals to a file in DIR, which the
+# clear_metrics command empties before the server starts.
+METRICS = {
+    "DIR": os.environ.get(
+        "METRICS_DIR", os.path.join(tempfile.gettempdir(), "app-metrics")
+    ),
+    "FLUSH_INTERVAL": 1.0,
+}
+
+# Reads of safe requests served by core.routers from the healthy REPLICAS.
+# A user's reads stay on the primary for PIN_SECONDS after they write, so
+# keep it above MAX_LAG_SECONDS plus CHECK_INTERVAL. CACHE_ALIAS holds the
+# pins and must name a cache shared by every worker process, the system
+# checks refuse a per process LocMemCache while REPLICAS are set.
+REPLICA_ROUTING = {
+    "REPLICAS": ["replica"] if os.environ.get("DB_REPLICA_HOST") else [],
+    "PIN_SECONDS": 10,
+    "MAX_LAG_SECONDS": 1,
+    "CHECK_INTERVAL": 5,
+    "CACHE_ALIAS": "shared",
+}
+
+REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
+}
@@ -3,8 +3,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 
+from core.metrics import metrics_view
+
 urlpatterns = [
     path("api/recipe/", include("recipe.urls", namespace="recipe")),
     path("api/user/", include("users.urls", namespace="user")),
     path('admin/', admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,135 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import registry
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """Bounded LRU mapping token keys to their (user, token) pair
+
+    Entries expire after `ttl` seconds. When `shared` names a cache in
+    CACHES, the resolved tokens are kept there instead, with no tier in
+    process, so a token deleted or a user deactivated by one worker
+    process is invalidated in every other one at once.
+    """
+
+    key_prefix = "token-auth"
+
+    def __init__(self, max_size=10000, ttl=60, shared=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _shared_cache(self):
+        return caches[self.shared] if self.shared else None
+
+    def _shared_key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def _store(self, key, value):
+        if self.max_size <= 0 or self.shared:
+            return
+
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl, value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value of the key or None"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        shared = self._shared_cache()
+        if shared is not None:
+            return shared.get(self._shared_key(key))
+
+        return None
+
+    def set(self, key, value):
+        """Cache the value of the key in every tier"""
+
+        self._store(key, value)
+
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.set(self._shared_key(key), value, self.ttl)
+
+    def delete(self, key):
+        """Remove the key from every tier"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.delete(self._shared_key(key))
+
+    def clear(self):
+        """Empty the in-process tier"""
+
+        with self._lock:
+            self._entries.clear()
+
+
+def token_cache_from_settings():
+    """Build the token cache configured by the TOKEN_CACHE setting
+
+    Without a shared cache the other processes never see a revoked token
+    invalidated, so entries only live for LOCAL_TTL seconds at most.
+    """
+
+    config = getattr(settings, "TOKEN_CACHE", {})
+    shared = config.get("SHARED_CACHE")
+    ttl = config.get("TTL", 60)
+    if not shared:
+        ttl = min(ttl, config.get("LOCAL_TTL", 5))
+
+    return TokenCache(
+        max_size=config.get("MAX_SIZE", 10000),
+        ttl=ttl,
+        shared=shared,
+    )
+
+
+token_cache = token_cache_from_settings()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches which user a token belongs to
+
+    Only valid tokens of active users are cached. Deleting a token or
+    saving its user invalidates it through the signals in core.signals.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        registry.inc(
+            "cache_requests_total", cache="token",
+            result="miss" if cached is None else "hit",
+        )
+
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+
+        user, token = cached
+        # Requests must not see each other's changes to the user
+        return copy.copy(user), token
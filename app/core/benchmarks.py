@@ -0,0 +1,246 @@
+import io
+import math
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.test import Client
+
+from .models import Tag, Ingredient, Recipe
+
+WORDS = (
+    "tomato", "onion", "garlic", "ginger", "paneer", "rice", "lentil",
+    "potato", "spinach", "chilli", "butter", "cream", "yogurt", "mango",
+    "coconut", "chicken", "egg", "flour", "sugar", "cumin", "coriander",
+    "mint", "lemon", "cheese", "mushroom", "pepper", "bread", "noodle",
+    "corn", "pea", "carrot", "cabbage", "honey", "almond", "cashew",
+)
+STYLES = (
+    "spicy", "sweet", "tangy", "crispy", "creamy", "smoky", "baked",
+    "fried", "roasted", "stuffed", "grilled", "steamed", "masala",
+)
+DISHES = (
+    "curry", "soup", "salad", "pie", "stew", "cake", "sandwich", "pasta",
+    "biryani", "pulao", "paratha", "tikka", "kabab", "halwa", "chaat",
+)
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back"""
+
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def allowed_host():
+    """Return a host name the requests to this process may be sent to"""
+
+    # DEBUG only allows localhost when ALLOWED_HOSTS is empty
+    hosts = [
+        host for host in settings.ALLOWED_HOSTS
+        if host != "*" and not host.startswith(".")
+    ]
+    return hosts[0] if hosts else "localhost"
+
+
+def token_client(token):
+    """Return a test client sending the token on every request"""
+
+    return Client(
+        HTTP_HOST=allowed_host(),
+        HTTP_AUTHORIZATION=f"Token {token.key}",
+    )
+
+
+def timed(func, repeat=5):
+    """Call func repeat times and return the median wall time in seconds"""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings)
+
+
+def analyze():
+    """Refresh the planner statistics after seeding on Postgres"""
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+def percentile(values, percent):
+    """Return the nearest rank percentile of the values"""
+
+    values = sorted(values)
+    rank = math.ceil(len(values) * percent / 100)
+    return values[max(rank, 1) - 1]
+
+
+def copy_value(value):
+    """Return a value in the text format of COPY"""
+
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t")\
+        .replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_create(model, objs):
+    """Insert the unsaved objects, with COPY on Postgres
+
+    COPY can't return the IDs of the rows, so they are taken from the
+    table's sequence first and sent with the rows.
+    """
+
+    objs = list(objs)
+    if connection.vendor != "postgresql" or not objs:
+        return model.objects.bulk_create(objs)
+
+    opts = model._meta
+    fields = opts.concrete_fields
+    quote = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        if isinstance(opts.pk, models.AutoField):
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, %s)) "
+                "FROM generate_series(1, %s)",
+                [opts.db_table, opts.pk.column, len(objs)]
+            )
+            for obj, (pk,) in zip(objs, cursor.fetchall()):
+                obj.pk = pk
+
+        rows = io.StringIO()
+        for obj in objs:
+            rows.write("\t".join(
+                copy_value(field.get_db_prep_save(
+                    field.pre_save(obj, True), connection
+                ))
+                for field in fields
+            ) + "\n")
+        rows.seek(0)
+
+        columns = ", ".join(quote(field.column) for field in fields)
+        cursor.copy_expert(
+            f"COPY {quote(opts.db_table)} ({columns}) FROM STDIN", rows
+        )
+
+    return objs
+
+
+def zipf_weights(size):
+    """Return weights making the first items the most popular"""
+
+    return [1 / rank for rank in range(1, size + 1)]
+
+
+def pick(rng, population, weights, k):
+    """Pick k distinct items with the given popularity weights"""
+
+    k = min(k, len(population))
+    picked = set()
+    while len(picked) < k:
+        picked.update(rng.choices(population, weights, k=k - len(picked)))
+
+    return picked
+
+
+def recipe_title(rng):
+    """Return a random but plausible recipe title"""
+
+    return " ".join((
+        rng.choice(STYLES), rng.choice(WORDS), rng.choice(DISHES)
+    )).title()
+
+
+def around(rng, mean, vary):
+    """Return the mean, or a count drawn around it when varying"""
+
+    return round(rng.triangular(0, 2 * mean, mean)) if vary else mean
+
+
+def seed_library(user, recipes, tags=50, ingredients=200, tags_per_recipe=3,
+                 ingredients_per_recipe=8, batch_size=5000, seed=None,
+                 vary=False, analyze_early=True):
+    """Bulk insert a library of recipes for the user
+
+    Tags and ingredients are picked with a long tail popularity so a few
+    of them are linked to most recipes, like in a real library. `vary`
+    draws each recipe's number of tags and ingredients, price and time
+    around typical values instead of evenly. Returns the IDs of the
+    created tags, ingredients and recipes.
+    """
+
+    rng = random.Random(seed)
+
+    tag_ids = [tag.id for tag in copy_create(Tag, (
+        Tag(user=user, name=f"{rng.choice(STYLES).title()} {i}")
+        for i in range(tags)
+    ))]
+    ingredient_ids = [ingredient.id for ingredient in copy_create(
+        Ingredient, (
+            Ingredient(user=user, name=f"{rng.choice(WORDS).title()} {i}")
+            for i in range(ingredients)
+        )
+    )]
+    tag_weights = zipf_weights(len(tag_ids))
+    ingredient_weights = zipf_weights(len(ingredient_ids))
+
+    RecipeTag = Recipe.tags.through
+    RecipeIngredient = Recipe.ingredients.through
+    recipe_ids = []
+
+    for start in range(0, recipes, batch_size):
+        created = copy_create(Recipe, (
+            Recipe(
+                user=user,
+                title=recipe_title(rng),
+                time_minutes=min(
+                    round(rng.lognormvariate(math.log(35), 0.6)) + 5, 600
+                ) if vary else rng.randint(5, 180),
+                price=min(
+                    round(rng.lognormvariate(math.log(40), 0.8), 2), 9999
+                ) if vary else round(rng.uniform(1, 500), 2),
+            )
+            for _ in range(min(batch_size, recipes - start))
+        ))
+
+        tag_links = []
+        ingredient_links = []
+        for recipe in created:
+            recipe_ids.append(recipe.id)
+            tag_links.extend(
+                RecipeTag(recipe_id=recipe.id, tag_id=tag_id)
+                for tag_id in pick(
+                    rng, tag_ids, tag_weights,
+                    around(rng, tags_per_recipe, vary)
+                )
+            )
+            ingredient_links.extend(
+                RecipeIngredient(recipe_id=recipe.id, ingredient_id=i_id)
+                for i_id in pick(
+                    rng, ingredient_ids, ingredient_weights,
+                    around(rng, ingredients_per_recipe, vary)
+                )
+            )
+
+        copy_create(RecipeTag, tag_links)
+        copy_create(RecipeIngredient, ingredient_links)
+
+        if not start and analyze_early:
+            # Fresh tables have no statistics, which makes the planner
+            # nest loops in the search triggers of the following batches
+            analyze()
+
+    return tag_ids, ingredient_ids, recipe_ids
@@ -0,0 +1,28 @@
+from .routers import replica_aliases, routing_settings
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """Refuse replicas while the users' pins aren't shared by workers
+
+    Another worker process wouldn't see the pin of a user who just wrote,
+    and would serve their next read from a replica that lags behind.
+    """
+
+    if not replica_aliases():
+        return []
+
+    alias = routing_settings().get("CACHE_ALIAS", "default")
+    if isinstance(caches[alias], LocMemCache):
+        return [Error(
+            f"REPLICA_ROUTING keeps its pins in the {alias!r} cache, which "
+            "isn't shared between worker processes.",
+            hint="Set CACHE_ALIAS to a cache every worker process shares, "
+                 "like a database or memcached cache.",
+            id="core.E001",
+        )]
+    return []
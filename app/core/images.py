@@ -0,0 +1,125 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Largest first, so each rendition is resized from the previous one
+RENDITIONS = (
+    ("image_medium", (800, 800)),
+    ("image_thumbnail", (200, 200)),
+)
+
+if features.check("webp"):
+    RENDITION_FORMAT, RENDITION_EXT = "WEBP", "webp"
+else:
+    RENDITION_FORMAT, RENDITION_EXT = "JPEG", "jpg"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pipeline_settings():
+    return getattr(settings, "IMAGE_PIPELINE", {})
+
+
+def get_executor():
+    """Return the worker pool, starting it on first use
+
+    Starting it lazily keeps forking WSGI servers from sharing a pool
+    created in the parent process.
+    """
+
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=pipeline_settings().get("WORKERS", 2),
+                thread_name_prefix="recipe-images",
+            )
+    return _executor
+
+
+def render(image, size):
+    """Return the image shrunk to fit in size, encoded as a rendition"""
+
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, RENDITION_FORMAT, quality=80)
+
+    return buffer.getvalue()
+
+
+def process_recipe_image(recipe_id):
+    """Decode the recipe's image once and store its resized renditions
+
+    The result is only written if the recipe still has the same image, so
+    a slow job can't overwrite the renditions of a newer upload.
+    """
+
+    try:
+        recipe = Recipe.objects.only("id", "image").get(pk=recipe_id)
+    except Recipe.DoesNotExist:
+        return
+    if not recipe.image:
+        return
+
+    renditions = {}
+    try:
+        with recipe.image.open("rb") as image_file:
+            image = Image.open(image_file)
+            # Let JPEGs decode straight at a reduced scale
+            image.draft("RGB", RENDITIONS[0][1])
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+        for field, size in RENDITIONS:
+            content = ContentFile(render(image, size))
+            field_file = getattr(recipe, field)
+            field_file.save(f"{field}.{RENDITION_EXT}", content, save=False)
+            renditions[field] = field_file.name
+        status = Recipe.IMAGE_READY
+    except Exception:
+        # Broken files fail in many ways besides OSError, e.g. SyntaxError
+        # for PNGs or KeyError from malformed EXIF, none may leave the
+        # recipe pending
+        logger.exception("Failed to process image of recipe %s", recipe_id)
+        status = Recipe.IMAGE_FAILED
+
+    Recipe.objects.filter(pk=recipe_id, image=recipe.image.name)\
+        .update(image_status=status, **renditions)
+
+
+def _run(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        # The pool's futures are never read, so nothing else would log it
+        logger.exception("Failed to store image of recipe %s", recipe_id)
+    finally:
+        # Worker threads hold their own connection, don't leak it
+        connection.close()
+
+
+def schedule_recipe_image(recipe_id):
+    """Process the recipe image in the background once committed
+
+    With IMAGE_PIPELINE["EAGER"] set the image is processed right away,
+    which is what tests and single process setups want.
+    """
+
+    if pipeline_settings().get("EAGER", False):
+        process_recipe_image(recipe_id)
+        return
+
+    transaction.on_commit(lambda: get_executor().submit(_run, recipe_id))
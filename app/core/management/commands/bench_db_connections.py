@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+
+from core.benchmarks import timed
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.signals import request_started, request_finished
+from django.db import connections
+
+
+@contextmanager
+def connection_settings(conn, **overrides):
+    """Reconnect with the settings overridden, restoring them on exit"""
+
+    saved = {key: conn.settings_dict.get(key) for key in overrides}
+    conn.close()
+    conn.settings_dict.update(overrides)
+    try:
+        yield
+    finally:
+        conn.close()
+        conn.settings_dict.update(saved)
+
+
+class Command(BaseCommand):
+    """Compare per request latency of fresh and persistent connections"""
+
+    help = "Benchmark reconnecting against reusing database connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **options):
+        conn = connections[options["database"]]
+        users = get_user_model().objects.using(options["database"])
+
+        def request():
+            # The same signals a real request sends, so Django closes
+            # and health checks connections exactly as it does in service
+            request_started.send(sender=self.__class__)
+            users.filter(pk=0).exists()
+            request_finished.send(sender=self.__class__)
+
+        modes = (
+            ("reconnect", {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False}),
+            ("persistent", {"CONN_MAX_AGE": None,
+                            "CONN_HEALTH_CHECKS": False}),
+            ("health checked", {"CONN_MAX_AGE": None,
+                                "CONN_HEALTH_CHECKS": True}),
+        )
+
+        baseline = None
+        for name, overrides in modes:
+            with connection_settings(conn, **overrides):
+                request()
+                seconds = timed(request, options["requests"])
+
+            baseline = baseline or seconds
+            self.stdout.write(
+                f"{name:<16}{seconds * 1000:>10.2f} ms/request"
+                f"{(baseline - seconds) * 1000:>10.2f} ms saved"
+            )
@@ -0,0 +1,57 @@
+import random
+import time
+
+from core.benchmarks import rolled_back, timed, analyze, seed_library
+from recipe.pantry import PantryIndex, rank_recipes_sql
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Compare ranking a pantry with the in memory index and with SQL"""
+
+    help = "Benchmark the pantry index against its SQL fallback"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=5000)
+        parser.add_argument("--ingredients", type=int, default=200)
+        parser.add_argument("--pantry", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = get_user_model().objects.create_user(
+                email="bench@django.com",
+                password="django123",
+            )
+            _, ingredient_ids, _ = seed_library(
+                user,
+                recipes=options["recipes"],
+                ingredients=options["ingredients"],
+                seed=0,
+            )
+            analyze()
+
+            start = time.perf_counter()
+            index = PantryIndex.build(user.pk)
+            build = time.perf_counter() - start
+
+            pantry = random.Random(0).sample(
+                ingredient_ids, min(options["pantry"], len(ingredient_ids))
+            )
+            limit = options["limit"]
+            timings = (
+                ("index build", build),
+                ("index rank", timed(
+                    lambda: index.rank(pantry, limit), options["repeat"]
+                )),
+                ("sql rank", timed(
+                    lambda: rank_recipes_sql(user.pk, pantry, limit),
+                    options["repeat"]
+                )),
+            )
+
+            for name, seconds in timings:
+                self.stdout.write(f"{name:<16}{seconds * 1000:>10.2f} ms")
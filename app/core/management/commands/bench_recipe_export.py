@@ -0,0 +1,64 @@
+import time
+import tracemalloc
+
+from core.benchmarks import rolled_back, seed_library, analyze, token_client
+from core.models import Recipe
+from recipe.serializers import RecipeSerializer
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+
+def measure(func):
+    """Return the seconds func took and the peak memory it allocated"""
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size, seconds, peak
+
+
+class Command(BaseCommand):
+    """Compare peak memory of rendering and streaming a recipe export"""
+
+    help = "Benchmark memory of the streaming recipe export"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = get_user_model().objects.create_user(
+                email="bench@django.com",
+                password="django123",
+            )
+            seed_library(user, recipes=options["recipes"], seed=0)
+            analyze()
+            client = token_client(Token.objects.create(user=user))
+            url = reverse("recipe:recipe-export")
+
+            def render():
+                # What listing every recipe in one response costs
+                recipes = Recipe.objects.filter(user=user)\
+                    .order_by("-id").prefetch_related_ids()
+                data = RecipeSerializer(recipes, many=True).data
+                return len(JSONRenderer().render(data))
+
+            def stream():
+                res = client.get(url, {"output": "ndjson"})
+                return sum(len(chunk) for chunk in res.streaming_content)
+
+            for name, func in (("rendered", render), ("streamed", stream)):
+                size, seconds, peak = measure(func)
+                self.stdout.write(
+                    f"{name:<10}{size / 2 ** 20:>10.1f} MiB output"
+                    f"{peak / 2 ** 20:>10.1f} MiB peak{seconds:>8.1f} s"
+                )
@@ -0,0 +1,61 @@
+from core.benchmarks import rolled_back, timed, analyze, seed_library
+from core.models import Recipe
+from recipe.filters import filter_linked, MATCH_ALL
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Compare the join and semi-join plans for filtering recipes by tag"""
+
+    help = "Benchmark filtering recipes by tags on a throwaway library"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100000)
+        parser.add_argument("--tags", type=int, default=100)
+        parser.add_argument("--tags-per-recipe", type=int, default=10)
+        parser.add_argument("--filter-ids", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = get_user_model().objects.create_user(
+                email="bench@django.com",
+                password="django123",
+            )
+            self.stdout.write(
+                f"Seeding {options['recipes']} recipes with "
+                f"{options['recipes'] * options['tags_per_recipe']} tag links"
+            )
+            tag_ids, _, _ = seed_library(
+                user,
+                recipes=options["recipes"],
+                tags=options["tags"],
+                tags_per_recipe=options["tags_per_recipe"],
+                ingredients=1,
+                ingredients_per_recipe=0,
+                seed=0,
+            )
+            analyze()
+
+            ids = tag_ids[:options["filter_ids"]]
+            recipes = Recipe.objects.filter(user=user)
+            joined = recipes.filter(tags__id__in=ids)
+            plans = (
+                ("join", joined),
+                ("join distinct", joined.distinct()),
+                ("semi-join any", filter_linked(recipes, "tags", ids)),
+                ("semi-join all",
+                 filter_linked(recipes, "tags", ids, MATCH_ALL)),
+            )
+
+            for name, queryset in plans:
+                rows = [row[0] for row in queryset.values_list()]
+                seconds = timed(
+                    lambda: list(queryset.values_list()), options["repeat"]
+                )
+                self.stdout.write(
+                    f"{name:<16}{len(rows):>10} rows"
+                    f"{len(set(rows)):>10} unique{seconds * 1000:>10.1f} ms"
+                )
@@ -0,0 +1,49 @@
+from core.benchmarks import rolled_back, timed, analyze, seed_library
+from core.models import Recipe
+from recipe.filters import search_recipes
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+QUERIES = ("spicy curry", "creamy paneer soup", "tomato", "biriyani")
+
+
+class Command(BaseCommand):
+    """Time the first page of recipe searches as libraries grow"""
+
+    help = "Benchmark full-text recipe search on throwaway libraries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+        )
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            libraries = []
+            for i, size in enumerate(options["sizes"]):
+                user = get_user_model().objects.create_user(
+                    email=f"bench{i}@django.com",
+                    password="django123",
+                )
+                self.stdout.write(f"Seeding {size} recipes")
+                seed_library(user, recipes=size, seed=i)
+                libraries.append((size, user))
+            analyze()
+
+            for text in QUERIES:
+                for size, user in libraries:
+                    recipes = search_recipes(
+                        Recipe.objects.filter(user=user), text
+                    )
+                    page = recipes.values_list("id")[:options["page_size"]]
+                    seconds = timed(
+                        lambda: list(page.all()), options["repeat"]
+                    )
+                    self.stdout.write(
+                        f"{text:<20}{size:>10} recipes"
+                        f"{recipes.count():>10} matches"
+                        f"{seconds * 1000:>10.1f} ms"
+                    )
@@ -0,0 +1,61 @@
+from core.benchmarks import rolled_back, timed, analyze, seed_library
+from core.models import Tag, Ingredient, Recipe
+from recipe.fast import compile_plan
+from recipe.serializers import TagSerializer, IngredientSerializer,\
+    RecipeSerializer, RecipeDetailSerializer
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Compare DRF serializers with their FastPlan on a page of rows"""
+
+    help = "Benchmark the fast serializer path against the DRF serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+
+        with rolled_back():
+            user = get_user_model().objects.create_user(
+                email="bench@django.com",
+                password="django123",
+            )
+            seed_library(
+                user, recipes=rows, tags=rows, ingredients=rows, seed=0
+            )
+            analyze()
+
+            recipes = Recipe.objects.filter(user=user).order_by("-id")
+            cases = (
+                ("tags", TagSerializer,
+                 Tag.objects.filter(user=user).order_by("-name", "-id")),
+                ("ingredients", IngredientSerializer,
+                 Ingredient.objects.filter(user=user)
+                 .order_by("-name", "-id")),
+                ("recipes", RecipeSerializer,
+                 recipes.prefetch_related_ids()),
+                ("recipe details", RecipeDetailSerializer,
+                 recipes.prefetch_related_names()),
+            )
+
+            for name, serializer_class, queryset in cases:
+                plan = compile_plan(serializer_class)
+                queryset = queryset[:rows]
+
+                drf = timed(
+                    lambda: serializer_class(queryset.all(), many=True).data,
+                    options["repeat"]
+                )
+                fast = timed(
+                    lambda: plan.serialize(plan.values(queryset)),
+                    options["repeat"]
+                )
+                self.stdout.write(
+                    f"{name:<16}{drf * 1000:>10.1f} ms drf"
+                    f"{fast * 1000:>10.1f} ms fast{drf / fast:>8.1f}x"
+                )
@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+
+from core.authentication import token_cache
+from core.benchmarks import rolled_back, token_client
+from recipe.views import RecipeViewSet
+from users.views import ManageUserView
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+VIEWS = ManageUserView, RecipeViewSet
+
+
+@contextmanager
+def authenticated_by(classes):
+    """Temporarily swap the authentication classes of the views"""
+
+    saved = [view.authentication_classes for view in VIEWS]
+    for view in VIEWS:
+        view.authentication_classes = classes
+    try:
+        yield
+    finally:
+        for view, classes in zip(VIEWS, saved):
+            view.authentication_classes = classes
+
+
+class Command(BaseCommand):
+    """Compare throughput of token authentication with and without cache"""
+
+    help = "Benchmark requests/sec with the cached token authentication"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def run(self, client, url, requests):
+        """Send the requests and return requests/sec and queries/request"""
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get(url)
+            seconds = time.perf_counter() - start
+
+        return requests / seconds, len(queries) / requests
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = get_user_model().objects.create_user(
+                email="bench@django.com",
+                password="django123",
+            )
+            token = Token.objects.create(user=user)
+            client = token_client(token)
+            urls = reverse("user:me"), reverse("recipe:recipe-list")
+
+            for url in urls:
+                with authenticated_by((TokenAuthentication,)):
+                    rps, queries = self.run(client, url, options["requests"])
+                self.stdout.write(
+                    f"{url:<24}{'uncached':<10}{rps:>10.0f} req/s"
+                    f"{queries:>8.2f} queries/req"
+                )
+
+                token_cache.clear()
+                rps, queries = self.run(client, url, options["requests"])
+                self.stdout.write(
+                    f"{url:<24}{'cached':<10}{rps:>10.0f} req/s"
+                    f"{queries:>8.2f} queries/req"
+                )
@@ -0,0 +1,14 @@
+from core.metrics import registry
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to forget the metrics of previous server runs"""
+
+    help = "Empty the metrics directory, to be run before the server starts"
+
+    def handle(self, *args, **kwargs):
+        registry.clear()
+
+        self.stdout.write(self.style.SUCCESS("Metrics cleared"))
@@ -0,0 +1,344 @@
+import io
+import json
+import random
+import re
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from core.benchmarks import allowed_host, percentile, recipe_title
+from core.models import Tag, Recipe
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.urls import reverse
+
+from PIL import Image
+
+SCENARIOS = "list", "filter", "detail", "create", "upload-image", "token"
+QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """Serve requests from a fixed pool of threads, like a threaded worker
+
+    Unlike runserver's thread per request, the threads keep their
+    database connections between requests as they do in production.
+    """
+
+    def __init__(self, *args, workers, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # One task per thread so every thread closes its connections
+        barrier = threading.Barrier(self.workers)
+
+        def close():
+            connections.close_all()
+            barrier.wait()
+
+        for _ in range(self.workers):
+            self.pool.submit(close)
+        self.pool.shutdown()
+
+
+def png():
+    """Return a small PNG image to upload"""
+
+    image = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 80, 40)).save(image, format="PNG")
+    return image.getvalue()
+
+
+def multipart(name, filename, content, content_type):
+    """Return a multipart/form-data body with one file and its type"""
+
+    boundary = uuid.uuid4().hex
+    body = b"".join((
+        f"--{boundary}\r\n".encode(),
+        f'Content-Disposition: form-data; name="{name}"; '
+        f'filename="{filename}"\r\n'.encode(),
+        f"Content-Type: {content_type}\r\n\r\n".encode(),
+        content,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ))
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Command(BaseCommand):
+    """Load test the API endpoints with concurrent clients
+
+    Drives a server sharing this database, the given --url or one started
+    in process, as the users of seed_data. Queries per request are read
+    from the Server-Timing header of core.middleware.
+    """
+
+    help = "Report throughput, latency percentiles and queries per request"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", help="Server to load, by default one started here",
+        )
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--password", default="seed-password")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument(
+            "--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS,
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--save-baseline", metavar="PATH")
+        parser.add_argument("--baseline", metavar="PATH")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Fraction a result may be worse than the baseline",
+        )
+
+    def send(self, method, path, token=None, body=None, content_type=None):
+        """Send a request and return its time, status and query count"""
+
+        headers = dict(self.headers)
+        if token is not None:
+            headers["Authorization"] = f"Token {token}"
+        if content_type is not None:
+            headers["Content-Type"] = content_type
+        request = Request(
+            self.url + path, data=body, headers=headers, method=method
+        )
+
+        start = time.perf_counter()
+        try:
+            with urlopen(request) as response:
+                response.read()
+        except HTTPError as error:
+            response = error
+            error.read()
+        seconds = time.perf_counter() - start
+
+        match = QUERIES.search(response.headers.get("Server-Timing", ""))
+        queries = int(match.group(1)) if match else None
+        return seconds, response.getcode(), queries
+
+    def login(self, email):
+        """Return the token of the user from the token endpoint"""
+
+        body = urlencode({"email": email, "password": self.password})
+        request = Request(
+            self.url + reverse("user:token"), data=body.encode(),
+            headers=self.headers, method="POST",
+        )
+        try:
+            with urlopen(request) as response:
+                return json.load(response)["token"]
+        except HTTPError as error:
+            raise CommandError(
+                f"Couldn't log in as {email}: {error.read().decode()}"
+            )
+
+    def clients(self, count, prefix):
+        """Return the seeded users with their tokens, tags and recipes"""
+
+        users = get_user_model().objects\
+            .filter(email__startswith=f"{prefix}-")\
+            .order_by("id")[:count]
+        clients = []
+
+        for user in users:
+            recipe_ids = list(Recipe.objects.filter(user=user)
+                              .values_list("id", flat=True)[:100])
+            tag_ids = list(Tag.objects.filter(user=user)
+                           .values_list("id", flat=True)[:20])
+            if recipe_ids and tag_ids:
+                clients.append({
+                    "email": user.email,
+                    "token": self.login(user.email),
+                    "recipe_ids": recipe_ids,
+                    "tag_ids": tag_ids,
+                })
+
+        if not clients:
+            raise CommandError(
+                f"No users with recipes and tags, run seed_data --prefix "
+                f"{prefix} first"
+            )
+        return clients
+
+    def build(self, name, rng, client):
+        """Return the arguments of send for a request of the scenario"""
+
+        token = client["token"]
+        recipes = reverse("recipe:recipe-list")
+        recipe_id = rng.choice(client["recipe_ids"])
+
+        if name == "list":
+            return "GET", recipes, token
+        if name == "filter":
+            params = urlencode({
+                "tags": rng.choice(client["tag_ids"]),
+                "price_max": rng.choice((10, 50, 200)),
+                "ordering": rng.choice(("price", "-time_minutes", "title")),
+            })
+            return "GET", f"{recipes}?{params}", token
+        if name == "detail":
+            return "GET", reverse("recipe:recipe-detail", args=[recipe_id]),\
+                token
+        if name == "create":
+            body = json.dumps({
+                "title": recipe_title(rng),
+                "time_minutes": rng.randint(5, 120),
+                "price": f"{rng.uniform(1, 100):.2f}",
+                "tags": rng.sample(client["tag_ids"], 1),
+            }).encode()
+            return "POST", recipes, token, body, "application/json"
+        if name == "upload-image":
+            body, content_type = multipart(
+                "image", "dish.png", self.image, "image/png"
+            )
+            return "POST", reverse(
+                "recipe:recipe-upload-image", args=[recipe_id]
+            ), token, body, content_type
+        if name == "token":
+            body = urlencode({
+                "email": client["email"], "password": self.password,
+            }).encode()
+            return "POST", reverse("user:token"), None, body,\
+                "application/x-www-form-urlencoded"
+
+    def run(self, name, rng, clients, requests, concurrency):
+        """Send the scenario's requests concurrently and sum them up"""
+
+        batch = [
+            self.build(name, rng, rng.choice(clients))
+            for _ in range(requests + concurrency)
+        ]
+        with ThreadPoolExecutor(concurrency) as pool:
+            # Warm up connections and caches before measuring
+            list(pool.map(lambda args: self.send(*args), batch[:concurrency]))
+
+            start = time.perf_counter()
+            results = list(pool.map(
+                lambda args: self.send(*args), batch[concurrency:]
+            ))
+            wall = time.perf_counter() - start
+
+        ms = [seconds * 1000 for seconds, _, _ in results]
+        queries = [count for _, _, count in results if count is not None]
+        return {
+            "rps": len(results) / wall,
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "queries": statistics.mean(queries) if queries else None,
+            "errors": sum(status >= 400 for _, status, _ in results),
+        }
+
+    def regressions(self, results, baseline, tolerance):
+        """Return the results worse than the baseline beyond tolerance"""
+
+        found = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                found.append(f"{name} p95 {base['p95_ms']:.1f} -> "
+                             f"{result['p95_ms']:.1f} ms")
+            if result["rps"] < base["rps"] * (1 - tolerance):
+                found.append(f"{name} throughput {base['rps']:.0f} -> "
+                             f"{result['rps']:.0f} req/s")
+            if None not in (result["queries"], base["queries"]) and \
+                    result["queries"] > base["queries"] * (1 + tolerance):
+                found.append(f"{name} queries {base['queries']:.2f} -> "
+                             f"{result['queries']:.2f}/req")
+            if result["errors"] > base["errors"]:
+                found.append(f"{name} errors {base['errors']} -> "
+                             f"{result['errors']}")
+        return found
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.password = options["password"]
+        self.image = png()
+
+        server = None
+        self.headers = {}
+        if options["url"]:
+            self.url = options["url"].rstrip("/")
+        else:
+            server = PooledWSGIServer(
+                ("127.0.0.1", 0), QuietRequestHandler,
+                workers=options["workers"],
+            )
+            server.set_app(get_wsgi_application())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.url = f"http://127.0.0.1:{server.server_port}"
+            self.headers["Host"] = allowed_host()
+
+        try:
+            clients = self.clients(options["users"], options["prefix"])
+            self.stdout.write(
+                f"{len(clients)} users, {options['concurrency']} clients, "
+                f"{options['requests']} requests per scenario on {self.url}"
+            )
+            results = {}
+            for name in options["scenarios"]:
+                result = results[name] = self.run(
+                    name, rng, clients, options["requests"],
+                    options["concurrency"],
+                )
+                queries = result["queries"]
+                self.stdout.write(
+                    f"{name:<14}{result['rps']:>8.0f} req/s"
+                    f"  p50 {result['p50_ms']:>7.1f}"
+                    f"  p95 {result['p95_ms']:>7.1f}"
+                    f"  p99 {result['p99_ms']:>7.1f} ms"
+                    f"{'-' if queries is None else f'{queries:.2f}':>8}"
+                    f" queries/req{result['errors']:>6} errors"
+                )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as file:
+                json.dump(results, file, indent=2)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            found = self.regressions(results, baseline, options["tolerance"])
+            if found:
+                raise CommandError("Regressed from the baseline:\n" +
+                                   "\n".join(found))
+            self.stdout.write(self.style.SUCCESS("No regression"))
@@ -0,0 +1,19 @@
+from core.images import process_recipe_image
+from core.models import Recipe
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to process images left pending by a stopped worker"""
+
+    def handle(self, *args, **kwargs):
+        pending = Recipe.objects.filter(image_status=Recipe.IMAGE_PENDING)\
+            .values_list("id", flat=True)
+
+        count = 0
+        for recipe_id in pending.iterator():
+            process_recipe_image(recipe_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {count} images"))
@@ -0,0 +1,12 @@
+from recipe.stats import rebuild_stats
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to recompute the recipe stats of every user"""
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_stats()
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} stats"))
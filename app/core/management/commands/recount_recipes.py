@@ -0,0 +1,12 @@
+from recipe.counts import recount
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to repair the recipe counts of tags and ingredients"""
+
+    def handle(self, *args, **kwargs):
+        fixed = recount()
+
+        self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} recipe counts"))
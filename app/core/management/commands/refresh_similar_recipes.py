@@ -0,0 +1,30 @@
+from core.models import Recipe
+from recipe.similarity import refresh_similar
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Django command to recompute every recipe's similar recipes"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        user_ids = Recipe.objects.order_by()\
+            .values_list("user_id", flat=True).distinct()
+
+        count = 0
+        for user_id in user_ids:
+            recipe_ids = list(
+                Recipe.objects.filter(user_id=user_id).order_by("id")
+                .values_list("id", flat=True)
+            )
+            for start in range(0, len(recipe_ids), batch_size):
+                refresh_similar(
+                    user_id, recipe_ids[start:start + batch_size]
+                )
+            count += len(recipe_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} recipes"))
@@ -0,0 +1,89 @@
+import math
+import random
+
+from core.benchmarks import analyze, copy_create, seed_library
+from recipe.counts import recount
+from recipe.stats import rebuild_stats
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rest_framework.authtoken.models import Token
+
+
+class Command(BaseCommand):
+    """Django command to fill the database with realistic synthetic users"""
+
+    help = "Seed users with tags, ingredients, recipes and tokens"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument(
+            "--recipes", type=int, default=200,
+            help="Average recipes per user, most users have fewer",
+        )
+        parser.add_argument("--tags", type=int, default=30)
+        parser.add_argument("--ingredients", type=int, default=150)
+        parser.add_argument("--tags-per-recipe", type=int, default=3)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--password", default="seed-password")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def sizes(self, rng, mean):
+        """Return a long tail size around the mean, at least one"""
+
+        sigma = 1.0
+        return max(1, round(rng.lognormvariate(
+            math.log(mean) - sigma ** 2 / 2, sigma
+        )))
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        User = get_user_model()
+        prefix = options["prefix"]
+        # Numbered after the users of earlier runs with the same prefix
+        first = User.objects.filter(email__startswith=f"{prefix}-").count()
+        password = make_password(options["password"])
+
+        with transaction.atomic():
+            users = copy_create(User, (
+                User(
+                    email=f"{prefix}-{first + i}@example.com",
+                    name=f"{prefix.title()} User {first + i}",
+                    password=password,
+                )
+                for i in range(options["users"])
+            ))
+            tokens = [Token(user=user) for user in users]
+            for token in tokens:
+                token.key = token.generate_key()
+            copy_create(Token, tokens)
+
+            recipes = 0
+            for i, user in enumerate(users):
+                size = self.sizes(rng, options["recipes"])
+                _, _, ids = seed_library(
+                    user,
+                    recipes=size,
+                    tags=self.sizes(rng, options["tags"]),
+                    ingredients=self.sizes(rng, options["ingredients"]),
+                    tags_per_recipe=options["tags_per_recipe"],
+                    ingredients_per_recipe=options["ingredients_per_recipe"],
+                    seed=rng.random(),
+                    vary=True,
+                    analyze_early=not i,
+                )
+                recipes += len(ids)
+
+            # Bulk inserts skip the signals keeping the rollups and counts
+            rebuild_stats()
+            recount()
+
+        analyze()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users with {recipes} recipes, "
+            f"password {options['password']!r}"
+        ))
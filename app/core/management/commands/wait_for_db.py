@@ -2,24 +2,45 @@ import time
 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
-    def handle(self, *args, **kwargs):
+    help = "Wait until the database accepts connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--timeout", type=float, default=60)
+        parser.add_argument("--interval", type=float, default=0.5)
+        parser.add_argument("--max-interval", type=float, default=5)
+
+    def handle(self, *args, **options):
         self.stdout.write("Waiting for database")
-        db_conn = None
+        conn = connections[options["database"]]
+        deadline = time.monotonic() + options["timeout"]
+        interval = options["interval"]
 
-        while not db_conn:
+        while True:
             try:
-                db_conn = connections["default"]
+                # Opening the connection is what actually reaches the
+                # server; looking the wrapper up never touches the socket.
+                conn.ensure_connection()
+                break
             except OperationalError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f"Database unavailable after {options['timeout']}s"
+                    )
+
+                interval = min(interval, remaining)
                 self.stdout.write(
                     self.style.ERROR("Database unavailable") +
-                    ", waiting 1 second...."
+                    f", waiting {interval:.1f} seconds...."
                 )
-                time.sleep(1)
+                time.sleep(interval)
+                interval = min(interval * 2, options["max_interval"])
 
         self.stdout.write(self.style.SUCCESS("Database available!!!"))
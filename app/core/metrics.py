@@ -0,0 +1,241 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   float("inf"))
+
+HELP = {
+    "http_requests_total": "Requests by view, method and status code",
+    "http_request_duration_seconds": "Request latency by view",
+    "http_request_phase_seconds":
+        "Time requests spent in SQL, serializing and rendering by view",
+    "db_queries_total": "SQL statements run by view",
+    "db_connections_opened_total": "Database connections opened",
+    "db_connections_reused_total": "Requests served on an open connection",
+    "image_upload_bytes_total": "Bytes of recipe images uploaded",
+    "cache_requests_total": "Cache lookups by cache and result",
+    "db_routed_requests_total": "Requests by the database serving reads",
+    "db_replica_checks_total": "Replica health checks by result",
+}
+
+
+def metrics_settings():
+    return getattr(settings, "METRICS", {})
+
+
+def metrics_dir():
+    return metrics_settings().get(
+        "DIR", os.path.join(tempfile.gettempdir(), "app-metrics")
+    )
+
+
+def series_key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+class Registry:
+    """Counters and histograms of this process, shared through files
+
+    Each process writes its totals to its own file in METRICS["DIR"] at
+    most every FLUSH_INTERVAL seconds, from a background thread, and the
+    files of every process are summed when collected. Files are named
+    after the process ID and a random suffix, as IDs get reused. Files of
+    exited processes are kept so counters never go backwards, the
+    clear_metrics command empties the directory when the server starts.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.name = f"{self.pid}-{uuid.uuid4().hex}"
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.dirty = threading.Event()
+        self.flusher = None
+
+    def _ensure_process(self):
+        # A forked worker starts from zero instead of the parent's totals
+        if self.pid != os.getpid():
+            self._reset()
+        if self.flusher is None:
+            self.flusher = threading.Thread(
+                target=self._flush_loop, name="metrics-flush", daemon=True
+            )
+            self.flusher.start()
+
+    def inc(self, name, value=1, **labels):
+        """Add the value to the counter with the labels"""
+
+        with self.lock:
+            self._ensure_process()
+            self.counters[series_key(name, labels)] += value
+        self.dirty.set()
+
+    def observe(self, name, value, buckets, **labels):
+        """Count the value in the histogram with the labels"""
+
+        with self.lock:
+            self._ensure_process()
+            key = series_key(name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": [0] * len(buckets),
+                    "bounds": list(buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            histogram["sum"] += value
+            histogram["count"] += 1
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+                    break
+        self.dirty.set()
+
+    def path(self):
+        return os.path.join(metrics_dir(), f"{self.name}.json")
+
+    def flush(self):
+        """Write this process's totals to its file"""
+
+        with self.lock:
+            if self.pid != os.getpid():
+                return
+            self.dirty.clear()
+            data = json.dumps({
+                "counters": self.counters,
+                "histograms": self.histograms,
+            }, default=str)
+
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write(data)
+        os.replace(temporary, self.path())
+
+    def _flush_loop(self):
+        dirty = self.dirty
+        while True:
+            dirty.wait()
+            time.sleep(metrics_settings().get("FLUSH_INTERVAL", 1.0))
+            self.flush()
+
+    def collect(self):
+        """Return the counters and histograms summed over every process"""
+
+        if self.counters or self.histograms:
+            self.flush()
+
+        counters = defaultdict(float)
+        histograms = {}
+        for path in glob.glob(os.path.join(metrics_dir(), "*.json")):
+            try:
+                with open(path) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+
+            for key, value in data["counters"].items():
+                counters[key] += value
+            for key, histogram in data["histograms"].items():
+                total = histograms.get(key)
+                if total is None:
+                    histograms[key] = histogram
+                    continue
+                total["sum"] += histogram["sum"]
+                total["count"] += histogram["count"]
+                for i, count in enumerate(histogram["buckets"]):
+                    total["buckets"][i] += count
+
+        return counters, histograms
+
+    def clear(self):
+        """Forget every total, this process's and the other ones'"""
+
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+        for path in glob.glob(os.path.join(metrics_dir(), "*.json")):
+            os.remove(path)
+
+
+registry = Registry()
+atexit.register(lambda: registry.flush() if registry.dirty.is_set() else None)
+
+
+def format_labels(labels, **extra):
+    labels = list(labels) + list(extra.items())
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"')
+         .replace("\n", "\\n"))
+        for name, value in labels
+    )
+    pairs = ",".join(f'{name}="{value}"' for name, value in escaped)
+    return "{" + pairs + "}"
+
+
+def format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def exposition():
+    """Return the metrics of every process in the Prometheus text format"""
+
+    counters, histograms = registry.collect()
+    series = defaultdict(list)
+    kinds = {}
+
+    for key, value in counters.items():
+        name, labels = json.loads(key)
+        kinds[name] = "counter"
+        series[name].append(f"{name}{format_labels(labels)} {value:g}")
+
+    for key, histogram in histograms.items():
+        name, labels = json.loads(key)
+        kinds[name] = "histogram"
+        cumulative = 0
+        for bound, count in zip(histogram["bounds"], histogram["buckets"]):
+            cumulative += count
+            le = format_bound(float(bound))
+            series[name].append(
+                f"{name}_bucket{format_labels(labels, le=le)} {cumulative}"
+            )
+        series[name].append(
+            f"{name}_sum{format_labels(labels)} {histogram['sum']:g}"
+        )
+        series[name].append(
+            f"{name}_count{format_labels(labels)} {histogram['count']}"
+        )
+
+    lines = []
+    for name in sorted(series):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} {kinds[name]}")
+        lines.extend(sorted(series[name]))
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """Serve the metrics for Prometheus to scrape"""
+
+    return HttpResponse(
+        exposition(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,89 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from .metrics import LATENCY_BUCKETS, registry
+from .timing import Timings, recording, timing_settings
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimingMiddleware:
+    """Time each request's SQL, serialization and rendering
+
+    The timings go out as a Server-Timing header and into the metrics
+    scraped by Prometheus. Requests whose slowest statement reaches
+    SLOW_QUERY_MS log their slowest statements with the code that ran
+    them. Place it first so the total covers the other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = timing_settings()
+        timings = Timings(
+            keep=options.get("SLOW_QUERIES", 5),
+            slow_ms=options.get("SLOW_QUERY_MS", 100),
+        )
+        request.timings = timings
+        start = time.perf_counter()
+
+        with recording(timings), ExitStack() as stack:
+            for conn in connections.all():
+                if conn.connection is not None:
+                    registry.inc("db_connections_reused_total", db=conn.alias)
+                stack.enter_context(conn.execute_wrapper(timings.execute))
+            response = self.get_response(request)
+
+        timings.seconds["total"] = time.perf_counter() - start
+        match = request.resolver_match
+        view_name = match.view_name if match is not None else None
+
+        self.count(request, response, view_name or "unmatched", timings)
+        if options.get("SERVER_TIMING", True):
+            response["Server-Timing"] = timings.server_timing(view_name)
+        if timings.slowest:
+            self.log_slowest(request, view_name, timings)
+
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering that follows the view"""
+
+        timings = request.timings
+        start = time.perf_counter()
+
+        def rendered(response):
+            timings.seconds["render"] += time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def count(self, request, response, view_name, timings):
+        registry.inc(
+            "http_requests_total", view=view_name, method=request.method,
+            status=response.status_code,
+        )
+        registry.observe(
+            "http_request_duration_seconds", timings.seconds["total"],
+            LATENCY_BUCKETS, view=view_name,
+        )
+        registry.inc("db_queries_total", timings.queries, view=view_name)
+        for phase in ("db", "serialize", "render"):
+            registry.observe(
+                "http_request_phase_seconds", timings.seconds[phase],
+                LATENCY_BUCKETS, view=view_name, phase=phase,
+            )
+
+    def log_slowest(self, request, view_name, timings):
+        lines = [
+            f"{elapsed * 1000:.1f} ms at {site}: {sql}"
+            for elapsed, sql, site in timings.slowest_first()
+        ]
+        logger.warning(
+            "Slow SQL in %s %s (%s):\n%s",
+            request.method, request.path, view_name, "\n".join(lines)
+        )
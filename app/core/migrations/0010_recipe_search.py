@@ -0,0 +1,182 @@
+# Generated by Django 2.1.15 on 2026-10-18 05:22
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The document of a recipe: its title weighted A, tag names B and
+# ingredient names C. Links are written in bulk, so recipes are refreshed
+# a statement at a time with one aggregate over the changed recipes.
+DOCUMENT_SQL = """
+CREATE FUNCTION core_recipe_refresh_search(recipe_ids integer[])
+RETURNS void AS $$
+    UPDATE core_recipe r
+    SET search_vector =
+        setweight(to_tsvector('english', r.title), 'A')
+        || setweight(to_tsvector('english', coalesce(t.names, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(i.names, '')), 'C')
+    FROM (SELECT DISTINCT unnest(recipe_ids) AS id) changed
+    LEFT JOIN (
+        SELECT rt.recipe_id, string_agg(t.name, ' ') AS names
+        FROM core_recipe_tags rt JOIN core_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = ANY(recipe_ids)
+        GROUP BY rt.recipe_id
+    ) t ON t.recipe_id = changed.id
+    LEFT JOIN (
+        SELECT ri.recipe_id, string_agg(i.name, ' ') AS names
+        FROM core_recipe_ingredients ri
+        JOIN core_ingredient i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = ANY(recipe_ids)
+        GROUP BY ri.recipe_id
+    ) i ON i.recipe_id = changed.id
+    WHERE r.id = changed.id;
+$$ LANGUAGE sql;
+
+CREATE FUNCTION core_recipe_search_row() RETURNS trigger AS $$
+BEGIN
+    -- A new recipe has no links yet, its document is just the title
+    NEW.search_vector := setweight(to_tsvector('english', NEW.title), 'A');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_search_insert
+BEFORE INSERT ON core_recipe
+FOR EACH ROW EXECUTE PROCEDURE core_recipe_search_row();
+
+CREATE FUNCTION core_recipe_search_retitled() RETURNS trigger AS $$
+DECLARE
+    recipe_ids integer[] := ARRAY(
+        SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE o.title IS DISTINCT FROM n.title
+    );
+BEGIN
+    -- The refresh updates recipes too, without changing their titles
+    IF cardinality(recipe_ids) > 0 THEN
+        PERFORM core_recipe_refresh_search(recipe_ids);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_search_update
+AFTER UPDATE ON core_recipe
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_retitled();
+
+CREATE FUNCTION core_recipe_search_links() RETURNS trigger AS $$
+BEGIN
+    PERFORM core_recipe_refresh_search(ARRAY(
+        SELECT recipe_id FROM changed
+    ));
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_tags_search_insert
+AFTER INSERT ON core_recipe_tags REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_links();
+
+CREATE TRIGGER core_recipe_tags_search_delete
+AFTER DELETE ON core_recipe_tags REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_links();
+
+CREATE TRIGGER core_recipe_ingredients_search_insert
+AFTER INSERT ON core_recipe_ingredients REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_links();
+
+CREATE TRIGGER core_recipe_ingredients_search_delete
+AFTER DELETE ON core_recipe_ingredients REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE PROCEDURE core_recipe_search_links();
+
+CREATE FUNCTION core_recipe_search_renamed() RETURNS trigger AS $$
+DECLARE
+    recipe_ids integer[];
+BEGIN
+    EXECUTE format(
+        'SELECT ARRAY(
+            SELECT l.recipe_id FROM %I l
+            JOIN new_rows n ON n.id = l.%I
+            JOIN old_rows o ON o.id = n.id
+            WHERE o.name IS DISTINCT FROM n.name
+        )',
+        TG_ARGV[0], TG_ARGV[1]
+    ) INTO recipe_ids;
+    PERFORM core_recipe_refresh_search(recipe_ids);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_tag_search_rename
+AFTER UPDATE ON core_tag
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE PROCEDURE core_recipe_search_renamed('core_recipe_tags', 'tag_id');
+
+CREATE TRIGGER core_ingredient_search_rename
+AFTER UPDATE ON core_ingredient
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE PROCEDURE core_recipe_search_renamed(
+    'core_recipe_ingredients', 'ingredient_id'
+);
+
+SELECT core_recipe_refresh_search(ARRAY(SELECT id FROM core_recipe));
+"""
+
+DROP_DOCUMENT_SQL = """
+DROP TRIGGER core_ingredient_search_rename ON core_ingredient;
+DROP TRIGGER core_tag_search_rename ON core_tag;
+DROP FUNCTION core_recipe_search_renamed();
+DROP TRIGGER core_recipe_ingredients_search_delete ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_ingredients_search_insert ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_tags_search_delete ON core_recipe_tags;
+DROP TRIGGER core_recipe_tags_search_insert ON core_recipe_tags;
+DROP FUNCTION core_recipe_search_links();
+DROP TRIGGER core_recipe_search_update ON core_recipe;
+DROP FUNCTION core_recipe_search_retitled();
+DROP TRIGGER core_recipe_search_insert ON core_recipe;
+DROP FUNCTION core_recipe_search_row();
+DROP FUNCTION core_recipe_refresh_search(integer[]);
+"""
+
+# Typo tolerant title matching needs pg_trgm, which isn't shipped with
+# every Postgres build, so the search works without it when it's missing
+TRIGRAM_SQL = """
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'
+    ) THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX core_recipe_title_trgm
+        ON core_recipe USING gin (title gin_trgm_ops);
+    END IF;
+EXCEPTION WHEN insufficient_privilege THEN
+    RAISE NOTICE 'pg_trgm unavailable, typo tolerant search disabled';
+END
+$$;
+"""
+
+DROP_TRIGRAM_SQL = "DROP INDEX IF EXISTS core_recipe_title_trgm;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search__c01407_gin'),
+        ),
+        migrations.RunSQL(DOCUMENT_SQL, DROP_DOCUMENT_SQL),
+        migrations.RunSQL(TRIGRAM_SQL, DROP_TRIGRAM_SQL),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.1.15 on 2026-10-18 06:09
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('user', 'User'), ('tag', 'Tag'), ('ingredient', 'Ingredient')], max_length=10)),
+                ('key', models.IntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('time_total', models.BigIntegerField(default=0)),
+                ('price_histogram', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('time_histogram', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipestats',
+            unique_together={('user', 'scope', 'key')},
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.1.15 on 2026-10-18 06:12
+
+from django.db import migrations, models
+
+# Title prefix filters are LIKE 'prefix%' queries, which a plain index can
+# only serve under the C collation. The pattern ops index serves them
+# whatever the database collation, (user, title, id) serves the ordering.
+PATTERN_SQL = """
+CREATE INDEX core_recipe_user_title_pattern
+ON core_recipe (user_id, title varchar_pattern_ops);
+"""
+
+DROP_PATTERN_SQL = "DROP INDEX IF EXISTS core_recipe_user_title_pattern;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'price', 'id'], name='core_recipe_user_id_4dae59_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'time_minutes', 'id'], name='core_recipe_user_id_93b1a9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'title', 'id'], name='core_recipe_user_id_6248a0_idx'),
+        ),
+        migrations.RunSQL(PATTERN_SQL, DROP_PATTERN_SQL),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.1.15 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+# Counts the links the existing rows already have, before the indexes
+COUNT_SQL = """
+UPDATE core_tag SET recipe_count = (
+    SELECT count(*) FROM core_recipe_tags WHERE tag_id = core_tag.id
+);
+UPDATE core_ingredient SET recipe_count = (
+    SELECT count(*) FROM core_recipe_ingredients
+    WHERE ingredient_id = core_ingredient.id
+);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(COUNT_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count', 'id'], name='core_ingred_user_id_44f404_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count', 'id'], name='core_tag_user_id_cd342a_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.1.15 on 2026-10-18 06:48
+
+from django.db import migrations
+
+# The admin searches emails and names by case insensitive prefix, which
+# Django writes as UPPER(column::text) LIKE UPPER('prefix%'). Recipes with
+# unfinished images are few, a partial index lists them.
+INDEXES_SQL = """
+CREATE INDEX core_user_email_upper_pattern
+ON core_user (UPPER(email::text) text_pattern_ops);
+CREATE INDEX core_tag_name_upper_pattern
+ON core_tag (UPPER(name::text) text_pattern_ops);
+CREATE INDEX core_ingredient_name_upper_pattern
+ON core_ingredient (UPPER(name::text) text_pattern_ops);
+CREATE INDEX core_recipe_image_unfinished
+ON core_recipe (image_status, id) WHERE image_status IN ('pending', 'failed');
+"""
+
+DROP_INDEXES_SQL = """
+DROP INDEX IF EXISTS core_user_email_upper_pattern;
+DROP INDEX IF EXISTS core_tag_name_upper_pattern;
+DROP INDEX IF EXISTS core_ingredient_name_upper_pattern;
+DROP INDEX IF EXISTS core_recipe_image_unfinished;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_counts'),
+    ]
+
+    operations = [
+        migrations.RunSQL(INDEXES_SQL, DROP_INDEXES_SQL),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 2.1.15 on 2026-10-18 08:02
+
+from django.db import migrations
+
+# The rename triggers of migration 0010 fired on every update of a tag or
+# ingredient, recipe count bumps included. Statement triggers with
+# transition tables can't be limited to a column, so they become row
+# triggers firing only when the name changes.
+RENAME_SQL = """
+DROP TRIGGER core_tag_search_rename ON core_tag;
+DROP TRIGGER core_ingredient_search_rename ON core_ingredient;
+
+CREATE OR REPLACE FUNCTION core_recipe_search_renamed() RETURNS trigger AS $$
+DECLARE
+    recipe_ids integer[];
+BEGIN
+    EXECUTE format(
+        'SELECT ARRAY(SELECT recipe_id FROM %I WHERE %I = $1)',
+        TG_ARGV[0], TG_ARGV[1]
+    ) INTO recipe_ids USING NEW.id;
+    PERFORM core_recipe_refresh_search(recipe_ids);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_tag_search_rename
+AFTER UPDATE OF name ON core_tag
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE PROCEDURE core_recipe_search_renamed('core_recipe_tags', 'tag_id');
+
+CREATE TRIGGER core_ingredient_search_rename
+AFTER UPDATE OF name ON core_ingredient
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE PROCEDURE core_recipe_search_renamed(
+    'core_recipe_ingredients', 'ingredient_id'
+);
+"""
+
+STATEMENT_RENAME_SQL = """
+DROP TRIGGER core_tag_search_rename ON core_tag;
+DROP TRIGGER core_ingredient_search_rename ON core_ingredient;
+
+CREATE OR REPLACE FUNCTION core_recipe_search_renamed() RETURNS trigger AS $$
+DECLARE
+    recipe_ids integer[];
+BEGIN
+    EXECUTE format(
+        'SELECT ARRAY(
+            SELECT l.recipe_id FROM %I l
+            JOIN new_rows n ON n.id = l.%I
+            JOIN old_rows o ON o.id = n.id
+            WHERE o.name IS DISTINCT FROM n.name
+        )',
+        TG_ARGV[0], TG_ARGV[1]
+    ) INTO recipe_ids;
+    PERFORM core_recipe_refresh_search(recipe_ids);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_tag_search_rename
+AFTER UPDATE ON core_tag
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE PROCEDURE core_recipe_search_renamed('core_recipe_tags', 'tag_id');
+
+CREATE TRIGGER core_ingredient_search_rename
+AFTER UPDATE ON core_ingredient
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE PROCEDURE core_recipe_search_renamed(
+    'core_recipe_ingredients', 'ingredient_id'
+);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(RENAME_SQL, STATEMENT_RENAME_SQL),
+    ]
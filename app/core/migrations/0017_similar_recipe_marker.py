@@ -0,0 +1,19 @@
+# Generated by Django 2.1.15 on 2026-10-18 07:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_search_rename_triggers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='similarrecipe',
+            name='similar',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Recipe'),
+        ),
+    ]
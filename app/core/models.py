@@ -1,4 +1,7 @@
 from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
@@ -54,33 +57,116 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.email
 
 
-class Tag(models.Model):
+class RecipeCountMixin:
+    """Leave the recipe_count column to the signals maintaining it"""
+
+    def save(self, *args, **kwargs):
+        # A full save would write back a count read before later links
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "recipe_count"
+            ]
+        super().save(*args, **kwargs)
+
+
+class Tag(RecipeCountMixin, models.Model):
     """Tag to be used for a recipe"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Recipes linked to it, kept up to date by recipe.signals
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "name", "id"]),
+            models.Index(fields=["user", "recipe_count", "id"]),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeCountMixin, models.Model):
     """Ingredient to be used in recipe"""
     name = models.CharField(max_length=155)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Recipes linked to it, kept up to date by recipe.signals
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "name", "id"]),
+            models.Index(fields=["user", "recipe_count", "id"]),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet for recipes that knows how to prefetch their relations"""
+
+    @staticmethod
+    def related_ids_lookups():
+        """Return lookups prefetching only the IDs of the relations"""
+
+        return (
+            models.Prefetch(
+                "tags",
+                queryset=Tag.objects.only("id").order_by("id")
+            ),
+            models.Prefetch(
+                "ingredients",
+                queryset=Ingredient.objects.only("id").order_by("id")
+            ),
+        )
+
+    @staticmethod
+    def related_names_lookups():
+        """Return lookups prefetching the IDs and names of the relations"""
+
+        return (
+            models.Prefetch(
+                "tags",
+                queryset=Tag.objects.only("id", "name").order_by("id")
+            ),
+            models.Prefetch(
+                "ingredients",
+                queryset=Ingredient.objects.only("id", "name").order_by("id")
+            ),
+        )
+
+    def prefetch_related_ids(self):
+        """Prefetch only the primary keys of the tags and ingredients"""
+
+        return self.prefetch_related(*self.related_ids_lookups())
+
+    def prefetch_related_names(self):
+        """Prefetch the primary keys and names of tags and ingredients"""
+
+        return self.prefetch_related(*self.related_names_lookups())
+
+
 class Recipe(models.Model):
     """Recipe model1"""
 
+    IMAGE_PENDING = "pending"
+    IMAGE_READY = "ready"
+    IMAGE_FAILED = "failed"
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, "Pending"),
+        (IMAGE_READY, "Ready"),
+        (IMAGE_FAILED, "Failed"),
+    )
+    SEARCH_CONFIG = "english"
+
     title = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -94,6 +180,96 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField(Ingredient, blank=True)
 
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(
+        max_length=7,
+        choices=IMAGE_STATUS_CHOICES,
+        blank=True,
+    )
+    image_thumbnail = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path
+    )
+    image_medium = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path
+    )
+
+    # Weighted title, tag and ingredient words kept up to date by the
+    # triggers of migration 0010, whatever way the rows are written
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"]),
+            models.Index(fields=["user", "price", "id"]),
+            models.Index(fields=["user", "time_minutes", "id"]),
+            # Title prefixes use the pattern index of migration 0013
+            models.Index(fields=["user", "title", "id"]),
+            GinIndex(fields=["search_vector"]),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class SimilarRecipe(models.Model):
+    """A precomputed neighbour of a recipe by its tags and ingredients"""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="similar_links",
+    )
+    # Null marks a recipe whose list was computed and came out empty
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+    )
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ("recipe", "similar"),
+        indexes = [
+            models.Index(fields=["recipe", "-score"]),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_id}"
+
+
+class RecipeStats(models.Model):
+    """Running totals of a user's recipes, overall or by tag or ingredient"""
+
+    SCOPE_USER = "user"
+    SCOPE_TAG = "tag"
+    SCOPE_INGREDIENT = "ingredient"
+    SCOPE_CHOICES = (
+        (SCOPE_USER, "User"),
+        (SCOPE_TAG, "Tag"),
+        (SCOPE_INGREDIENT, "Ingredient"),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    # The tag or ingredient ID, 0 for the user's whole library
+    key = models.IntegerField(default=0)
+    count = models.IntegerField(default=0)
+    price_total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+    time_total = models.BigIntegerField(default=0)
+    price_histogram = ArrayField(models.IntegerField())
+    time_histogram = ArrayField(models.IntegerField())
+
+    class Meta:
+        unique_together = ("user", "scope", "key"),
+
+    def __str__(self):
+        return f"{self.user_id} {self.scope} {self.key}"
@@ -0,0 +1,196 @@
+import json
+from base64 import b64decode, b64encode
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+Cursor = namedtuple("Cursor", ["position", "reverse"])
+
+
+class KeysetPagination(CursorPagination):
+    """Paginate on the values of every field the queryset is ordered by
+
+    DRF's CursorPagination only keys on the first ordering field and
+    skips over ties with an offset. Comparing the whole ordering instead
+    turns every page into a single index range scan, so deep pages cost
+    the same as the first one.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    tiebreaker = "id"
+    invalid_cursor_message = _("Invalid cursor")
+
+    def get_ordering(self, request, queryset, view):
+        """Return the queryset ordering with a unique tiebreaker appended"""
+
+        ordering = list(queryset.query.order_by)
+        assert ordering and all(isinstance(f, str) for f in ordering), (
+            "KeysetPagination requires a queryset ordered by field names"
+        )
+
+        names = [field.lstrip("-") for field in ordering]
+        if self.tiebreaker not in names and "pk" not in names:
+            prefix = "-" if ordering[0].startswith("-") else ""
+            ordering.append(prefix + self.tiebreaker)
+
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request, queryset)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        if reverse:
+            queryset = queryset.order_by(*self._invert(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.cursor is not None:
+            queryset = queryset.filter(self._after(self.cursor))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        position = self._get_position_from_instance(self.page[-1])
+        return self.encode_cursor(Cursor(position, reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        position = self._get_position_from_instance(self.page[0])
+        return self.encode_cursor(Cursor(position, reverse=True))
+
+    def decode_cursor(self, request, queryset):
+        """Return the cursor given in the request or None on the first page
+
+        The position values are converted to their fields' types, so a
+        cursor that was tampered with is rejected instead of failing the
+        query.
+        """
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            data = json.loads(b64decode(encoded.encode("ascii")))
+            ordering = tuple(data["o"])
+            position = list(data["p"])
+            reverse = bool(data.get("r"))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if ordering != self.ordering or len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            position = [
+                self._field(queryset, field.lstrip("-")).to_python(value)
+                for field, value in zip(ordering, position)
+            ]
+        except (TypeError, FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(position, reverse)
+
+    def encode_cursor(self, cursor):
+        """Return the URL of the page the cursor points at"""
+
+        data = {"o": self.ordering, "p": cursor.position}
+        if cursor.reverse:
+            data["r"] = 1
+
+        encoded = b64encode(
+            json.dumps(data, cls=DjangoJSONEncoder).encode("utf-8")
+        ).decode("ascii")
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    @staticmethod
+    def _field(queryset, name):
+        """Return the model field or annotation output field of a name"""
+
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        if name == "pk":
+            return queryset.model._meta.pk
+        return queryset.model._meta.get_field(name)
+
+    def _get_position_from_instance(self, instance, ordering=None):
+        # Pages of values() querysets are made of dicts
+        if isinstance(instance, dict):
+            get = dict.__getitem__
+        else:
+            get = getattr
+
+        return [
+            get(instance, field.lstrip("-"))
+            for field in ordering or self.ordering
+        ]
+
+    def _after(self, cursor):
+        """Build the condition selecting the rows past the cursor
+
+        The leading bound on the first field lets the database turn the
+        comparison into an index range instead of filtering every row.
+        """
+
+        condition = Q()
+        equal = {}
+        bound = None
+
+        for field, value in zip(self.ordering, cursor.position):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != cursor.reverse
+            lookup = "lt" if descending else "gt"
+
+            if bound is None:
+                bound = Q(**{f"{name}__{lookup}e": value})
+
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+
+        return bound & condition
+
+    @staticmethod
+    def _invert(ordering):
+        """Return the ordering with each field's direction flipped"""
+
+        return tuple(
+            field[1:] if field.startswith("-") else "-" + field
+            for field in ordering
+        )
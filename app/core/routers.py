@@ -0,0 +1,244 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from .metrics import registry
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica's last replayed transaction is behind the primary,
+# 0 once it has replayed everything it received or when it isn't a
+# replica at all, like a second alias of the primary when testing
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+SAFE_METHODS = "GET", "HEAD", "OPTIONS"
+
+_local = threading.local()
+
+
+def routing_settings():
+    return getattr(settings, "REPLICA_ROUTING", {})
+
+
+def replica_aliases():
+    return list(routing_settings().get("REPLICAS", ()))
+
+
+def pin_cache():
+    return caches[routing_settings().get("CACHE_ALIAS", "default")]
+
+
+def pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def pin(user_id):
+    """Keep the user's reads on the primary for PIN_SECONDS"""
+
+    seconds = routing_settings().get("PIN_SECONDS", 10)
+    if seconds > 0:
+        pin_cache().set(pin_key(user_id), True, seconds)
+
+
+def replicated(model):
+    """Return whether reads of the model may be served by a replica
+
+    Users, tokens and sessions stay on the primary, so a client logging
+    in or signing up can use its credentials at once.
+    """
+
+    return model._meta.app_label == "core" and model is not get_user_model()
+
+
+class ReplicaPool:
+    """Health of the replicas as last checked by this process
+
+    Each replica is checked at most every CHECK_INTERVAL seconds, and is
+    left out until the next check when it can't be queried or is more
+    than MAX_LAG_SECONDS behind the primary.
+    """
+
+    def __init__(self):
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def lag(self, alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+        return None if lag is None else float(lag)
+
+    def check(self, alias):
+        """Return whether the replica is up and close enough"""
+
+        try:
+            lag = self.lag(alias)
+        except DatabaseError:
+            logger.warning("Replica %s is unavailable", alias, exc_info=True)
+            healthy = False
+        else:
+            max_lag = routing_settings().get("MAX_LAG_SECONDS", 1)
+            healthy = lag is not None and lag <= max_lag
+            if not healthy:
+                logger.warning("Replica %s is %s seconds behind", alias, lag)
+
+        registry.inc(
+            "db_replica_checks_total", db=alias, healthy=str(healthy).lower()
+        )
+        return healthy
+
+    def healthy(self):
+        """Return the replicas currently in rotation"""
+
+        interval = routing_settings().get("CHECK_INTERVAL", 5)
+        now = time.monotonic()
+        aliases = []
+        for alias in replica_aliases():
+            with self._lock:
+                checked, healthy = self._checked.get(alias, (None, False))
+                due = checked is None or now - checked >= interval
+                if due:
+                    # Other threads keep the last result while this checks
+                    self._checked[alias] = now, healthy
+            if due:
+                healthy = self.check(alias)
+                with self._lock:
+                    self._checked[alias] = now, healthy
+            if healthy:
+                aliases.append(alias)
+        return aliases
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replicas = ReplicaPool()
+
+
+class Routing:
+    """Where the reads of the request being handled go
+
+    `replica` is None for unsafe requests, when no replica is healthy
+    and once the request wrote, so it reads its own writes. The user is
+    looked up lazily, as tokens are only authenticated by the view.
+    """
+
+    def __init__(self, request, replica):
+        self.request = request
+        self.replica = replica
+        self._pinned = None
+
+    def pinned(self):
+        if self._pinned is None:
+            user = getattr(self.request, "user", None)
+            if user is None or not user.is_authenticated:
+                return False
+            self._pinned = bool(pin_cache().get(pin_key(user.pk)))
+        return self._pinned
+
+    def db_for_read(self, model):
+        if self.replica is None or not replicated(model):
+            return DEFAULT_DB_ALIAS
+        # Reads within a transaction must see its own writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if self.pinned():
+            return DEFAULT_DB_ALIAS
+        return self.replica
+
+
+def current():
+    """Return the routing of the request being handled, if any"""
+
+    return getattr(_local, "routing", None)
+
+
+@contextmanager
+def routing(state):
+    """Make the routing the current one for the block"""
+
+    previous = current()
+    _local.routing = state
+    try:
+        yield state
+    finally:
+        _local.routing = previous
+
+
+class ReplicaRouter:
+    """Send the reads of safe requests to the replicas
+
+    Writes, and reads outside of requests, like those of management
+    commands and background threads, go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current()
+        if state is None:
+            return None
+        return state.db_for_read(model)
+
+    def db_for_write(self, model, **hints):
+        state = current()
+        if state is not None:
+            # The rest of the request must see what it is writing
+            state.replica = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Route each request's reads and pin users to the primary on writes
+
+    Place it after the authentication middleware, so the session user is
+    known when pinning.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replica = None
+        if request.method in SAFE_METHODS:
+            healthy = replicas.healthy()
+            if healthy:
+                replica = random.choice(healthy)
+
+        state = Routing(request, replica)
+        with routing(state):
+            response = self.get_response(request)
+
+        registry.inc(
+            "db_routed_requests_total",
+            db=DEFAULT_DB_ALIAS if state.replica is None or state.pinned()
+            else state.replica,
+        )
+        user = getattr(request, "user", None)
+        if request.method not in SAFE_METHODS and replica_aliases()\
+                and user is not None and user.is_authenticated:
+            pin(user.pk)
+        return response
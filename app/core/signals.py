@@ -0,0 +1,56 @@
+from .authentication import token_cache
+from .metrics import registry
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Forget a token when it is regenerated or deleted on logout"""
+
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Forget the tokens of a user that was changed or deactivated"""
+
+    if created:
+        return
+
+    keys = Token.objects.filter(user_id=instance.pk)\
+        .values_list("key", flat=True)
+    for key in keys:
+        token_cache.delete(key)
+
+
+@receiver(request_started)
+def check_connection_health(**kwargs):
+    """Close persistent connections the server has dropped since last use
+
+    Runs after Django's close_old_connections, so only connections still
+    within CONN_MAX_AGE are pinged and a dead one is reopened on first use
+    instead of failing the request.
+    """
+
+    for conn in connections.all():
+        if not conn.settings_dict.get("CONN_HEALTH_CHECKS"):
+            continue
+        if conn.connection is not None and not conn.in_atomic_block\
+                and not conn.is_usable():
+            conn.close()
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    """Count the database connections opened"""
+
+    registry.inc("db_connections_opened_total", db=connection.alias)
@@ -0,0 +1,114 @@
+from core.authentication import TokenCache, token_cache,\
+    token_cache_from_settings
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from unittest.mock import patch
+
+ME_URL = reverse("user:me")
+
+
+class TokenCacheTests(TestCase):
+    """Test the in-process token cache"""
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used key is evicted past max size"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    @patch("time.monotonic")
+    def test_entries_expire(self, monotonic):
+        """Test entries are not returned once their TTL passed"""
+        cache = TokenCache(max_size=2, ttl=60)
+        monotonic.return_value = 100
+        cache.set("a", 1)
+
+        monotonic.return_value = 161
+
+        self.assertIsNone(cache.get("a"))
+
+    def test_shared_tier_invalidated_everywhere(self):
+        """Test a key deleted by one process is gone for the others"""
+        writer = TokenCache(shared="default")
+        reader = TokenCache(shared="default")
+        writer.set("a", 1)
+
+        self.assertEqual(reader.get("a"), 1)
+        writer.delete("a")
+        self.assertIsNone(reader.get("a"))
+
+    @override_settings(TOKEN_CACHE={"TTL": 60, "LOCAL_TTL": 5})
+    def test_local_only_ttl_capped(self):
+        """Test tokens cached without a shared cache expire quickly"""
+        self.assertEqual(token_cache_from_settings().ttl, 5)
+
+        with override_settings(TOKEN_CACHE={
+            "TTL": 60, "LOCAL_TTL": 5, "SHARED_CACHE": "default",
+        }):
+            self.assertEqual(token_cache_from_settings().ttl, 60)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests with cached tokens"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+            name="Test User",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_token_lookup_cached(self):
+        """Test the token is only looked up on the first request"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_deleted_token_invalidated(self):
+        """Test a deleted token is rejected even when it was cached"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test the token of a deactivated user is rejected"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token_not_cached(self):
+        """Test an invalid token is rejected on every request"""
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+
+        self.client.get(ME_URL)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
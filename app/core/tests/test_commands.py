@@ -1,23 +1,270 @@
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from core.models import Recipe, Ingredient, RecipeStats, SimilarRecipe
+
+from rest_framework.authtoken.models import Token
+
+ENSURE_CONNECTION = \
+    "django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection"
 
 
 class CommandTest(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db is avaialable"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.return_value = True
-            call_command("wait_for_db")
-            self.assertTrue(gi.call_count, 1)
+        with patch(ENSURE_CONNECTION) as ec:
+            call_command("wait_for_db", stdout=StringIO())
+            self.assertEqual(ec.call_count, 1)
 
     @patch("time.sleep", return_value=True)
     def test_wait_for_db(self, ts):
-        """Test waiting for db"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 6)
+        """Test waiting for db backs off exponentially"""
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]
+            call_command("wait_for_db", stdout=StringIO())
+            self.assertEqual(ec.call_count, 6)
+
+        delays = [c[0][0] for c in ts.call_args_list]
+        self.assertEqual(delays, [0.5, 1, 2, 4, 5])
+
+    @patch("time.sleep", return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """Test waiting for db gives up after the timeout"""
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command("wait_for_db", timeout=0, stdout=StringIO())
+
+    def test_bench_recipe_filters(self):
+        """Test the filter benchmark reports every plan and cleans up"""
+        out = StringIO()
+        call_command(
+            "bench_recipe_filters",
+            recipes=20, tags=5, tags_per_recipe=2, repeat=1, stdout=out,
+        )
+
+        for plan in ("join", "join distinct", "semi-join any"):
+            self.assertIn(plan, out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bench_token_auth(self):
+        """Test the token benchmark reports both authentication modes"""
+        out = StringIO()
+        call_command("bench_token_auth", requests=2, stdout=out)
+
+        self.assertIn("uncached", out.getvalue())
+        self.assertIn("cached", out.getvalue())
+
+    @patch("core.management.commands.process_pending_images"
+           ".process_recipe_image")
+    def test_process_pending_images(self, process):
+        """Test only recipes with pending images are processed"""
+        user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        pending = Recipe.objects.create(
+            user=user, title="Pending", time_minutes=5, price=1.00,
+            image_status=Recipe.IMAGE_PENDING,
+        )
+        Recipe.objects.create(
+            user=user, title="Ready", time_minutes=5, price=1.00,
+            image_status=Recipe.IMAGE_READY,
+        )
+
+        call_command("process_pending_images", stdout=StringIO())
+
+        process.assert_called_once_with(pending.id)
+
+    def test_bench_recipe_export(self):
+        """Test the export benchmark reports both ways of exporting"""
+        out = StringIO()
+        call_command("bench_recipe_export", recipes=10, stdout=out)
+
+        self.assertIn("rendered", out.getvalue())
+        self.assertIn("streamed", out.getvalue())
+
+    def test_bench_serializers(self):
+        """Test the serializer benchmark reports every serializer"""
+        out = StringIO()
+        call_command("bench_serializers", rows=5, repeat=1, stdout=out)
+
+        for name in ("tags", "ingredients", "recipes", "recipe details"):
+            self.assertIn(name, out.getvalue())
+
+    def test_bench_recipe_search(self):
+        """Test the search benchmark reports every query and size"""
+        out = StringIO()
+        call_command(
+            "bench_recipe_search", sizes=[5, 10], repeat=1, stdout=out
+        )
+
+        self.assertIn("spicy curry", out.getvalue())
+        self.assertIn("10 recipes", out.getvalue())
+
+    def test_bench_pantry(self):
+        """Test the pantry benchmark reports the index and the query"""
+        out = StringIO()
+        call_command("bench_pantry", recipes=10, repeat=1, stdout=out)
+
+        self.assertIn("index rank", out.getvalue())
+        self.assertIn("sql rank", out.getvalue())
+
+    def test_refresh_similar_recipes(self):
+        """Test every recipe's similar recipes are recomputed"""
+        user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        salt = Ingredient.objects.create(user=user, name="Salt")
+        recipes = [
+            Recipe.objects.create(
+                user=user, title=title, time_minutes=5, price=1.00
+            )
+            for title in ("Fries", "Chips", "Tea")
+        ]
+        for recipe in recipes[:2]:
+            recipe.ingredients.add(salt)
+        SimilarRecipe.objects.all().delete()
+
+        out = StringIO()
+        call_command("refresh_similar_recipes", stdout=out)
+
+        self.assertEqual(
+            set(SimilarRecipe.objects.values_list("recipe", "similar")),
+            {(recipes[0].id, recipes[1].id), (recipes[1].id, recipes[0].id),
+             (recipes[2].id, None)},
+        )
+        self.assertIn("Refreshed 3 recipes", out.getvalue())
+
+    def test_rebuild_recipe_stats(self):
+        """Test the stats are recomputed from the recipes"""
+        user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        Recipe.objects.create(
+            user=user, title="Fries", time_minutes=5, price=1.00
+        )
+        RecipeStats.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_recipe_stats", stdout=out)
+
+        stats = RecipeStats.objects.get(user=user)
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.time_total, 5)
+        self.assertIn("Rebuilt 1 stats", out.getvalue())
+
+    def test_recount_recipes(self):
+        """Test the recipe counts are recomputed from the links"""
+        user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        recipe = Recipe.objects.create(
+            user=user, title="Fries", time_minutes=5, price=1.00
+        )
+        oil = Ingredient.objects.create(user=user, name="Oil")
+        recipe.ingredients.add(oil)
+        Ingredient.objects.update(recipe_count=0)
+
+        out = StringIO()
+        call_command("recount_recipes", stdout=out)
+
+        self.assertEqual(Ingredient.objects.get().recipe_count, 1)
+        self.assertIn("Fixed 1 recipe counts", out.getvalue())
+
+    def test_clear_metrics(self):
+        """Test the metrics files of earlier runs are removed"""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS={"DIR": directory}):
+            path = os.path.join(directory, "1-earlier.json")
+            with open(path, "w") as file:
+                json.dump({"counters": {}, "histograms": {}}, file)
+
+            out = StringIO()
+            call_command("clear_metrics", stdout=out)
+
+            self.assertFalse(os.path.exists(path))
+        self.assertIn("Metrics cleared", out.getvalue())
+
+    def test_seed_data(self):
+        """Test seeding users who can log in, with recipes and stats"""
+        out = StringIO()
+        call_command(
+            "seed_data", users=3, recipes=5, tags=3, ingredients=5, seed=0,
+            stdout=out,
+        )
+
+        users = get_user_model().objects.filter(email__startswith="seed-")
+        self.assertEqual(users.count(), 3)
+        user = users.get(email="seed-0@example.com")
+        self.assertTrue(user.check_password("seed-password"))
+        self.assertTrue(Token.objects.filter(user=user).exists())
+        recipe = Recipe.objects.filter(user=user).first()
+        self.assertIsNotNone(recipe.search_vector)
+        tag = recipe.tags.first()
+        self.assertEqual(tag.recipe_count, tag.recipe_set.count())
+        self.assertEqual(
+            RecipeStats.objects.get(user=user, scope="user").count,
+            Recipe.objects.filter(user=user).count(),
+        )
+
+        call_command("seed_data", users=1, recipes=1, stdout=out)
+        self.assertTrue(users.filter(email="seed-3@example.com").exists())
+
+
+class ConnectionCommandTest(TransactionTestCase):
+    """Commands reopening connections can't run inside a test transaction"""
+
+    def test_bench_db_connections(self):
+        """Test the connection benchmark reports every mode"""
+        out = StringIO()
+        call_command("bench_db_connections", requests=2, stdout=out)
+
+        for name in ("reconnect", "persistent", "health checked"):
+            self.assertIn(name, out.getvalue())
+
+    @override_settings(SIMILAR_RECIPES={"K": 10, "EAGER": True})
+    def test_loadtest(self):
+        """Test the load test reports every scenario and checks baselines"""
+        call_command(
+            "seed_data", users=2, recipes=3, tags=2, ingredients=3,
+            stdout=StringIO(),
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        baseline = os.path.join(directory.name, "baseline.json")
+        options = {
+            "requests": 4, "concurrency": 2, "workers": 2,
+            "scenarios": ["list", "filter", "detail", "create", "token"],
+        }
+
+        out = StringIO()
+        call_command("loadtest", save_baseline=baseline, stdout=out, **options)
+
+        with open(baseline) as file:
+            results = json.load(file)
+        self.assertEqual(set(results), set(options["scenarios"]))
+        self.assertEqual(results["detail"]["queries"], 3)
+        self.assertEqual(results["create"]["errors"], 0)
+
+        results["list"]["queries"] = 1
+        with open(baseline, "w") as file:
+            json.dump(results, file)
+        with self.assertRaisesRegex(CommandError, "list queries"):
+            call_command(
+                "loadtest", baseline=baseline, tolerance=0.5, stdout=out,
+                **options
+            )
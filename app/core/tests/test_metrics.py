@@ -0,0 +1,134 @@
+from core.metrics import registry
+from core.models import Recipe
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+import json
+import os
+import tempfile
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+METRICS_URL = reverse("metrics")
+
+
+def samples(response):
+    """Return the samples of a scrape by name and labels"""
+
+    values = {}
+    for line in response.content.decode().splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            values[series] = float(value)
+    return values
+
+
+class MetricsTests(TestCase):
+    """Test the metrics served for Prometheus"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        overridden = override_settings(METRICS={
+            "DIR": self.directory, "FLUSH_INTERVAL": 60,
+        })
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        registry.clear()
+
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user, title="Dal", time_minutes=10, price=2
+        )
+
+    def test_requests(self):
+        """Test requests are counted and timed by view"""
+
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(
+            res["Content-Type"], "text/plain; version=0.0.4; charset=utf-8"
+        )
+        values = samples(res)
+        view = 'view="recipe:recipe-list"'
+        self.assertEqual(values[
+            f'http_requests_total{{method="GET",status="200",{view}}}'
+        ], 2)
+        self.assertEqual(
+            values[f"http_request_duration_seconds_count{{{view}}}"], 2
+        )
+        self.assertEqual(values[
+            f'http_request_duration_seconds_bucket{{{view},le="+Inf"}}'
+        ], 2)
+        self.assertEqual(values[f"db_queries_total{{{view}}}"], 6)
+        for phase in ("db", "serialize", "render"):
+            self.assertEqual(values[
+                f'http_request_phase_seconds_count{{phase="{phase}",{view}}}'
+            ], 2)
+        self.assertIn("# TYPE http_request_duration_seconds histogram",
+                      res.content.decode())
+
+    def test_list_cache(self):
+        """Test list cache hits and misses are counted"""
+
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+        values = samples(self.client.get(METRICS_URL))
+
+        self.assertEqual(
+            values['cache_requests_total{cache="list",result="miss"}'], 1
+        )
+        self.assertEqual(
+            values['cache_requests_total{cache="list",result="hit"}'], 1
+        )
+
+    def test_processes_summed(self):
+        """Test the totals of every worker process are added up"""
+
+        self.client.get(RECIPES_URL)
+        registry.flush()
+        with open(registry.path()) as file:
+            data = json.load(file)
+        with open(os.path.join(self.directory, "1.json"), "w") as file:
+            json.dump(data, file)
+
+        values = samples(self.client.get(METRICS_URL))
+
+        view = 'view="recipe:recipe-list"'
+        self.assertEqual(values[
+            f'http_requests_total{{method="GET",status="200",{view}}}'
+        ], 2)
+        self.assertEqual(values[
+            f'http_request_duration_seconds_bucket{{{view},le="+Inf"}}'
+        ], 2)
+
+    def test_reused_process_id(self):
+        """Test a process reusing an exited one's ID keeps its totals"""
+
+        self.client.get(RECIPES_URL)
+        registry.flush()
+        earlier = registry.path()
+        # A process started later under the same ID
+        registry._reset()
+        self.client.get(RECIPES_URL)
+
+        values = samples(self.client.get(METRICS_URL))
+
+        self.assertNotEqual(registry.path(), earlier)
+        view = 'view="recipe:recipe-list"'
+        self.assertEqual(values[
+            f'http_requests_total{{method="GET",status="200",{view}}}'
+        ], 2)
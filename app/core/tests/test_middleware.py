@@ -0,0 +1,68 @@
+from core.models import Recipe
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def server_timing(response):
+    """Return the Server-Timing metrics of a response by name"""
+
+    metrics = {}
+    for metric in response["Server-Timing"].split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    """Test requests are timed and the timings reported"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user, title="Dal", time_minutes=10, price=2
+        )
+
+    def test_server_timing(self):
+        """Test the header reports the SQL, serialization and rendering"""
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+
+        metrics = server_timing(res)
+        self.assertEqual(metrics["db"]["desc"], '"3 queries"')
+        for name in ("db", "serialize", "render", "total"):
+            self.assertGreater(float(metrics[name]["dur"]), 0)
+        self.assertEqual(metrics["view"]["desc"], '"recipe:recipe-list"')
+
+    @override_settings(REQUEST_TIMING={
+        "SLOW_QUERIES": 2, "SLOW_QUERY_MS": 0, "SERVER_TIMING": False,
+    })
+    def test_slow_queries_logged(self):
+        """Test the slowest statements are logged with their call sites"""
+
+        with self.assertLogs("core.middleware", "WARNING") as logs:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn("Server-Timing", res)
+        lines = logs.output[0].splitlines()[1:]
+        self.assertEqual(len(lines), 2)
+        self.assertIn("core_recipe", logs.output[0])
+        self.assertIn("/app/recipe/", logs.output[0])
+
+    def test_fast_requests_not_logged(self):
+        """Test requests without slow statements log nothing"""
+
+        with self.assertRaises(AssertionError):
+            with self.assertLogs("core.middleware", "WARNING"):
+                self.client.get(RECIPES_URL)
@@ -0,0 +1,107 @@
+import json
+from base64 import b64encode
+
+from core.models import Tag, Recipe
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class KeysetPaginationTests(TestCase):
+    """Test paginating the API by keyset cursors"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, params):
+        """Follow the next links and return every page"""
+
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data)
+            if not res.data["next"]:
+                return pages
+            res = self.client.get(res.data["next"])
+
+    def test_pages_follow_ordering_with_ties(self):
+        """Test tags with equal names are split across pages once each"""
+
+        for name in ["Lunch", "Lunch", "Lunch", "Breakfast", "Dinner"]:
+            Tag.objects.create(user=self.user, name=name)
+
+        pages = self.walk(TAGS_URL, {"page_size": 2})
+        ids = [tag["id"] for page in pages for tag in page["results"]]
+
+        expected = Tag.objects.order_by("-name", "-id")
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(ids, [tag.id for tag in expected])
+
+    def test_previous_link_returns_previous_page(self):
+        """Test following the previous link goes back one page"""
+
+        for i in range(5):
+            Recipe.objects.create(
+                user=self.user,
+                title=f"Recipe {i}",
+                time_minutes=10,
+                price=5.00,
+            )
+
+        first = self.client.get(RECIPES_URL, {"page_size": 2})
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+
+        self.assertIsNone(first.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+        self.assertIsNotNone(back.data["next"])
+
+    def test_deep_page_single_query(self):
+        """Test any page is fetched without counting or offsetting"""
+
+        for i in range(6):
+            Recipe.objects.create(
+                user=self.user,
+                title=f"Recipe {i}",
+                time_minutes=10,
+                price=5.00,
+            )
+
+        pages = self.walk(RECIPES_URL, {"page_size": 2})
+
+        # The page itself and the prefetched tags and ingredients
+        with self.assertNumQueries(3):
+            res = self.client.get(pages[1]["next"])
+
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNone(res.data["next"])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+
+        res = self.client.get(TAGS_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_values(self):
+        """Test a cursor with values of the wrong type is rejected"""
+
+        cursor = b64encode(json.dumps(
+            {"o": ["-id"], "p": [["x", "y"]]}
+        ).encode("utf-8")).decode("ascii")
+        res = self.client.get(RECIPES_URL, {"cursor": cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,163 @@
+from unittest.mock import patch
+
+from ..checks import check_replica_pin_cache
+from ..routers import ReplicaPool, ReplicaRouter, pin_cache, replicas
+from core.models import Recipe
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.utils import OperationalError
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+ROUTING = {
+    "REPLICAS": ["replica"],
+    "PIN_SECONDS": 10,
+    "MAX_LAG_SECONDS": 1,
+    "CHECK_INTERVAL": 5,
+    "CACHE_ALIAS": "shared",
+}
+
+
+def recipe_reads(queries):
+    return [
+        query for query in queries.captured_queries
+        if query["sql"].startswith("SELECT")
+        and '"core_recipe"' in query["sql"]
+    ]
+
+
+@override_settings(REPLICA_ROUTING=ROUTING)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test reads are routed to the replica alias, a mirror of default"""
+
+    def setUp(self):
+        replicas.clear()
+        pin_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user)}"
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Dal Fry", time_minutes=30, price=4
+        )
+        self.url = reverse("recipe:recipe-detail", args=[self.recipe.id])
+
+    def tearDown(self):
+        replicas.clear()
+
+    def get(self):
+        """Return the recipe reads of a GET on the primary and the replica"""
+
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica"]) as replica:
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return recipe_reads(primary), recipe_reads(replica)
+
+    def test_safe_requests_read_from_replica(self):
+        """Test safe requests read from the replica"""
+
+        primary, replica = self.get()
+
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+    def test_writes_pin_user_to_primary(self):
+        """Test a user's reads stay on the primary after they write"""
+
+        res = self.client.patch(self.url, {"title": "Dal Tadka"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        primary, replica = self.get()
+        self.assertNotEqual(primary, [])
+        self.assertEqual(replica, [])
+
+        # Once the pin expires reads go back to the replica
+        pin_cache().clear()
+        primary, replica = self.get()
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+    def test_reads_after_write_in_safe_request(self):
+        """Test a safe request that writes reads the rest from the primary"""
+
+        url = reverse("recipe:recipe-similar", args=[self.recipe.id])
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica"]) as replica:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        def neighbour_reads(queries):
+            return [
+                query["sql"] for query in queries.captured_queries
+                if query["sql"].startswith("SELECT")
+                and '"core_similarrecipe"."similar_id"' in query["sql"]
+            ]
+
+        # Neighbours are computed on first use, then read back
+        self.assertTrue(any(
+            query["sql"].startswith("INSERT")
+            for query in primary.captured_queries
+        ))
+        self.assertEqual(neighbour_reads(replica), [])
+        self.assertNotEqual(neighbour_reads(primary), [])
+
+    def test_lagging_replica_skipped(self):
+        """Test a replica too far behind is taken out of rotation"""
+
+        with patch.object(ReplicaPool, "lag", return_value=30.0),\
+                self.assertLogs("core.routers", "WARNING"):
+            primary, replica = self.get()
+
+        self.assertNotEqual(primary, [])
+        self.assertEqual(replica, [])
+
+    def test_unavailable_replica_skipped_until_checked(self):
+        """Test a failing replica is skipped until its next check"""
+
+        with patch.object(ReplicaPool, "lag", side_effect=OperationalError),\
+                self.assertLogs("core.routers", "WARNING"):
+            self.get()
+        primary, replica = self.get()
+        self.assertNotEqual(primary, [])
+        self.assertEqual(replica, [])
+
+        with override_settings(
+            REPLICA_ROUTING=dict(ROUTING, CHECK_INTERVAL=0)
+        ):
+            primary, replica = self.get()
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+    def test_outside_requests_primary(self):
+        """Test reads outside of requests and migrations use the primary"""
+
+        self.assertEqual(Recipe.objects.all().db, "default")
+        self.assertIs(
+            ReplicaRouter().allow_migrate("replica", "core"), False
+        )
+
+    def test_local_pin_cache_refused(self):
+        """Test replicas are refused while pins are kept per process"""
+
+        self.assertEqual(check_replica_pin_cache(None), [])
+        with override_settings(
+            REPLICA_ROUTING=dict(ROUTING, CACHE_ALIAS="default")
+        ):
+            errors = check_replica_pin_cache(None)
+        self.assertEqual([error.id for error in errors], ["core.E001"])
+
+        with override_settings(REPLICA_ROUTING=dict(
+            ROUTING, REPLICAS=[], CACHE_ALIAS="default"
+        )):
+            self.assertEqual(check_replica_pin_cache(None), [])
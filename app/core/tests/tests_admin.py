@@ -1,3 +1,8 @@
+from ..admin import EstimatedCountPaginator
+from ..models import Tag, Ingredient, Recipe
+
+from unittest.mock import patch
+
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -40,3 +45,99 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_users_searched_by_email_prefix(self):
+        """Test that users are searched by the start of their email"""
+        url = reverse("admin:core_user_changelist")
+
+        res = self.client.get(url, {"q": "TEST@"})
+        self.assertContains(res, self.user.email)
+
+        res = self.client.get(url, {"q": "django.com"})
+        self.assertNotContains(res, self.user.email)
+
+
+class ScalableAdminTests(TestCase):
+    """Test the admin pages of the big tables"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email="admin@django.com",
+            password="django123"
+        )
+        self.client.force_login(self.admin_user)
+
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name="Rice"
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="Fried Rice",
+            time_minutes=20,
+            price=5,
+            image_status=Recipe.IMAGE_FAILED,
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+        Recipe.objects.create(
+            user=self.admin_user, title="Dal Fry", time_minutes=30, price=4
+        )
+
+    def test_recipes_searched_by_words(self):
+        """Test recipes are searched by title, tag and ingredient words"""
+        url = reverse("admin:core_recipe_changelist")
+
+        res = self.client.get(url, {"q": "vegan"})
+        self.assertContains(res, "Fried Rice")
+        self.assertNotContains(res, "Dal Fry")
+
+    def test_recipes_filtered(self):
+        """Test recipes are filtered by owner and unfinished image"""
+        url = reverse("admin:core_recipe_changelist")
+
+        res = self.client.get(url, {"user__id__exact": self.admin_user.id})
+        self.assertContains(res, "Dal Fry")
+        self.assertNotContains(res, "Fried Rice")
+
+        res = self.client.get(url, {"image_status": Recipe.IMAGE_FAILED})
+        self.assertContains(res, "Fried Rice")
+        self.assertNotContains(res, "Dal Fry")
+
+    def test_tags_listed_with_counts(self):
+        """Test tags are listed with their owner and recipe count"""
+        url = reverse("admin:core_tag_changelist")
+
+        res = self.client.get(url, {"q": "veg"})
+        self.assertContains(res, "Vegan")
+        self.assertContains(res, "?user__id__exact={}".format(self.user.id))
+        self.assertContains(res, '<td class="field-recipe_count">1</td>')
+
+    def test_recipe_change_page_renders(self):
+        """Test the recipe page picks owners and links by autocomplete"""
+        url = reverse("admin:core_recipe_change", args=[self.recipe.id])
+        res = self.client.get(url)
+
+        self.assertContains(res, "vForeignKeyRawIdAdminField")
+        self.assertContains(res, "admin-autocomplete")
+
+        res = self.client.get(
+            reverse("admin:core_ingredient_autocomplete"), {"term": "ric"}
+        )
+        self.assertEqual(res.json()["results"][0]["text"], "Rice")
+
+    @patch.object(EstimatedCountPaginator, "threshold", 1)
+    def test_big_changelist_counts_estimated(self):
+        """Test big changelists are counted from the planner's estimate"""
+        url = reverse("admin:core_recipe_changelist")
+
+        with patch("core.admin.estimated_count", return_value=12345):
+            res = self.client.get(url)
+
+        self.assertEqual(res.context["cl"].result_count, 12345)
+        self.assertContains(res, "Fried Rice")
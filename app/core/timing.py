@@ -0,0 +1,134 @@
+import heapq
+import os
+import sysconfig
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from django.conf import settings
+
+METRICS = "total", "db", "serialize", "render"
+
+# Frames from these are skipped when looking for who ran a statement
+LIBRARY_PATHS = tuple({
+    sysconfig.get_paths()["stdlib"],
+    sysconfig.get_paths()["purelib"],
+    sysconfig.get_paths()["platlib"],
+    os.path.dirname(os.path.abspath(__file__)) + os.sep + "timing.py",
+})
+
+_local = threading.local()
+
+
+def timing_settings():
+    return getattr(settings, "REQUEST_TIMING", {})
+
+
+def call_site():
+    """Return the innermost frame of project code on the stack"""
+
+    for frame in reversed(traceback.extract_stack()):
+        if not frame.filename.startswith(LIBRARY_PATHS):
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return None
+
+
+class Timings:
+    """What one request spent running SQL, serializing and rendering
+
+    Statements at or above `slow_ms` are remembered with their call
+    site, keeping only the `keep` slowest, so looking up call sites
+    costs nothing on requests that don't have slow statements.
+    """
+
+    def __init__(self, keep=0, slow_ms=None):
+        self.queries = 0
+        self.seconds = dict.fromkeys(METRICS, 0.0)
+        self.slowest = []
+        self.keep = keep
+        self.slow = None if slow_ms is None else slow_ms / 1000
+        self.active = set()
+
+    def execute(self, execute, sql, params, many, context):
+        """Time a statement, as a database execute wrapper"""
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.seconds["db"] += elapsed
+
+            if self.keep and self.slow is not None and elapsed >= self.slow:
+                entry = elapsed, sql, call_site()
+                if len(self.slowest) < self.keep:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heappushpop(self.slowest, entry)
+
+    def slowest_first(self):
+        return sorted(self.slowest, reverse=True)
+
+    def server_timing(self, view_name):
+        """Return the Server-Timing header value of the timings"""
+
+        metrics = [
+            f'db;dur={self.seconds["db"] * 1000:.2f};'
+            f'desc="{self.queries} queries"',
+        ] + [
+            f"{name};dur={self.seconds[name] * 1000:.2f}"
+            for name in ("serialize", "render", "total")
+        ]
+        if view_name:
+            metrics.append(f'view;desc="{view_name}"')
+        return ", ".join(metrics)
+
+
+def current():
+    """Return the timings of the request being handled, if any"""
+
+    return getattr(_local, "timings", None)
+
+
+@contextmanager
+def recording(timings):
+    """Make the timings the current ones for the block"""
+
+    previous = current()
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the current request's `name`
+
+    Nested spans of the same name only count once, so a serializer
+    rendering nested serializers isn't counted twice.
+    """
+
+    timings = current()
+    if timings is None or name in timings.active:
+        yield
+        return
+
+    timings.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.seconds[name] += time.perf_counter() - start
+        timings.active.discard(name)
+
+
+class TimedSerializerMixin:
+    """Count the time serializers spend representing data"""
+
+    def to_representation(self, instance):
+        with span("serialize"):
+            return super().to_representation(instance)
@@ -0,0 +1,95 @@
+import hashlib
+import time
+
+from core.metrics import registry
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control,\
+    patch_vary_headers
+from django.utils.http import quote_etag
+
+from rest_framework.response import Response
+
+
+def list_cache():
+    """Return the cache configured by the LIST_CACHE setting"""
+
+    return caches[getattr(settings, "LIST_CACHE", {}).get("ALIAS", "default")]
+
+
+def list_cache_timeout():
+    return getattr(settings, "LIST_CACHE", {}).get("TIMEOUT", 300)
+
+
+def version_key(label, user_id):
+    return f"list-version:{label}:{user_id}"
+
+
+def get_version(label, user_id):
+    """Return the time the user's list of the model last changed"""
+
+    cache = list_cache()
+    key = version_key(label, user_id)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key, time.time())
+    return version
+
+
+def bump_version(label, user_id):
+    """Invalidate every cached list of the model for the user
+
+    The version is bumped again once the transaction commits, so a list
+    read while the transaction was in flight isn't cached as current.
+    """
+
+    def bump():
+        list_cache().set(version_key(label, user_id), time.time(), None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+class CachedListMixin:
+    """Serve the list action from a versioned per-user cache
+
+    Cached lists are keyed by the user, the version of their list and the
+    query params, so bumping the version invalidates all of them at once.
+    Responses carry an ETag for conditional requests. There's no
+    Last-Modified, as whole seconds can't tell apart two changes made
+    within the same second.
+    """
+
+    def list(self, request, *args, **kwargs):
+        label = self.queryset.model._meta.label_lower
+        version = get_version(label, request.user.pk)
+        params = sorted(request.query_params.lists())
+        digest = hashlib.md5(
+            f"{label}:{request.user.pk}:{version!r}:{params}".encode("utf-8")
+        ).hexdigest()
+        etag = quote_etag(digest)
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        key = f"list:{digest}"
+        data = list_cache().get(key)
+        registry.inc(
+            "cache_requests_total", cache="list",
+            result="miss" if data is None else "hit",
+        )
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            list_cache().set(key, data, list_cache_timeout())
+
+        response = Response(data)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Authorization",))
+        return response
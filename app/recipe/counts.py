@@ -0,0 +1,66 @@
+from core.models import Tag, Ingredient, Recipe
+
+from django.db import connection
+
+# Rows are locked in ID order so concurrent changes to the counts of the
+# same popular tags queue up instead of deadlocking
+CHANGE_SQL = """
+UPDATE {table} SET recipe_count = recipe_count + deltas.delta
+FROM (
+    SELECT id FROM {table} WHERE id = ANY(%s) ORDER BY id FOR UPDATE
+) AS locked
+JOIN unnest(%s::integer[], %s::integer[]) AS deltas (id, delta)
+    ON deltas.id = locked.id
+WHERE {table}.id = locked.id
+"""
+
+RECOUNT_SQL = """
+UPDATE {table} SET recipe_count = counted.recipe_count
+FROM (
+    SELECT target.id, count(link.{column}) AS recipe_count
+    FROM {table} AS target
+    LEFT JOIN {through} AS link ON link.{column} = target.id
+    GROUP BY target.id
+) AS counted
+WHERE {table}.id = counted.id
+AND {table}.recipe_count <> counted.recipe_count
+"""
+
+COUNTED = {Tag: Recipe.tags, Ingredient: Recipe.ingredients}
+
+
+def change_counts(model, pks, delta):
+    """Add delta to the recipe counts of the tags or ingredients"""
+
+    if delta:
+        add_counts(model, dict.fromkeys(pks, delta))
+
+
+def add_counts(model, deltas):
+    """Add each delta to the recipe count of the tag or ingredient it maps"""
+
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    pks = list(deltas)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            CHANGE_SQL.format(table=model._meta.db_table),
+            [pks, pks, [deltas[pk] for pk in pks]],
+        )
+
+
+def recount():
+    """Recompute every recipe count from the links, returning the fixes"""
+
+    fixed = 0
+    with connection.cursor() as cursor:
+        for model, descriptor in COUNTED.items():
+            cursor.execute(RECOUNT_SQL.format(
+                table=model._meta.db_table,
+                through=descriptor.through._meta.db_table,
+                column=descriptor.field.m2m_reverse_name(),
+            ))
+            fixed += cursor.rowcount
+    return fixed
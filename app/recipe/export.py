@@ -0,0 +1,77 @@
+import json
+from itertools import islice
+
+from .sparse import drop_fields
+from core.models import RecipeQuerySet
+
+from django.db.models import prefetch_related_objects
+
+from rest_framework.utils.encoders import JSONEncoder
+
+JSON = "json"
+NDJSON = "ndjson"
+CONTENT_TYPES = {
+    JSON: "application/json",
+    NDJSON: "application/x-ndjson",
+}
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from the iterable"""
+
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def serialize_chunks(queryset, serializer_class, context, chunk_size,
+                     fields=None):
+    """Yield the serialized recipes one chunk at a time
+
+    The recipes are read through a server side cursor and each chunk has
+    its relations prefetched on its own, so only one chunk of model
+    instances is held in memory however many recipes there are. Given
+    `fields`, only those are serialized and their relations prefetched.
+    """
+
+    recipes = queryset.iterator(chunk_size=chunk_size)
+    lookups = [
+        lookup for lookup in RecipeQuerySet.related_ids_lookups()
+        if fields is None or lookup.prefetch_to in fields
+    ]
+
+    for chunk in chunked(recipes, chunk_size):
+        prefetch_related_objects(chunk, *lookups)
+        serializer = serializer_class(chunk, many=True, context=context)
+        if fields is not None:
+            drop_fields(serializer, fields)
+        yield serializer.data
+
+
+def encode(item):
+    return json.dumps(
+        item, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def stream_recipes(queryset, serializer_class, context, chunk_size=500,
+                   output=JSON, fields=None):
+    """Yield the recipes encoded as a JSON array or as NDJSON lines"""
+
+    chunks = serialize_chunks(
+        queryset, serializer_class, context, chunk_size, fields
+    )
+
+    if output == NDJSON:
+        for data in chunks:
+            yield b"".join(encode(item) + b"\n" for item in data)
+        return
+
+    separator = b"["
+    for data in chunks:
+        for item in data:
+            yield separator + encode(item)
+            separator = b","
+    yield b"[]" if separator == b"[" else b"]"
@@ -0,0 +1,208 @@
+from collections import defaultdict
+from functools import lru_cache
+
+from core.timing import span
+
+from rest_framework import relations, serializers
+from rest_framework.response import Response
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.BooleanField,
+)
+
+RAW, CONVERT, URL, IDS, NESTED = range(5)
+
+
+class Unsupported(Exception):
+    """The serializer has a field that can't be read from values()"""
+
+
+class FastPlan:
+    """Serialize values() rows the same way a ModelSerializer would
+
+    The fields of the serializer are inspected once. Rows then become
+    dicts by plain lookups, and many to many fields are filled with one
+    query on the through table per page instead of DRF's per field
+    `to_representation` dispatch on model instances.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.columns = [self.pk]
+        self.steps = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only or fields is not None and name not in fields:
+                continue
+            self.steps.append((name, *self.compile(field)))
+
+    def compile(self, field):
+        """Return the kind of step reading the field and its argument"""
+
+        source = field.source
+        if source == "*" or "." in source:
+            raise Unsupported(source)
+
+        if isinstance(field, relations.ManyRelatedField):
+            child = field.child_relation
+            if not isinstance(child, relations.PrimaryKeyRelatedField):
+                raise Unsupported(source)
+            return IDS, self.through(source)
+
+        if isinstance(field, serializers.ListSerializer):
+            child = compile_plan(type(field.child))
+            if child is None or any(
+                kind in (IDS, NESTED) for _, kind, _ in child.steps
+            ):
+                raise Unsupported(source)
+            return NESTED, (self.through(source), child)
+
+        if isinstance(field, (serializers.BaseSerializer,
+                              serializers.SerializerMethodField,
+                              relations.RelatedField)):
+            raise Unsupported(source)
+
+        if source not in self.columns:
+            self.columns.append(source)
+        if isinstance(field, serializers.FileField):
+            return URL, (source, self.model._meta.get_field(source).storage)
+        if isinstance(field, PASSTHROUGH):
+            return RAW, source
+        return CONVERT, (source, field)
+
+    def through(self, source):
+        """Return the through model and columns of a many to many field"""
+
+        m2m = self.model._meta.get_field(source)
+        if not m2m.many_to_many or m2m.auto_created:
+            raise Unsupported(source)
+
+        return (
+            m2m.remote_field.through,
+            f"{m2m.m2m_field_name()}_id",
+            m2m.m2m_reverse_field_name(),
+        )
+
+    def values(self, queryset):
+        """Return the queryset reading only the serialized columns
+
+        The columns the queryset is ordered by are read too, for the
+        paginator to build its cursors from.
+        """
+
+        columns = list(self.columns)
+        for field in queryset.query.order_by:
+            name = field.lstrip("-") if isinstance(field, str) else None
+            if name and name != "pk" and name not in columns:
+                columns.append(name)
+
+        return queryset.prefetch_related(None).values(*columns)
+
+    def fetch(self, kind, arg, pks, request):
+        """Return the related representations of the rows by their pk"""
+
+        related = defaultdict(list)
+        if not pks:
+            return related
+
+        if kind == IDS:
+            through, owner, target = arg
+            links = through.objects.filter(**{f"{owner}__in": pks})\
+                .order_by(f"{target}_id")\
+                .values_list(owner, f"{target}_id")
+            for owner_pk, target_pk in links:
+                related[owner_pk].append(target_pk)
+            return related
+
+        (through, owner, target), child = arg
+        columns = [f"{target}__{column}" for column in child.columns]
+        links = through.objects.filter(**{f"{owner}__in": pks})\
+            .order_by(f"{target}_id")\
+            .values_list(owner, *columns)
+        for owner_pk, *values in links:
+            row = dict(zip(child.columns, values))
+            related[owner_pk].append(child.render(row, {}, request))
+        return related
+
+    def render(self, row, related, request):
+        """Return the representation of a single row"""
+
+        data = {}
+        for name, kind, arg in self.steps:
+            if kind == RAW:
+                data[name] = row[arg]
+            elif kind == URL:
+                value = row[arg[0]]
+                if not value:
+                    data[name] = None
+                    continue
+                url = arg[1].url(value)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                data[name] = url
+            elif kind == CONVERT:
+                value = row[arg[0]]
+                data[name] = None if value is None\
+                    else arg[1].to_representation(value)
+            else:
+                data[name] = related[name].get(row[self.pk], [])
+        return data
+
+    def serialize(self, rows, request=None):
+        """Return the representations of the values() rows"""
+
+        rows = list(rows)
+        pks = [row[self.pk] for row in rows]
+        related = {
+            name: self.fetch(kind, arg, pks, request)
+            for name, kind, arg in self.steps if kind in (IDS, NESTED)
+        }
+
+        with span("serialize"):
+            return [self.render(row, related, request) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def compile_plan(serializer_class, fields=None):
+    """Return the plan of the serializer or None if it isn't supported
+
+    With a tuple of field names the plan only reads and renders those.
+    """
+
+    try:
+        return FastPlan(serializer_class, fields)
+    except Unsupported:
+        return None
+
+
+class FastListMixin:
+    """Serve the list action through the serializer's FastPlan
+
+    Output is identical to the serializer's, just produced without
+    building model instances. Views whose serializer can't be read from
+    values() rows fall back to the regular list.
+    """
+
+    fast_list = True
+
+    def get_plan(self):
+        return compile_plan(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_plan()
+        if not self.fast_list or plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = plan.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.serialize(page, request))
+
+        return Response(plan.serialize(queryset, request))
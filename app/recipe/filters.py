@@ -0,0 +1,227 @@
+from functools import lru_cache
+
+from core.models import Recipe
+
+from django.contrib.postgres.search import SearchQuery, SearchRank,\
+    TrigramSimilarity
+from django.db import connection, connections
+from django.db.models import Count, F, Q, IntegerField
+from django.db.models.functions import Cast
+from django.utils.translation import gettext as _
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+MATCH_ANY = "any"
+MATCH_ALL = "all"
+
+# Ranks are compared as integers so search cursors round trip exactly
+RANK_SCALE = 1000000
+
+
+def params_to_ints(qs):
+    """Convert a comma separated string of IDs to a list of ints"""
+
+    try:
+        return [int(str_id) for str_id in qs.split(",")]
+    except ValueError:
+        raise ValidationError(_("Expected a comma separated list of IDs."))
+
+
+def through_fields(field):
+    """Return the through model and its columns for a Recipe M2M field"""
+
+    m2m = Recipe._meta.get_field(field)
+
+    return (
+        m2m.remote_field.through,
+        f"{m2m.m2m_field_name()}_id",
+        f"{m2m.m2m_reverse_field_name()}_id",
+    )
+
+
+def filter_linked(queryset, field, ids, match=MATCH_ANY):
+    """Filter recipes linked to any or all of the IDs through field
+
+    The links are matched in a semi-join subquery on the through table,
+    so each recipe is returned once without a join or a DISTINCT.
+    """
+
+    through, recipe_column, target_column = through_fields(field)
+    links = through.objects.filter(**{f"{target_column}__in": ids})
+
+    if match == MATCH_ALL:
+        links = links.values(recipe_column)\
+            .annotate(matched=Count(target_column))\
+            .filter(matched=len(set(ids)))
+
+    return queryset.filter(pk__in=links.values(recipe_column))
+
+
+@lru_cache(maxsize=None)
+def column_field(name):
+    """Return a serializer field accepting what fits in a Recipe column"""
+
+    field = Recipe._meta.get_field(name)
+    if field.get_internal_type() == "DecimalField":
+        return serializers.DecimalField(
+            max_digits=field.max_digits, decimal_places=field.decimal_places
+        )
+    min_value, max_value = connection.ops.integer_field_range(
+        field.get_internal_type()
+    )
+    return serializers.IntegerField(min_value=min_value, max_value=max_value)
+
+
+@lru_cache(maxsize=None)
+def trigram_enabled(alias):
+    """Return whether pg_trgm is installed in the database"""
+
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def search_recipes(queryset, text):
+    """Filter recipes matching the words and order them by relevance
+
+    Words are matched against the indexed search vector of the title, tag
+    and ingredient names. When pg_trgm is installed titles similar to the
+    text match too, so a typo still finds the recipe.
+    """
+
+    query = SearchQuery(text, config=Recipe.SEARCH_CONFIG)
+    rank = SearchRank(F("search_vector"), query)
+    match = Q(search_vector=query)
+
+    if trigram_enabled(queryset.db):
+        rank = rank + TrigramSimilarity("title", text)
+        match |= Q(title__trigram_similar=text)
+
+    return queryset.annotate(
+        search_rank=Cast(rank * RANK_SCALE, IntegerField())
+    ).filter(match).order_by("-search_rank", "-id")
+
+
+class LinkedFilter(BaseFilterBackend):
+    """Filter recipes by comma separated tag and ingredient IDs
+
+    Each parameter in the view's `linked_fields` matches recipes linked to
+    any of the IDs, or to all of them when `match=all` is given.
+    """
+
+    match_param = "match"
+
+    def get_match(self, request):
+        match = request.query_params.get(self.match_param, MATCH_ANY)
+
+        if match not in (MATCH_ANY, MATCH_ALL):
+            raise ValidationError({
+                self.match_param: _("Expected 'any' or 'all'."),
+            })
+        return match
+
+    def filter_queryset(self, request, queryset, view):
+        match = self.get_match(request)
+
+        for field in getattr(view, "linked_fields", ()):
+            value = request.query_params.get(field)
+            if value:
+                queryset = filter_linked(
+                    queryset, field, params_to_ints(value), match
+                )
+        return queryset
+
+
+class AssignedOnlyFilter(BaseFilterBackend):
+    """Filter tags or ingredients down to the ones used by a recipe
+
+    Reads the denormalized recipe_count, an indexed column, instead of
+    looking the links up.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        assigned_only = bool(request.query_params.get("assigned_only"))
+
+        if assigned_only:
+            queryset = queryset.filter(recipe_count__gt=0)
+        return queryset
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """Search recipes by words, most relevant first"""
+
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "").strip()
+
+        if text:
+            queryset = search_recipes(queryset, text)
+        return queryset
+
+
+class RecipeRangeFilter(BaseFilterBackend):
+    """Filter recipes by price and time ranges and by a title prefix
+
+    Each parameter is a range on one of the indexed (user, column) pairs,
+    a title prefix included, so the filtered page is an index scan.
+    """
+
+    range_params = {
+        "price_min": ("price__gte", "price"),
+        "price_max": ("price__lte", "price"),
+        "time_max": ("time_minutes__lte", "time_minutes"),
+    }
+    title_param = "title"
+
+    def parse(self, param, value, column):
+        """Return the value as a number the column can be compared with
+
+        Values the column can't hold, like 1e999999 for a price, are
+        rejected, as the database would fail on them.
+        """
+
+        try:
+            return column_field(column).run_validation(value)
+        except ValidationError as exc:
+            raise ValidationError({param: exc.detail})
+
+    def filter_queryset(self, request, queryset, view):
+        for param, (lookup, column) in self.range_params.items():
+            value = request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(
+                    **{lookup: self.parse(param, value, column)}
+                )
+
+        prefix = request.query_params.get(self.title_param)
+        if prefix:
+            queryset = queryset.filter(title__startswith=prefix)
+        return queryset
+
+
+class RecipeOrderingFilter(BaseFilterBackend):
+    """Order by one of the view's indexed `ordering_fields`
+
+    Without the parameter the queryset keeps its ordering, relevance
+    included. Only single fields are accepted so every ordering is read
+    from a (user, field, id) index. Tags and ingredients use it too.
+    """
+
+    ordering_param = "ordering"
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_param)
+        if not ordering:
+            return queryset
+
+        name = ordering[1:] if ordering.startswith("-") else ordering
+        if name not in view.ordering_fields:
+            raise ValidationError({
+                self.ordering_param: _("Expected one of: {choices}.").format(
+                    choices=", ".join(view.ordering_fields)
+                ),
+            })
+        return queryset.order_by(ordering)
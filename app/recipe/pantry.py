@@ -0,0 +1,443 @@
+import threading
+from collections import OrderedDict, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+from .caching import get_version, bump_version
+from core.models import Recipe
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, ExpressionWrapper, F, Q, FloatField
+from django.db.models.functions import Cast
+
+# Version of each user's recipe ingredients, shared by every process
+LABEL = "pantry"
+
+RecipeIngredient = Recipe.ingredients.through
+
+Match = namedtuple("Match", ["recipe_id", "coverage", "missing"])
+
+
+def pantry_settings():
+    return getattr(settings, "PANTRY_INDEX", {})
+
+
+def popcount(bits):
+    return bin(bits).count("1")
+
+
+def bitset(positions, size):
+    """Return the bitset with the positions set"""
+
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def bits_of(bits):
+    """Yield the positions of the set bits"""
+
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class PantryIndex:
+    """Inverted bitset index of the ingredients of one user's recipes
+
+    Every recipe is given a slot, in the order of their IDs, and every
+    ingredient a column: the bitset of the slots of the recipes using it.
+    Recipes are also grouped in bitsets by their number of ingredients.
+
+    Ranking a pantry adds up its columns with bit-sliced counters, which
+    gives the bitset of the recipes having each number of the pantry's
+    ingredients. Walking the (have, total) pairs from the best coverage
+    down then yields recipes in rank order, with a handful of big integer
+    operations instead of a loop over every recipe.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.known = {version}
+        self.bits = {}
+        self.ingredients = []
+        self.columns = defaultdict(int)
+        self.slots = {}
+        self.slot_recipes = []
+        self.rows = {}
+        self.sizes = defaultdict(int)
+        # Whether slots are in the order of recipe IDs
+        self.ordered = True
+        self.queued_recipes = set()
+        self.queued_drops = set()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, user_id):
+        """Load the index of the user's recipes from the database"""
+
+        # Read first, so changes made while loading leave the index stale
+        index = cls(get_version(LABEL, user_id))
+        rows = RecipeIngredient.objects\
+            .filter(recipe__user_id=user_id)\
+            .order_by("recipe_id")\
+            .values_list("recipe_id", "ingredient_id")
+
+        columns = defaultdict(list)
+        sizes = defaultdict(list)
+        for recipe_id, group in groupby(rows.iterator(), itemgetter(0)):
+            slot = index.slots[recipe_id] = len(index.slot_recipes)
+            index.slot_recipes.append(recipe_id)
+            mask = index.mask((i for _, i in group), create=True)
+            index.rows[recipe_id] = mask
+            sizes[popcount(mask)].append(slot)
+            for bit in bits_of(mask):
+                columns[bit].append(slot)
+
+        # Setting bits one at a time would copy the big integers each time
+        size = len(index.slot_recipes)
+        index.columns.update(
+            (bit, bitset(slots, size)) for bit, slots in columns.items()
+        )
+        index.sizes.update(
+            (count, bitset(slots, size)) for count, slots in sizes.items()
+        )
+        return index
+
+    def load(self, links):
+        """Replace the ingredients of the recipes with the links' ones"""
+
+        masks = defaultdict(int)
+        rows = RecipeIngredient.objects.filter(links)\
+            .order_by("recipe_id")\
+            .values_list("recipe_id", "ingredient_id")
+
+        with self.lock:
+            for recipe_id, ingredient_id in rows.iterator():
+                masks[recipe_id] |= self.mask((ingredient_id,), create=True)
+            for recipe_id, mask in masks.items():
+                self._store(recipe_id, mask)
+
+    def reload(self, recipe_ids):
+        """Reread the ingredients of the recipes"""
+
+        with self.lock:
+            for recipe_id in recipe_ids:
+                self._store(recipe_id, 0)
+        self.load(Q(recipe_id__in=recipe_ids))
+
+    def mask(self, ingredient_ids, create=False):
+        """Return the bitset of the ingredients"""
+
+        mask = 0
+        for ingredient_id in ingredient_ids:
+            bit = self.bits.get(ingredient_id)
+            if bit is None:
+                if not create:
+                    continue
+                bit = self.bits[ingredient_id] = len(self.ingredients)
+                self.ingredients.append(ingredient_id)
+            mask |= 1 << bit
+        return mask
+
+    def drop_ingredient(self, ingredient_id):
+        """Unlink the ingredient from every recipe"""
+
+        with self.lock:
+            bit = self.bits.pop(ingredient_id, None)
+            if bit is None:
+                return
+            for slot in bits_of(self.columns.get(bit, 0)):
+                recipe_id = self.slot_recipes[slot]
+                self._store(recipe_id, self.rows[recipe_id] & ~(1 << bit))
+
+    def queue(self, recipe_ids, ingredient_ids):
+        """Queue changes to apply, return whether the queue was empty"""
+
+        with self.lock:
+            empty = not (self.queued_recipes or self.queued_drops)
+            self.queued_recipes.update(recipe_ids)
+            self.queued_drops.update(ingredient_ids)
+        return empty
+
+    def apply_queued(self):
+        """Drop the queued ingredients, then reread the queued recipes"""
+
+        with self.lock:
+            recipe_ids, self.queued_recipes = self.queued_recipes, set()
+            drops, self.queued_drops = self.queued_drops, set()
+
+        for ingredient_id in drops:
+            self.drop_ingredient(ingredient_id)
+        if recipe_ids:
+            self.reload(recipe_ids)
+
+    def _store(self, recipe_id, mask):
+        """Set the ingredient bitset of the recipe, updating the columns"""
+
+        old = self.rows.get(recipe_id, 0)
+        if mask == old:
+            return
+
+        slot = self.slots.get(recipe_id)
+        if slot is None:
+            if self.slot_recipes and recipe_id < self.slot_recipes[-1]:
+                self.ordered = False
+            slot = self.slots[recipe_id] = len(self.slot_recipes)
+            self.slot_recipes.append(recipe_id)
+        flag = 1 << slot
+
+        for bit in bits_of(old ^ mask):
+            self.columns[bit] ^= flag
+        if old:
+            self.sizes[popcount(old)] &= ~flag
+        if mask:
+            self.sizes[popcount(mask)] |= flag
+            self.rows[recipe_id] = mask
+        else:
+            del self.rows[recipe_id]
+
+    def rank(self, ingredient_ids, limit):
+        """Return the best covered recipes, with their missing ingredients"""
+
+        with self.lock:
+            pantry = self.mask(ingredient_ids)
+            columns = [self.columns[bit] for bit in bits_of(pantry)]
+
+            # Bit i of slot s in planes[i] is bit i of the slot's count
+            planes = []
+            for carry in columns:
+                for i, plane in enumerate(planes):
+                    planes[i], carry = plane ^ carry, plane & carry
+                    if not carry:
+                        break
+                if carry:
+                    planes.append(carry)
+
+            covered = 0
+            for column in columns:
+                covered |= column
+
+            pairs = sorted(
+                (-have / total, total - have, have, total)
+                for total, recipes in self.sizes.items() if recipes
+                for have in range(1, min(total, len(columns)) + 1)
+            )
+
+            matches = []
+            for coverage, _, have, total in pairs:
+                if len(matches) >= limit:
+                    break
+                slots = self.sizes[total] & covered
+                for i, plane in enumerate(planes):
+                    slots &= plane if have >> i & 1 else ~plane
+                for recipe_id in self._newest(slots, limit - len(matches)):
+                    missing = self.rows[recipe_id] & ~pantry
+                    matches.append(
+                        Match(recipe_id, -coverage, self._decode(missing))
+                    )
+            return matches
+
+    def _newest(self, slots, count):
+        """Return the IDs of up to count recipes in slots, newest first"""
+
+        if self.ordered:
+            ids = []
+            while slots and len(ids) < count:
+                slot = slots.bit_length() - 1
+                ids.append(self.slot_recipes[slot])
+                slots ^= 1 << slot
+            return ids
+
+        ids = [self.slot_recipes[slot] for slot in bits_of(slots)]
+        return sorted(ids, reverse=True)[:count]
+
+    def _decode(self, mask):
+        """Return the sorted ingredient IDs of a bitset"""
+
+        return sorted(self.ingredients[bit] for bit in bits_of(mask))
+
+
+class PantryIndexes:
+    """The indexes of the most recently ranked users"""
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the user's index if it's current, otherwise None"""
+
+        index = self.peek(user_id)
+        if index is None or index.version != get_version(LABEL, user_id):
+            return None
+        return index
+
+    def peek(self, user_id):
+        """Return the user's index, current or not"""
+
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+            return index
+
+    def put(self, user_id, index):
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+pantry_indexes = PantryIndexes(pantry_settings().get("MAX_USERS", 1000))
+
+_executor = None
+_building = set()
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the thread building indexes, starting it on first use"""
+
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="pantry-index"
+            )
+    return _executor
+
+
+def _build(user_id):
+    try:
+        pantry_indexes.put(user_id, PantryIndex.build(user_id))
+    finally:
+        with _lock:
+            _building.discard(user_id)
+        connection.close()
+
+
+def schedule_build(user_id):
+    """Build the user's index in the background
+
+    With PANTRY_INDEX["EAGER"] set the index is built right away, which
+    is what tests and single process setups want.
+    """
+
+    if pantry_settings().get("EAGER", False):
+        pantry_indexes.put(user_id, PantryIndex.build(user_id))
+        return
+
+    with _lock:
+        if user_id in _building:
+            return
+        _building.add(user_id)
+    get_executor().submit(_build, user_id)
+
+
+def index_changed(user_id, recipe_ids=(), ingredient_ids=()):
+    """Invalidate the user's index and patch it once the change commits
+
+    Other processes rebuild their copy of the index. This process patches
+    its own, unless it has missed a change made elsewhere: the changed
+    recipes are reread and the deleted ingredients dropped. Patches are
+    read from committed rows, so a rolled back change never reaches the
+    index.
+    """
+
+    index = pantry_indexes.peek(user_id)
+    in_sync = index is not None and \
+        get_version(LABEL, user_id) in index.known
+    bump_version(LABEL, user_id)
+
+    if index is None:
+        return
+    if not in_sync:
+        pantry_indexes.discard(user_id)
+        return
+
+    # Later changes in this transaction build on this one
+    index.known.add(get_version(LABEL, user_id))
+
+    if index.queue(recipe_ids, ingredient_ids):
+        def patch():
+            # Runs after the version is bumped again on commit
+            index.apply_queued()
+            index.version = get_version(LABEL, user_id)
+            index.known = {index.version}
+
+        transaction.on_commit(patch)
+
+
+def rank_recipes_sql(user_id, ingredient_ids, limit):
+    """Rank the user's recipes by coverage with a query"""
+
+    counts = RecipeIngredient.objects\
+        .filter(recipe__user_id=user_id)\
+        .values("recipe_id")\
+        .annotate(
+            total=Count("ingredient_id"),
+            have=Count(
+                "ingredient_id", filter=Q(ingredient_id__in=ingredient_ids)
+            ),
+        )\
+        .filter(have__gt=0)\
+        .annotate(
+            coverage=ExpressionWrapper(
+                Cast("have", FloatField()) / F("total"),
+                output_field=FloatField(),
+            ),
+            missing=F("total") - F("have"),
+        )\
+        .order_by("-coverage", "missing", "-recipe_id")\
+        .values_list("recipe_id", "coverage")[:limit]
+    counts = list(counts)
+
+    missing = defaultdict(list)
+    links = RecipeIngredient.objects\
+        .filter(recipe_id__in=[recipe_id for recipe_id, _ in counts])\
+        .exclude(ingredient_id__in=ingredient_ids)\
+        .order_by("ingredient_id")\
+        .values_list("recipe_id", "ingredient_id")
+    for recipe_id, ingredient_id in links:
+        missing[recipe_id].append(ingredient_id)
+
+    return [
+        Match(recipe_id, coverage, missing[recipe_id])
+        for recipe_id, coverage in counts
+    ]
+
+
+def rank_recipes(user_id, ingredient_ids, limit):
+    """Return the user's recipes ranked by how much of them is on hand
+
+    Recipes are scored against the user's in memory index. While it is
+    cold or stale the ranking is queried instead and the index rebuilt.
+    """
+
+    if not ingredient_ids:
+        return []
+
+    index = pantry_indexes.get(user_id)
+    if index is None:
+        schedule_build(user_id)
+        index = pantry_indexes.get(user_id)
+
+    if index is not None:
+        return index.rank(ingredient_ids, limit)
+    return rank_recipes_sql(user_id, ingredient_ids, limit)
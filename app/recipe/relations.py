@@ -0,0 +1,69 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import relations, serializers
+
+
+class OwnedManyRelatedField(relations.ManyRelatedField):
+    """Look up all the submitted IDs with one query
+
+    Every unknown ID is reported at once. Objects already looked up are
+    kept in `resolved`, so items of a bulk request naming the same tags
+    or ingredients only fetch them once.
+    """
+
+    default_error_messages = {
+        "does_not_exist": _("Invalid pks {pk_values} - objects do not exist."),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resolved = {}
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+
+        queryset = self.child_relation.get_queryset()
+        pk = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                pks.append(pk.to_python(item))
+            except (DjangoValidationError, TypeError):
+                self.child_relation.fail(
+                    "incorrect_type", data_type=type(item).__name__
+                )
+        pks = list(dict.fromkeys(pks))
+
+        missing = [value for value in pks if value not in self.resolved]
+        if missing:
+            self.resolved.update(queryset.in_bulk(missing))
+
+        unknown = [value for value in pks if value not in self.resolved]
+        if unknown:
+            self.fail(
+                "does_not_exist", pk_values=", ".join(map(str, unknown))
+            )
+        return [self.resolved[value] for value in pks]
+
+
+class OwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary keys of objects belonging to the requesting user"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in relations.MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return OwnedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get("request")
+        if request is not None:
+            queryset = queryset.filter(user=request.user)
+        return queryset
@@ -1,8 +1,109 @@
-from core.models import Tag, Ingredient, Recipe
+from collections import Counter
+from functools import lru_cache
+
+from .counts import add_counts
+from .relations import OwnedPrimaryKeyRelatedField
+from .stats import USER, Rollup
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+from core.timing import TimedSerializerMixin
+
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models.signals import post_save, m2m_changed
+from django.utils.translation import gettext as _
+
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+def send_created(model, instances):
+    """Send post_save for objects inserted with bulk_create"""
+
+    using = router.db_for_write(model)
+    for instance in instances:
+        post_save.send(
+            sender=model, instance=instance, created=True,
+            update_fields=None, raw=False, using=using,
+        )
+
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """Validate a list payload item by item, keeping the valid items
+
+    Invalid items are collected in `item_errors` with their index instead
+    of failing the whole list. Saving hands the valid items to the child's
+    `create_many` so they are inserted in bulk.
+    """
+
+    max_items = 1000
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            message = _("Expected a non-empty list of items.")
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [message]
+            })
+        if len(data) > self.max_items:
+            message = _("Expected at most {max_items} items.").format(
+                max_items=self.max_items
+            )
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [message]
+            })
+
+        self.item_errors = []
+        items = []
+
+        for index, item in enumerate(data):
+            try:
+                items.append(self.child.run_validation(item))
+            except serializers.ValidationError as exc:
+                self.item_errors.append({"index": index, "errors": exc.detail})
 
+        return items
 
-class TagSerializer(serializers.ModelSerializer):
+    def create(self, validated_data):
+        if not validated_data:
+            return []
+        return self.child.create_many(validated_data)
+
+
+class UpsertByNameMixin:
+    """Bulk create tags or ingredients reusing the user's existing names"""
+
+    def create_many(self, validated_data):
+        """Upsert the items by (user, name) and return them in order"""
+
+        model = self.Meta.model
+        user = validated_data[0]["user"]
+
+        with transaction.atomic():
+            # Serialize concurrent upserts of the same user's names
+            get_user_model().objects.select_for_update()\
+                .filter(pk=user.pk).exists()
+
+            names = list(dict.fromkeys(
+                item["name"] for item in validated_data
+            ))
+            by_name = {}
+            existing = model.objects.filter(user=user, name__in=names)\
+                .order_by("id")
+            for instance in existing:
+                by_name.setdefault(instance.name, instance)
+
+            created = model.objects.bulk_create(
+                model(user=user, name=name)
+                for name in names if name not in by_name
+            )
+            for instance in created:
+                by_name[instance.name] = instance
+            send_created(model, created)
+
+        return [by_name[item["name"]] for item in validated_data]
+
+
+class TagSerializer(UpsertByNameMixin, TimedSerializerMixin,
+                    serializers.ModelSerializer):
 
     class Meta:
         model = Tag
@@ -10,7 +111,8 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = "id",
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UpsertByNameMixin, TimedSerializerMixin,
+                           serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
@@ -18,13 +120,155 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = "id",
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    serializer_related_field = OwnedPrimaryKeyRelatedField
 
     class Meta:
         model = Recipe
         fields = "id", "title", "price", "time_minutes", "tags",\
-            "ingredients", "link",
-        read_only_fields = "id", "user",
+            "ingredients", "link", "image_status", "image_thumbnail",\
+            "image_medium",
+        read_only_fields = "id", "user", "image_status", "image_thumbnail",\
+            "image_medium",
+
+    def create_many(self, validated_data):
+        """Insert the recipes and their links with one query per table
+
+        The stats and recipe counts of the whole batch are written
+        together, the per-recipe signal receivers skip the recipes flagged
+        `_counted_in_bulk`.
+        """
+
+        relations = {
+            "tags": (Recipe.tags, RecipeStats.SCOPE_TAG),
+            "ingredients": (Recipe.ingredients, RecipeStats.SCOPE_INGREDIENT),
+        }
+
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                Recipe(**{
+                    key: value for key, value in item.items()
+                    if key not in relations
+                })
+                for item in validated_data
+            )
+            rollup = Rollup(recipes[0].user_id)
+            rollup.add(
+                (USER,),
+                [(recipe.price, recipe.time_minutes) for recipe in recipes],
+            )
+            for recipe in recipes:
+                recipe._counted_in_bulk = True
+            send_created(Recipe, recipes)
+
+            for field, (descriptor, scope) in relations.items():
+                through = descriptor.through
+                target = descriptor.rel.model
+                target_id = f"{descriptor.field.m2m_reverse_field_name()}_id"
+                linked = [
+                    (recipe, {obj.pk for obj in item.get(field, ())})
+                    for recipe, item in zip(recipes, validated_data)
+                ]
+                through.objects.bulk_create(
+                    through(recipe_id=recipe.pk, **{target_id: pk})
+                    for recipe, pks in linked for pk in pks
+                )
+
+                add_counts(target, Counter(
+                    pk for _, pks in linked for pk in pks
+                ))
+
+                using = router.db_for_write(through)
+                for recipe, pks in linked:
+                    if pks:
+                        rollup.add(
+                            [(scope, pk) for pk in pks],
+                            ((recipe.price, recipe.time_minutes),),
+                        )
+                        m2m_changed.send(
+                            sender=through, instance=recipe,
+                            action="post_add", reverse=False, model=target,
+                            pk_set=pks, using=using,
+                        )
+
+            rollup.save()
+
+        ids = [recipe.pk for recipe in recipes]
+        by_id = Recipe.objects.filter(pk__in=ids).prefetch_related_ids()\
+            .in_bulk()
+        return [by_id[pk] for pk in ids]
+
+    def update(self, instance, validated_data):
+        """Write only the fields and links that changed, if any"""
+
+        links = {
+            field: validated_data.pop(field)
+            for field in ("tags", "ingredients") if field in validated_data
+        }
+        changed = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+
+        with transaction.atomic():
+            if links:
+                # Concurrent updates of the links wait for this one, so the
+                # links read below are still current when written
+                Recipe.objects.select_for_update()\
+                    .filter(pk=instance.pk).exists()
+            if changed:
+                for attr in changed:
+                    setattr(instance, attr, validated_data[attr])
+                instance.save(update_fields=changed)
+
+            for field, objs in links.items():
+                self.update_links(instance, field, {obj.pk for obj in objs})
+
+        return instance
+
+    def update_links(self, instance, field, pks):
+        """Link the recipe to exactly the pks with one delete and one insert
+
+        Sends the same m2m_changed signals as `set()`, only for the links
+        actually removed or added.
+        """
+
+        descriptor = getattr(Recipe, field)
+        through = descriptor.through
+        target = descriptor.rel.model
+        target_id = f"{descriptor.field.m2m_reverse_field_name()}_id"
+        using = router.db_for_write(through)
+
+        # The prefetched links may be stale, and are refetched when the
+        # response is serialized
+        getattr(instance, "_prefetched_objects_cache", {}).pop(field, None)
+        current = set(
+            through.objects.filter(recipe_id=instance.pk)
+            .values_list(target_id, flat=True)
+        )
+
+        def send(action, pk_set):
+            m2m_changed.send(
+                sender=through, instance=instance, action=action,
+                reverse=False, model=target, pk_set=pk_set, using=using,
+            )
+
+        removed = current - pks
+        if removed:
+            send("pre_remove", removed)
+            through.objects.filter(
+                recipe_id=instance.pk, **{f"{target_id}__in": removed}
+            ).delete()
+            send("post_remove", removed)
+
+        added = pks - current
+        if added:
+            send("pre_add", added)
+            through.objects.bulk_create(
+                through(recipe_id=instance.pk, **{target_id: pk})
+                for pk in added
+            )
+            send("post_add", added)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -32,10 +276,35 @@ class RecipeDetailSerializer(RecipeSerializer):
     ingredients = IngredientSerializer(many=True, read_only=True)
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+NESTED_SERIALIZERS = {
+    "tags": TagSerializer,
+    "ingredients": IngredientSerializer,
+}
+
+
+@lru_cache(maxsize=None)
+def expanded_serializer(serializer_class, fields):
+    """Return a subclass of the serializer nesting the given relations
+
+    Classes are cached so each combination is compiled into a FastPlan
+    only once.
+    """
+
+    return type(
+        f"{serializer_class.__name__}Expanded", (serializer_class,), {
+            name: NESTED_SERIALIZERS[name](many=True, read_only=True)
+            for name in fields
+        }
+    )
+
+
+class RecipeImageSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Serializer to upload image to recipes"""
 
     class Meta:
         model = Recipe
-        fields = "id", "image",
-        read_only_fields = "id",
+        fields = "id", "image", "image_status", "image_thumbnail",\
+            "image_medium",
+        read_only_fields = "id", "image_status", "image_thumbnail",\
+            "image_medium",
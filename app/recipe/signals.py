@@ -0,0 +1,285 @@
+from .caching import bump_version
+from .counts import change_counts
+from .pantry import index_changed
+from .similarity import schedule_similar
+from .stats import USER, Rollup, recipe_scopes, recipe_values
+from core.models import Tag, Ingredient, Recipe, RecipeStats, SimilarRecipe
+
+from django.db.models.signals import pre_save, post_save, pre_delete,\
+    post_delete, m2m_changed
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_list(sender, instance, **kwargs):
+    """Invalidate the cached lists of a changed tag or ingredient"""
+
+    bump_version(sender._meta.label_lower, instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_assigned_lists(sender, instance, **kwargs):
+    """Invalidate the assigned tags and ingredients of a deleted recipe"""
+
+    bump_version(Tag._meta.label_lower, instance.user_id)
+    bump_version(Ingredient._meta.label_lower, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_linked_list(sender, instance, action, **kwargs):
+    """Invalidate the assigned tags or ingredients when links change"""
+
+    if action in ("post_add", "post_remove", "post_clear"):
+        model = Tag if sender is Recipe.tags.through else Ingredient
+        bump_version(model._meta.label_lower, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_pantry_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex the recipes whose ingredients changed"""
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        index_changed(instance.user_id, recipe_ids=(instance.pk,))
+    elif action == "post_clear":
+        index_changed(instance.user_id, ingredient_ids=(instance.pk,))
+    else:
+        index_changed(instance.user_id, recipe_ids=pk_set)
+
+
+@receiver(post_delete, sender=Ingredient)
+def update_pantry_ingredient(sender, instance, **kwargs):
+    """Drop a deleted ingredient from the pantry index"""
+
+    index_changed(instance.user_id, ingredient_ids=(instance.pk,))
+
+
+@receiver(post_delete, sender=Recipe)
+def update_pantry_recipe(sender, instance, **kwargs):
+    """Drop a deleted recipe from the pantry index"""
+
+    index_changed(instance.user_id, recipe_ids=(instance.pk,))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_similar_links(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """Refresh the neighbours of recipes whose tags or ingredients changed"""
+
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            schedule_similar(instance.user_id, (instance.pk,))
+    elif action == "pre_clear":
+        field = "tags" if sender is Recipe.tags.through else "ingredients"
+        instance._similar_recipe_ids = list(
+            Recipe.objects.filter(**{field: instance})
+            .values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        schedule_similar(instance.user_id, instance._similar_recipe_ids)
+    elif action in ("post_add", "post_remove"):
+        schedule_similar(instance.user_id, pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+@receiver(pre_delete, sender=Recipe)
+def collect_similar(sender, instance, **kwargs):
+    """Remember the recipes a deletion will change the neighbours of"""
+
+    if sender is Recipe:
+        recipes = SimilarRecipe.objects.filter(similar=instance)\
+            .values_list("recipe_id", flat=True)
+    else:
+        field = "tags" if sender is Tag else "ingredients"
+        recipes = Recipe.objects.filter(**{field: instance})\
+            .values_list("id", flat=True)
+    instance._similar_recipe_ids = list(recipes)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def update_similar(sender, instance, **kwargs):
+    """Refresh the neighbours changed by a deletion"""
+
+    recipe_ids = getattr(instance, "_similar_recipe_ids", ())
+    if recipe_ids:
+        schedule_similar(instance.user_id, recipe_ids)
+
+
+@receiver(pre_save, sender=Recipe)
+def collect_stats(sender, instance, update_fields, **kwargs):
+    """Remember the price and time of a recipe about to be updated"""
+
+    instance._stats_values = None
+    if instance._state.adding or update_fields is not None and not (
+        {"price", "time_minutes"} & set(update_fields)
+    ):
+        return
+
+    instance._stats_values = Recipe.objects.filter(pk=instance.pk)\
+        .values_list("price", "time_minutes").first()
+
+
+@receiver(post_save, sender=Recipe)
+def update_stats(sender, instance, created, **kwargs):
+    """Count a new recipe in the stats or move a changed one"""
+
+    if getattr(instance, "_counted_in_bulk", False):
+        return
+
+    rollup = Rollup(instance.user_id)
+    values = instance.price, instance.time_minutes
+
+    if created:
+        rollup.add((USER,), (values,))
+    else:
+        old = getattr(instance, "_stats_values", None)
+        if old is None or recipe_values(*old) == recipe_values(*values):
+            return
+        scopes = [USER] + recipe_scopes(instance.pk)
+        rollup.add(scopes, (old,), -1)
+        rollup.add(scopes, (values,))
+    rollup.save()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def collect_removed_links(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """Remember the links a removal will actually delete
+
+    Removals only count out the links that existed, so the stats and
+    the recipe counts below use this instead of the requested pk_set.
+    The links are locked until the removal commits, so a concurrent
+    removal of the same links waits and then finds them gone.
+    """
+
+    if action not in ("pre_remove", "pre_clear"):
+        return
+
+    field = "tag" if sender is Recipe.tags.through else "ingredient"
+    own, linked = "recipe_id", f"{field}_id"
+    if reverse:
+        own, linked = linked, own
+    links = sender.objects.filter(**{own: instance.pk})
+    if action == "pre_remove":
+        links = links.filter(**{f"{linked}__in": pk_set})
+    instance._removed_links = set(
+        links.select_for_update().values_list(linked, flat=True)
+    )
+
+
+def changed_links(instance, action, pk_set):
+    """Return how the links of an m2m_changed action changed, if they did"""
+
+    if action == "post_add":
+        return 1, pk_set
+    elif action in ("post_remove", "post_clear"):
+        return -1, instance._removed_links
+    return None, None
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_stats(sender, instance, action, reverse, model, pk_set,
+                        **kwargs):
+    """Count recipes in or out of the stats of their tags or ingredients"""
+
+    if getattr(instance, "_counted_in_bulk", False):
+        return
+
+    sign, pk_set = changed_links(instance, action, pk_set)
+    if not pk_set:
+        return
+
+    if sender is Recipe.tags.through:
+        scope = RecipeStats.SCOPE_TAG
+    else:
+        scope = RecipeStats.SCOPE_INGREDIENT
+
+    rollup = Rollup(instance.user_id)
+    if not reverse:
+        rollup.add(
+            [(scope, pk) for pk in pk_set],
+            ((instance.price, instance.time_minutes),),
+            sign,
+        )
+    else:
+        rollup.add(
+            ((scope, instance.pk),),
+            Recipe.objects.filter(pk__in=pk_set)
+            .values_list("price", "time_minutes"),
+            sign,
+        )
+    rollup.save()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_recipe_counts(sender, instance, action, reverse, model, pk_set,
+                         **kwargs):
+    """Count recipes in or out of the recipe_count of their links"""
+
+    if getattr(instance, "_counted_in_bulk", False):
+        return
+
+    sign, pk_set = changed_links(instance, action, pk_set)
+    if not pk_set:
+        return
+
+    if not reverse:
+        change_counts(model, pk_set, sign)
+    else:
+        change_counts(type(instance), (instance.pk,), sign * len(pk_set))
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_recipe_links(sender, instance, **kwargs):
+    """Remember the tags and ingredients of a recipe about to be deleted"""
+
+    instance._linked_scopes = recipe_scopes(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_stats(sender, instance, **kwargs):
+    """Count a deleted recipe out of its stats"""
+
+    rollup = Rollup(instance.user_id)
+    rollup.add(
+        [USER] + instance._linked_scopes,
+        ((instance.price, instance.time_minutes),),
+        -1,
+    )
+    rollup.save()
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_counts(sender, instance, **kwargs):
+    """Count a deleted recipe out of the recipe_count of its links"""
+
+    for scope, model in ((RecipeStats.SCOPE_TAG, Tag),
+                         (RecipeStats.SCOPE_INGREDIENT, Ingredient)):
+        change_counts(model, (
+            key for kind, key in instance._linked_scopes if kind == scope
+        ), -1)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def remove_linked_stats(sender, instance, **kwargs):
+    """Drop the stats of a deleted tag or ingredient"""
+
+    scope = RecipeStats.SCOPE_TAG if sender is Tag\
+        else RecipeStats.SCOPE_INGREDIENT
+    RecipeStats.objects.filter(
+        user_id=instance.user_id, scope=scope, key=instance.pk
+    ).delete()
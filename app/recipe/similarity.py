@@ -0,0 +1,229 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.models import Recipe, SimilarRecipe
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+logger = logging.getLogger(__name__)
+
+RecipeTag = Recipe.tags.through
+RecipeIngredient = Recipe.ingredients.through
+
+# The tags and ingredients of a user's recipes are the columns of a sparse
+# recipe x feature matrix, each weighted by its kind and by how rare it is
+# in the library. Similarity is the cosine of two rows, and one statement
+# multiplies the rows of many recipes with the whole matrix at once.
+SCORES_SQL = f"""
+WITH features AS (
+    SELECT l.recipe_id, 0 AS kind, l.tag_id AS feature
+    FROM {RecipeTag._meta.db_table} l
+    JOIN {Recipe._meta.db_table} r ON r.id = l.recipe_id
+    WHERE r.user_id = %(user_id)s
+    UNION ALL
+    SELECT l.recipe_id, 1, l.ingredient_id
+    FROM {RecipeIngredient._meta.db_table} l
+    JOIN {Recipe._meta.db_table} r ON r.id = l.recipe_id
+    WHERE r.user_id = %(user_id)s
+), weights AS (
+    SELECT kind, feature,
+        CASE kind WHEN 0 THEN %(tag_weight)s ELSE %(ingredient_weight)s END
+        * ln(1 + (SELECT count(DISTINCT recipe_id) FROM features)::float
+             / count(*)) AS weight
+    FROM features
+    GROUP BY kind, feature
+), weighted AS (
+    SELECT f.recipe_id, f.kind, f.feature, w.weight
+    FROM features f JOIN weights w USING (kind, feature)
+), norms AS (
+    SELECT recipe_id, sqrt(sum(weight * weight)) AS norm
+    FROM weighted
+    GROUP BY recipe_id
+), products AS (
+    SELECT a.recipe_id, b.recipe_id AS similar_id,
+        sum(a.weight * a.weight) AS product
+    FROM weighted a
+    JOIN weighted b
+        ON b.kind = a.kind AND b.feature = a.feature
+        AND b.recipe_id <> a.recipe_id
+    WHERE a.recipe_id = ANY(%(recipe_ids)s)
+    GROUP BY a.recipe_id, b.recipe_id
+), scores AS (
+    SELECT p.recipe_id, p.similar_id,
+        p.product / (na.norm * nb.norm) AS score
+    FROM products p
+    JOIN norms na ON na.recipe_id = p.recipe_id
+    JOIN norms nb ON nb.recipe_id = p.similar_id
+)
+"""
+
+TOP_SQL = SCORES_SQL + """
+SELECT recipe_id, similar_id, score FROM (
+    SELECT *, row_number() OVER (
+        PARTITION BY recipe_id ORDER BY score DESC, similar_id DESC
+    ) AS position
+    FROM scores
+) ranked
+WHERE position <= %(k)s
+"""
+
+ALL_SQL = SCORES_SQL + """
+SELECT recipe_id, similar_id, score FROM scores
+"""
+
+
+def similarity_settings():
+    return getattr(settings, "SIMILAR_RECIPES", {})
+
+
+def top_k():
+    return similarity_settings().get("K", 10)
+
+
+def score(user_id, recipe_ids, sql):
+    """Return (recipe, similar, score) rows of the recipes' similarities"""
+
+    options = similarity_settings()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            "user_id": user_id,
+            "recipe_ids": list(recipe_ids),
+            "tag_weight": options.get("TAG_WEIGHT", 1.0),
+            "ingredient_weight": options.get("INGREDIENT_WEIGHT", 2.0),
+            "k": top_k(),
+        })
+        return cursor.fetchall()
+
+
+def refresh_similar(user_id, recipe_ids):
+    """Recompute the neighbour lists of the recipes"""
+
+    recipe_ids = list(recipe_ids)
+    rows = score(user_id, recipe_ids, TOP_SQL)
+
+    with transaction.atomic():
+        # Concurrent refreshes of the user's lists would insert the same
+        # rows, so they take turns
+        get_user_model().objects.select_for_update()\
+            .filter(pk=user_id).exists()
+        SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+        # Recipes like no other get a marker, so asking for them again
+        # doesn't recompute an empty list
+        listed = {recipe_id for recipe_id, _, _ in rows}
+        alone = Recipe.objects\
+            .filter(user_id=user_id, pk__in=set(recipe_ids) - listed)\
+            .values_list("pk", flat=True)
+        SimilarRecipe.objects.bulk_create([
+            SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                          score=value)
+            for recipe_id, similar_id, value in rows
+        ] + [
+            SimilarRecipe(recipe_id=recipe_id, similar_id=None, score=0)
+            for recipe_id in alone
+        ])
+
+
+def affected_by(user_id, recipe_ids):
+    """Return the recipes whose neighbours may change with the recipes
+
+    Those are the changed recipes, the recipes listing one of them, and
+    the recipes one of them is now closer to than their last neighbour,
+    or that list fewer than K neighbours.
+    Similarity is symmetric, so the scores of the changed recipes against
+    the whole library tell which lists they enter.
+    """
+
+    affected = set(recipe_ids)
+    affected.update(
+        SimilarRecipe.objects.filter(similar_id__in=recipe_ids)
+        .values_list("recipe_id", flat=True)
+    )
+
+    rows = score(user_id, recipe_ids, ALL_SQL)
+    candidates = defaultdict(float)
+    for _, similar_id, value in rows:
+        candidates[similar_id] = max(candidates[similar_id], value)
+
+    lists = SimilarRecipe.objects\
+        .filter(recipe_id__in=candidates)\
+        .values("recipe_id")\
+        .annotate(size=Count("similar"), lowest=Min("score"))
+    # Recipes without a list yet compute theirs when first asked for
+    affected.update(
+        row["recipe_id"] for row in lists
+        if row["size"] < top_k()
+        or candidates[row["recipe_id"]] > row["lowest"]
+    )
+    return affected
+
+
+_executor = None
+_pending = defaultdict(set)
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the thread refreshing neighbours, starting it on first use"""
+
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="similar-recipes"
+            )
+    return _executor
+
+
+def _drain(user_id):
+    """Refresh the neighbours affected by the user's pending changes"""
+
+    with _lock:
+        recipe_ids = _pending.pop(user_id, set())
+    if not recipe_ids:
+        return
+
+    try:
+        refresh_similar(user_id, affected_by(user_id, recipe_ids))
+    except Exception:
+        logger.exception("Failed to refresh similar recipes of %s", user_id)
+    finally:
+        # Worker threads hold their own connection, don't leak it
+        connection.close()
+
+
+def schedule_similar(user_id, recipe_ids):
+    """Refresh the neighbours affected by changed recipes once committed
+
+    Changes queue up per user and are refreshed together by a background
+    thread. With SIMILAR_RECIPES["EAGER"] set they are refreshed right
+    away, which is what tests and single process setups want.
+    """
+
+    if similarity_settings().get("EAGER", False):
+        refresh_similar(user_id, affected_by(user_id, recipe_ids))
+        return
+
+    with _lock:
+        _pending[user_id].update(recipe_ids)
+    transaction.on_commit(lambda: get_executor().submit(_drain, user_id))
+
+
+def similar_recipes(recipe, limit):
+    """Return the IDs and scores of the recipe's closest recipes"""
+
+    links = SimilarRecipe.objects.filter(recipe=recipe)
+    if not links.exists():
+        # Not computed yet, lists found empty keep a marker row
+        refresh_similar(recipe.user_id, (recipe.pk,))
+
+    return list(
+        links.filter(similar__isnull=False)
+        .order_by("-score", "-similar_id")
+        .values_list("similar_id", "score")[:limit]
+    )
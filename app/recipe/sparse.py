@@ -0,0 +1,140 @@
+from functools import lru_cache
+
+from .fast import compile_plan
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.translation import gettext as _
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS = "fields"
+EXCLUDE = "exclude"
+
+
+@lru_cache(maxsize=None)
+def readable_fields(serializer_class):
+    """Return the names of the fields the serializer renders"""
+
+    return tuple(
+        name for name, field in serializer_class().fields.items()
+        if not field.write_only
+    )
+
+
+def parse_fields(params, serializer_class):
+    """Return the fields asked for by `fields` and `exclude`, or None
+
+    Names keep the serializer's order whatever order they're given in.
+    """
+
+    available = readable_fields(serializer_class)
+    fields = available
+
+    for param in (FIELDS, EXCLUDE):
+        value = params.get(param)
+        if value is None:
+            continue
+
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        if not names <= set(available):
+            raise ValidationError({
+                param: _("Expected one of: {choices}.").format(
+                    choices=", ".join(available)
+                ),
+            })
+        if param == FIELDS:
+            fields = tuple(name for name in fields if name in names)
+        else:
+            fields = tuple(name for name in fields if name not in names)
+
+    return None if fields == available else fields
+
+
+def model_columns(model, serializer_class, fields):
+    """Return the model fields backing the serializer fields"""
+
+    serializer = serializer_class()
+    columns = []
+
+    for name in fields:
+        try:
+            field = model._meta.get_field(serializer.fields[name].source)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and not field.many_to_many:
+            columns.append(field.name)
+    return columns
+
+
+def drop_fields(serializer, fields):
+    """Remove the fields that weren't asked for from the serializer"""
+
+    target = getattr(serializer, "child", serializer)
+    for name in list(target.fields):
+        if name not in fields:
+            target.fields.pop(name)
+    return serializer
+
+
+class SparseFieldsMixin:
+    """Read and render only the fields asked for with ?fields= or ?exclude=
+
+    Unrequested fields are dropped from the serializer, their columns are
+    deferred with `.only()` and prefetches of unrequested relations are
+    skipped. Fast lists compile a plan for just the requested fields.
+    Writes always validate and render every field.
+    """
+
+    def get_requested_fields(self):
+        """Return the names of the fields to render, or None for all"""
+
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+
+        if not hasattr(self, "_requested_fields"):
+            self._requested_fields = parse_fields(
+                self.request.query_params, self.get_serializer_class()
+            )
+        return self._requested_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+
+        fields = self.get_requested_fields()
+        if fields is not None:
+            drop_fields(serializer, fields)
+        return serializer
+
+    def get_plan(self):
+        return compile_plan(
+            self.get_serializer_class(), self.get_requested_fields()
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+
+        prefetches = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, "prefetch_to", lookup).split("__")[0]
+            in fields
+        ]
+        # The paginator reads the ordering columns of every row
+        ordering = [
+            name.lstrip("-") for name in queryset.query.order_by
+            if isinstance(name, str)
+        ]
+        columns = model_columns(
+            queryset.model, self.get_serializer_class(), fields
+        ) + [
+            name for name in ordering
+            if name not in queryset.query.annotations
+        ]
+
+        return queryset.prefetch_related(None)\
+            .prefetch_related(*prefetches)\
+            .only(*columns)
@@ -0,0 +1,277 @@
+from bisect import bisect_right
+from decimal import Decimal
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+from django.db import connection, transaction
+
+CENT = Decimal("0.01")
+
+# Lower bounds of the histogram buckets. Medians are interpolated within
+# their bucket, so the price buckets are finer where most recipes are.
+PRICE_BUCKETS = tuple(Decimal(bound) for bound in (
+    0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 40, 50, 60, 80, 100,
+    120, 150, 200, 250, 300, 400, 500, 600, 800, 1000, 1500, 2000, 3000,
+    5000,
+))
+TIME_BUCKETS = (0, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 480)
+
+USER = RecipeStats.SCOPE_USER, 0
+
+RecipeTag = Recipe.tags.through
+RecipeIngredient = Recipe.ingredients.through
+
+STATS_TABLE = RecipeStats._meta.db_table
+COLUMNS = "user_id", "scope", "key", "count", "price_total", "time_total",\
+    "price_histogram", "time_histogram"
+ROW = "(%s, %s, %s, %s, %s::numeric, %s, %s::integer[], %s::integer[])"
+
+# Adds rows of deltas to the stats, creating the missing ones. Histograms
+# are added element by element.
+UPSERT_SQL = f"""
+INSERT INTO {STATS_TABLE} AS s ({", ".join(COLUMNS)})
+VALUES {{rows}}
+ON CONFLICT (user_id, scope, key) DO UPDATE SET
+    count = s.count + excluded.count,
+    price_total = s.price_total + excluded.price_total,
+    time_total = s.time_total + excluded.time_total,
+    price_histogram = ARRAY(
+        SELECT a + b
+        FROM unnest(s.price_histogram, excluded.price_histogram)
+            WITH ORDINALITY AS t(a, b, n)
+        ORDER BY n
+    ),
+    time_histogram = ARRAY(
+        SELECT a + b
+        FROM unnest(s.time_histogram, excluded.time_histogram)
+            WITH ORDINALITY AS t(a, b, n)
+        ORDER BY n
+    )
+"""
+
+# Applies deltas to existing stats only, so removing recipes never
+# creates stats, e.g. for a user being deleted
+UPDATE_SQL = f"""
+UPDATE {STATS_TABLE} AS s SET
+    count = s.count + d.count,
+    price_total = s.price_total + d.price_total,
+    time_total = s.time_total + d.time_total,
+    price_histogram = ARRAY(
+        SELECT a + b
+        FROM unnest(s.price_histogram, d.price_histogram)
+            WITH ORDINALITY AS t(a, b, n)
+        ORDER BY n
+    ),
+    time_histogram = ARRAY(
+        SELECT a + b
+        FROM unnest(s.time_histogram, d.time_histogram)
+            WITH ORDINALITY AS t(a, b, n)
+        ORDER BY n
+    )
+FROM (VALUES {{rows}}) AS d ({", ".join(COLUMNS)})
+WHERE s.user_id = d.user_id AND s.scope = d.scope AND s.key = d.key
+"""
+
+# Counts recipes by scope and bucket, the stats are folded from the groups
+REBUILD_SQL = f"""
+SELECT r.user_id, {{key}},
+    width_bucket(r.price, %(price)s::numeric[]),
+    width_bucket(r.time_minutes::integer, %(time)s::integer[]),
+    count(*), sum(r.price), sum(r.time_minutes)
+FROM {Recipe._meta.db_table} r {{join}}
+GROUP BY 1, 2, 3, 4
+"""
+
+REBUILD_SCOPES = (
+    (RecipeStats.SCOPE_USER, "0", ""),
+    (RecipeStats.SCOPE_TAG, "l.tag_id",
+     f"JOIN {RecipeTag._meta.db_table} l ON l.recipe_id = r.id"),
+    (RecipeStats.SCOPE_INGREDIENT, "l.ingredient_id",
+     f"JOIN {RecipeIngredient._meta.db_table} l ON l.recipe_id = r.id"),
+)
+
+
+def bucket(bounds, value):
+    return bisect_right(bounds, value) - 1
+
+
+def recipe_values(price, time_minutes):
+    """Return the price and time of a recipe as they are stored"""
+
+    return Decimal(str(price)).quantize(CENT), int(time_minutes)
+
+
+def empty_stats(user_id, scope, key):
+    return RecipeStats(
+        user_id=user_id,
+        scope=scope,
+        key=key,
+        count=0,
+        price_total=Decimal(0),
+        time_total=0,
+        price_histogram=[0] * len(PRICE_BUCKETS),
+        time_histogram=[0] * len(TIME_BUCKETS),
+    )
+
+
+def recipe_scopes(recipe_id):
+    """Return the tag and ingredient scopes of a recipe"""
+
+    return [
+        (RecipeStats.SCOPE_TAG, tag_id)
+        for tag_id in RecipeTag.objects.filter(recipe_id=recipe_id)
+        .values_list("tag_id", flat=True)
+    ] + [
+        (RecipeStats.SCOPE_INGREDIENT, ingredient_id)
+        for ingredient_id in RecipeIngredient.objects
+        .filter(recipe_id=recipe_id)
+        .values_list("ingredient_id", flat=True)
+    ]
+
+
+class Rollup:
+    """Changes to a user's stats, written together in one statement"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.deltas = {}
+
+    def add(self, scopes, recipes, sign=1):
+        """Count the (price, time) of recipes in, or out with sign -1"""
+
+        recipes = [recipe_values(*values) for values in recipes]
+        for scope, key in scopes:
+            delta = self.deltas.get((scope, key))
+            if delta is None:
+                delta = self.deltas[scope, key] = empty_stats(
+                    self.user_id, scope, key
+                )
+            for price, time_minutes in recipes:
+                delta.count += sign
+                delta.price_total += sign * price
+                delta.time_total += sign * time_minutes
+                delta.price_histogram[bucket(PRICE_BUCKETS, price)] += sign
+                delta.time_histogram[bucket(TIME_BUCKETS, time_minutes)]\
+                    += sign
+
+    def save(self):
+        """Apply the changes to the stats"""
+
+        added, changed = [], []
+        for delta in self.deltas.values():
+            (added if delta.count > 0 else changed).append(
+                [getattr(delta, column) for column in COLUMNS]
+            )
+
+        with connection.cursor() as cursor:
+            for sql, rows in ((UPSERT_SQL, added), (UPDATE_SQL, changed)):
+                if rows:
+                    cursor.execute(
+                        sql.format(rows=", ".join([ROW] * len(rows))),
+                        [value for row in rows for value in row],
+                    )
+        self.deltas = {}
+
+
+def rebuild_stats():
+    """Recompute the stats of every user from their recipes"""
+
+    stats = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for scope, key, join in REBUILD_SCOPES:
+            cursor.execute(REBUILD_SQL.format(key=key, join=join), {
+                "price": list(PRICE_BUCKETS),
+                "time": list(TIME_BUCKETS),
+            })
+            for user_id, key_id, price_bucket, time_bucket, count,\
+                    price_total, time_total in cursor.fetchall():
+                row = stats.get((user_id, scope, key_id))
+                if row is None:
+                    row = stats[user_id, scope, key_id] = empty_stats(
+                        user_id, scope, key_id
+                    )
+                row.count += count
+                row.price_total += price_total
+                row.time_total += time_total
+                row.price_histogram[price_bucket - 1] += count
+                row.time_histogram[time_bucket - 1] += count
+
+        RecipeStats.objects.all().delete()
+        RecipeStats.objects.bulk_create(stats.values(), batch_size=1000)
+    return len(stats)
+
+
+def median(bounds, histogram, count):
+    """Estimate the median by interpolating within its bucket"""
+
+    middle = count / 2
+    for i, size in enumerate(histogram):
+        if size and middle <= size:
+            low = float(bounds[i])
+            if i + 1 == len(bounds):
+                return low
+            return low + (float(bounds[i + 1]) - low) * middle / size
+        middle -= size
+    return float(bounds[-1])
+
+
+def distribution(bounds, histogram, total, count, digits):
+    if not count:
+        return {"average": None, "median": None, "histogram": histogram}
+
+    return {
+        "average": round(float(total) / count, digits),
+        "median": round(median(bounds, histogram, count), digits),
+        "histogram": histogram,
+    }
+
+
+def summarize(stats):
+    """Return the count, averages, medians and histograms of stats"""
+
+    return {
+        "count": stats.count,
+        "price": distribution(
+            PRICE_BUCKETS, stats.price_histogram, stats.price_total,
+            stats.count, 2
+        ),
+        "time_minutes": distribution(
+            TIME_BUCKETS, stats.time_histogram, stats.time_total,
+            stats.count, 1
+        ),
+    }
+
+
+def user_stats(user):
+    """Return the stats of the user's recipes, tags and ingredients"""
+
+    stats = {
+        (row.scope, row.key): row
+        for row in RecipeStats.objects.filter(user=user, count__gt=0)
+    }
+    tags = dict(
+        Tag.objects.filter(user=user).values_list("id", "name")
+    )
+    ingredients = dict(
+        Ingredient.objects.filter(user=user).values_list("id", "name")
+    )
+
+    return {
+        "buckets": {
+            "price": PRICE_BUCKETS,
+            "time_minutes": TIME_BUCKETS,
+        },
+        "recipes": summarize(
+            stats.get(USER) or empty_stats(user.pk, *USER)
+        ),
+        "tags": [
+            dict(id=key, name=tags[key], **summarize(row))
+            for (scope, key), row in sorted(stats.items())
+            if scope == RecipeStats.SCOPE_TAG and key in tags
+        ],
+        "ingredients": [
+            {"id": key, "name": ingredients[key], "count": row.count}
+            for (scope, key), row in sorted(stats.items())
+            if scope == RecipeStats.SCOPE_INGREDIENT and key in ingredients
+        ],
+    }
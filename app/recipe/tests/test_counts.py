@@ -0,0 +1,191 @@
+import threading
+import time
+
+from ..counts import recount
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TAGS_URL = reverse("recipe:tag-list")
+
+
+def counts(model):
+    return dict(model.objects.values_list("name", "recipe_count"))
+
+
+class RecipeCountTests(TestCase):
+    """Test the recipe counts of tags and ingredients kept by signals"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.curry = Tag.objects.create(user=self.user, name="Curry")
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = Tag.objects.create(user=self.user, name="Quick")
+        self.rice = Ingredient.objects.create(user=self.user, name="Rice")
+
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.user, title=title, time_minutes=20, price=5
+            )
+            for title in ("Dal Rice", "Dal Fry", "Biryani")
+        ]
+        for recipe in self.recipes:
+            recipe.tags.add(self.curry)
+        self.recipes[0].tags.add(self.vegan)
+        self.recipes[0].ingredients.add(self.rice)
+
+    def test_links_counted(self):
+        """Test adding, removing and clearing links change the counts"""
+
+        self.assertEqual(counts(Tag), {"Curry": 3, "Vegan": 1, "Quick": 0})
+        self.assertEqual(counts(Ingredient), {"Rice": 1})
+
+        # Removing a link that doesn't exist changes nothing
+        self.recipes[1].tags.remove(self.curry, self.vegan)
+        self.curry.recipe_set.add(self.recipes[1])
+        self.quick.recipe_set.add(*self.recipes)
+        self.assertEqual(counts(Tag), {"Curry": 3, "Vegan": 1, "Quick": 3})
+
+        self.recipes[0].tags.clear()
+        self.quick.recipe_set.clear()
+        self.assertEqual(counts(Tag), {"Curry": 2, "Vegan": 0, "Quick": 0})
+
+    def test_renaming_keeps_count(self):
+        """Test saving a tag read before new links keeps their count"""
+
+        self.vegan.recipe_set.add(self.recipes[1])
+        self.vegan.name = "Plant Based"
+        self.vegan.save()
+
+        self.assertEqual(counts(Tag)["Plant Based"], 2)
+
+    def test_deleted_recipes_counted_out(self):
+        """Test deleting recipes counts them out of their links"""
+
+        self.recipes[0].delete()
+        Recipe.objects.filter(pk=self.recipes[1].pk).delete()
+
+        self.assertEqual(counts(Tag), {"Curry": 1, "Vegan": 0, "Quick": 0})
+        self.assertEqual(counts(Ingredient), {"Rice": 0})
+
+    def test_api_writes_counted(self):
+        """Test recipes created and updated through the API are counted"""
+
+        res = self.client.post(reverse("recipe:recipe-bulk-create"), [
+            {"title": "Khichdi", "time_minutes": 30, "price": "3.00",
+             "tags": [self.quick.id], "ingredients": [self.rice.id]},
+        ], format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        detail = reverse("recipe:recipe-detail", args=[self.recipes[2].id])
+        self.client.patch(detail, {"tags": [self.quick.id]}, format="json")
+
+        self.assertEqual(counts(Tag), {"Curry": 2, "Vegan": 1, "Quick": 2})
+        self.assertEqual(counts(Ingredient), {"Rice": 2})
+
+    def test_bulk_create_counted_per_table(self):
+        """Test recipes created in bulk change each table's counts once"""
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(reverse("recipe:recipe-bulk-create"), [
+                {"title": "Khichdi", "time_minutes": 30, "price": "3.00",
+                 "tags": [self.quick.id, self.curry.id],
+                 "ingredients": [self.rice.id]},
+                {"title": "Dal", "time_minutes": 20, "price": "2.00",
+                 "tags": [self.quick.id]},
+            ] * 10, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        count_writes = [
+            query["sql"] for query in queries
+            if "SET recipe_count = recipe_count +" in query["sql"]
+        ]
+        self.assertEqual(len(count_writes), 2)
+        self.assertEqual(counts(Tag), {"Curry": 13, "Vegan": 1, "Quick": 20})
+        self.assertEqual(counts(Ingredient), {"Rice": 11})
+
+    def test_ordered_by_recipe_count(self):
+        """Test tags can be listed most used first"""
+
+        res = self.client.get(TAGS_URL, {"ordering": "-recipe_count"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag["name"] for tag in res.data["results"]],
+            ["Curry", "Vegan", "Quick"],
+        )
+
+        for ordering in ("price", "--recipe_count"):
+            res = self.client.get(TAGS_URL, {"ordering": ordering})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recount(self):
+        """Test recounting repairs counts that drifted"""
+
+        Tag.objects.filter(pk=self.curry.pk).update(recipe_count=7)
+        Recipe.tags.through.objects.filter(tag=self.vegan).delete()
+
+        self.assertEqual(recount(), 2)
+        self.assertEqual(counts(Tag), {"Curry": 3, "Vegan": 0, "Quick": 0})
+        self.assertEqual(recount(), 0)
+
+
+class ConcurrentRemovalTests(TransactionTestCase):
+    """Test concurrent removals of the same link count it out once"""
+
+    def test_link_removed_twice(self):
+        user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        tag = Tag.objects.create(user=user, name="Curry")
+        recipe = Recipe.objects.create(
+            user=user, title="Dal Fry", time_minutes=20, price=5
+        )
+        recipe.tags.add(tag)
+
+        removed = threading.Event()
+        commit = threading.Event()
+        errors = []
+
+        def remove(wait):
+            try:
+                with transaction.atomic():
+                    Recipe.objects.get(pk=recipe.pk).tags.remove(tag)
+                    removed.set()
+                    if wait:
+                        commit.wait(5)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=remove, args=(True,))
+        first.start()
+        removed.wait(5)
+        # The second removal waits on the first one's uncommitted delete
+        second = threading.Thread(target=remove, args=(False,))
+        second.start()
+        time.sleep(0.2)
+        commit.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(counts(Tag), {"Curry": 0})
+        self.assertFalse(RecipeStats.objects.filter(
+            scope=RecipeStats.SCOPE_TAG, key=tag.pk, count__gt=0
+        ).exists())
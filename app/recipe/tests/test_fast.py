@@ -0,0 +1,111 @@
+from ..fast import compile_plan
+from ..serializers import TagSerializer, IngredientSerializer,\
+    RecipeSerializer, RecipeDetailSerializer, RecipeImageSerializer
+from core.models import Tag, Ingredient, Recipe
+
+from django.test import TestCase, RequestFactory
+from django.contrib.auth import get_user_model
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+
+class FastPlanTests(TestCase):
+    """Test serializing values() rows through a FastPlan"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.request = Request(RequestFactory().get("/"))
+
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ("Vegan", "Lunch", "Spicy")
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ("Salt", "Chilli")
+        ]
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title="Chilli Paneer",
+            time_minutes=25,
+            price="12.50",
+            link="https://example.com/paneer",
+            image="uploads/recipe/paneer.jpg",
+            image_status=Recipe.IMAGE_READY,
+            image_thumbnail="uploads/recipe/paneer-thumbnail.webp",
+        )
+        recipe.tags.add(tags[2], tags[0])
+        recipe.ingredients.add(*ingredients)
+        Recipe.objects.create(
+            user=self.user,
+            title="Plain Rice",
+            time_minutes=15,
+            price=3,
+        )
+
+    def assertRendersIdentically(self, serializer_class, queryset):
+        """Assert the plan renders the same JSON bytes as the serializer"""
+
+        plan = compile_plan(serializer_class)
+        expected = serializer_class(
+            queryset, many=True, context={"request": self.request}
+        ).data
+        fast = plan.serialize(plan.values(queryset), self.request)
+
+        self.assertEqual(
+            JSONRenderer().render(fast),
+            JSONRenderer().render(expected)
+        )
+
+    def test_tags_and_ingredients(self):
+        """Test tags and ingredients render identically"""
+
+        self.assertRendersIdentically(
+            TagSerializer, Tag.objects.order_by("-name")
+        )
+        self.assertRendersIdentically(
+            IngredientSerializer, Ingredient.objects.order_by("-name")
+        )
+
+    def test_recipes(self):
+        """Test recipes with their related IDs render identically"""
+
+        self.assertRendersIdentically(
+            RecipeSerializer,
+            Recipe.objects.order_by("-id").prefetch_related_ids()
+        )
+
+    def test_recipe_details(self):
+        """Test recipes with nested tags and ingredients render identically"""
+
+        self.assertRendersIdentically(
+            RecipeDetailSerializer,
+            Recipe.objects.order_by("-id").prefetch_related_names()
+        )
+
+    def test_images(self):
+        """Test image URLs render identically"""
+
+        self.assertRendersIdentically(
+            RecipeImageSerializer, Recipe.objects.order_by("id")
+        )
+
+    def test_unsupported_serializer(self):
+        """Test serializers with computed fields have no plan"""
+
+        class ComputedSerializer(serializers.ModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Tag
+                fields = "id", "label",
+
+            def get_label(self, tag):
+                return tag.name.upper()
+
+        self.assertIsNone(compile_plan(ComputedSerializer))
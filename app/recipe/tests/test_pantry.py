@@ -0,0 +1,145 @@
+from ..pantry import PantryIndex, pantry_indexes, rank_recipes,\
+    rank_recipes_sql
+from core.models import Ingredient, Recipe
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+PANTRY_URL = reverse("recipe:recipe-pantry")
+
+
+def sample_library(user):
+    """Create recipes covered differently by salt, rice and dal"""
+
+    salt, rice, dal, ghee = (
+        Ingredient.objects.create(user=user, name=name)
+        for name in ("Salt", "Rice", "Dal", "Ghee")
+    )
+    recipes = {}
+    for title, ingredients in (
+        ("Khichdi", (salt, rice, dal)),
+        ("Ghee Rice", (salt, rice, ghee)),
+        ("Dal Tadka", (salt, dal, ghee)),
+        ("Ghee", (ghee,)),
+    ):
+        recipe = Recipe.objects.create(
+            user=user, title=title, time_minutes=20, price=5
+        )
+        recipe.ingredients.add(*ingredients)
+        recipes[title] = recipe
+
+    return (salt, rice, dal, ghee), recipes
+
+
+@override_settings(PANTRY_INDEX={"EAGER": True})
+class PantryAPITests(TestCase):
+    """Test ranking recipes by the ingredients on hand"""
+
+    def setUp(self):
+        pantry_indexes.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ingredients, self.recipes = sample_library(self.user)
+
+    def test_rank_by_coverage(self):
+        """Test recipes are ranked by coverage with what's missing"""
+
+        salt, rice, dal, ghee = self.ingredients
+
+        res = self.client.get(
+            PANTRY_URL, {"ingredients": f"{salt.id},{rice.id},{dal.id}"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ranked = [
+            (match["recipe"]["title"], match["missing"])
+            for match in res.data["results"]
+        ]
+        self.assertEqual(ranked, [
+            ("Khichdi", []),
+            ("Dal Tadka", [ghee.id]),
+            ("Ghee Rice", [ghee.id]),
+        ])
+        self.assertEqual(res.data["results"][1]["coverage"], 2 / 3)
+        self.assertEqual(res.data["results"][1]["missing_count"], 1)
+
+    def test_index_follows_changes(self):
+        """Test the ranking reflects ingredients changed after indexing"""
+
+        salt, rice, dal, ghee = self.ingredients
+        self.client.get(PANTRY_URL, {"ingredients": f"{ghee.id}"})
+
+        self.recipes["Khichdi"].ingredients.add(ghee)
+        self.recipes["Ghee"].delete()
+        res = self.client.get(PANTRY_URL, {"ingredients": f"{ghee.id}"})
+
+        titles = [match["recipe"]["title"] for match in res.data["results"]]
+        self.assertEqual(titles, ["Dal Tadka", "Ghee Rice", "Khichdi"])
+
+    def test_recipes_limited_to_user(self):
+        """Test only the user's own recipes are ranked"""
+
+        other = get_user_model().objects.create_user(
+            "other@django.com", "django123"
+        )
+        (salt, *_), _ = sample_library(other)
+
+        res = self.client.get(PANTRY_URL, {"ingredients": f"{salt.id}"})
+
+        self.assertEqual(res.data["results"], [])
+
+    def test_invalid_ingredients(self):
+        """Test ingredients that aren't IDs are rejected"""
+
+        res = self.client.get(PANTRY_URL, {"ingredients": "salt"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_matches_index(self):
+        """Test the cold path query ranks like the index"""
+
+        salt, rice, dal, ghee = self.ingredients
+        for pantry in ([salt.id], [rice.id, ghee.id], [dal.id, 0]):
+            index = PantryIndex.build(self.user.pk)
+            self.assertEqual(
+                rank_recipes_sql(self.user.pk, pantry, 10),
+                index.rank(pantry, 10),
+            )
+
+
+class PantryIndexPatchTests(TransactionTestCase):
+    """Test committed changes patch the index in place"""
+
+    def setUp(self):
+        pantry_indexes.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+
+    @override_settings(PANTRY_INDEX={"EAGER": True})
+    def test_patched_on_commit(self):
+        """Test the index is patched instead of rebuilt"""
+
+        (salt, rice, dal, ghee), recipes = sample_library(self.user)
+        rank_recipes(self.user.pk, [ghee.id], 10)
+        index = pantry_indexes.get(self.user.pk)
+
+        recipes["Khichdi"].ingredients.add(ghee)
+        ghee.delete()
+        matches = rank_recipes(self.user.pk, [rice.id], 10)
+
+        self.assertIs(pantry_indexes.get(self.user.pk), index)
+        self.assertEqual(
+            [match.recipe_id for match in matches],
+            [recipes["Ghee Rice"].id, recipes["Khichdi"].id],
+        )
+        self.assertEqual(matches[0].missing, [salt.id])
@@ -1,19 +1,32 @@
 from ..serializers import RecipeSerializer, RecipeDetailSerializer
+from ..views import RecipeViewSet
 from core.models import Recipe, Tag, Ingredient
 
+from core.images import process_recipe_image
+
+from django.core.files.base import ContentFile
+from django.db import connection
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
+import json
 import os
 import tempfile
 
+from unittest.mock import patch
+
 from PIL import Image
 
 RECIPES_URL = reverse("recipe:recipe-list")
+BULK_RECIPES_URL = reverse("recipe:recipe-bulk-create")
+EXPORT_URL = reverse("recipe:recipe-export")
+STATS_URL = reverse("recipe:recipe-stats")
 
 
 def upload_image_url(recipe_id):
@@ -92,7 +105,61 @@ class PrivateRecipeAPITest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_list_recipes_fixed_number_of_queries(self):
+        """Test listing recipes doesn't query once per recipe"""
+
+        for i in range(5):
+            recipe = sample_recipe(user=self.user, title=f"Recipe {i}")
+            recipe.tags.add(sample_tag(user=self.user, name=f"Tag {i}"))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f"Ingredient {i}")
+            )
+
+        # One query for the recipes and one per prefetched relation
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 5)
+        self.assertEqual(len(res.data["results"][0]["tags"]), 1)
+        self.assertEqual(len(res.data["results"][0]["ingredients"]), 1)
+
+    def test_list_recipes_expanded(self):
+        """Test expanded relations are nested in a fixed number of queries"""
+
+        for i in range(5):
+            recipe = sample_recipe(user=self.user, title=f"Recipe {i}")
+            recipe.tags.add(sample_tag(user=self.user, name=f"Tag {i}"))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f"Ingredient {i}")
+            )
+
+        with self.assertNumQueries(3):
+            res = self.client.get(
+                RECIPES_URL, {"expand": "tags,ingredients"}
+            )
+
+        recipe = Recipe.objects.get(id=res.data["results"][0]["id"])
+        serializer = RecipeDetailSerializer(recipe)
+        self.assertEqual(res.data["results"][0], serializer.data)
+
+        res = self.client.get(RECIPES_URL, {"expand": "tags"})
+        self.assertEqual(res.data["results"][0]["tags"], [
+            {"id": recipe.tags.get().id, "name": "Tag 4"}
+        ])
+        self.assertEqual(
+            res.data["results"][0]["ingredients"],
+            [recipe.ingredients.get().id],
+        )
+
+    def test_list_recipes_expand_invalid(self):
+        """Test expanding a field that isn't a relation is rejected"""
+
+        res = self.client.get(RECIPES_URL, {"expand": "tags,link"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_recipes_limited_to_user(self):
         """Test list contents only by logged user"""
@@ -108,8 +175,8 @@ class PrivateRecipeAPITest(TestCase):
         res = self.client.get(RECIPES_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["title"], recipe.title)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["title"], recipe.title)
 
     def test_view_recipe_detail(self):
         """Test the detail of a single recipe"""
@@ -126,6 +193,26 @@ class PrivateRecipeAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_view_recipe_detail_fixed_number_of_queries(self):
+        """Test the recipe detail prefetches its nested relations"""
+
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(
+            sample_tag(user=self.user),
+            sample_tag(user=self.user, name="Dinner"),
+        )
+        recipe.ingredients.add(
+            sample_ingredient(user=self.user),
+            sample_ingredient(user=self.user, name="Onion"),
+        )
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["tags"]), 2)
+        self.assertEqual(len(res.data["ingredients"]), 2)
+
     def test_create_basic_recipe(self):
         """Test creating recipe"""
 
@@ -192,6 +279,55 @@ class PrivateRecipeAPITest(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_validate_links_in_one_query(self):
+        """Test the tags and ingredients are looked up one query each"""
+
+        tag = sample_tag(user=self.user)
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=self.user, name=f"Spice {i}") for i in range(40)
+        )
+        request = Request(APIRequestFactory().post(RECIPES_URL))
+        request.user = self.user
+        serializer = RecipeSerializer(data={
+            "title": "Garam Masala Chai",
+            "time_minutes": 10,
+            "price": "2.00",
+            "tags": [tag.id, tag.id],
+            "ingredients": [ingredient.id for ingredient in ingredients],
+        }, context={"request": request})
+
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid())
+
+        self.assertEqual(serializer.validated_data["tags"], [tag])
+        self.assertEqual(serializer.validated_data["ingredients"], ingredients)
+        with self.assertNumQueries(0):
+            serializer.fields["tags"].run_validation([tag.id])
+
+    def test_create_recipe_with_other_users_links(self):
+        """Test every unknown or other user's ID is rejected at once"""
+
+        other = get_user_model().objects.create_user(
+            email="other@django.com",
+            password="django123",
+        )
+        tag = sample_tag(user=self.user)
+        other_tag = sample_tag(user=other)
+        payload = {
+            "title": "Chhola Bhatura",
+            "tags": [tag.id, other_tag.id, 0],
+            "time_minutes": 30,
+            "price": 20.00,
+        }
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tags"], [
+            f"Invalid pks {other_tag.id}, 0 - objects do not exist."
+        ])
+        self.assertFalse(Recipe.objects.exists())
+
     def test_partial_recipe_update(self):
         """Test updating a recipe using PATCH"""
 
@@ -240,6 +376,308 @@ class PrivateRecipeAPITest(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def writes(self, method, url, payload):
+        """Send the request and return the statements writing rows"""
+
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(url, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [
+            query["sql"] for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+
+    def test_update_links_by_difference(self):
+        """Test only the removed and added links are written"""
+
+        kept, removed, added = (
+            sample_tag(user=self.user, name=name)
+            for name in ("Lunch", "Dinner", "Snack")
+        )
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(kept, removed)
+
+        writes = self.writes("patch", detail_url(recipe.id), {
+            "tags": [kept.id, added.id],
+        })
+
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(writes[0].startswith('DELETE FROM "core_recipe_tags"'))
+        self.assertTrue(writes[1].startswith('INSERT INTO "core_recipe_tags"'))
+        self.assertEqual(set(recipe.tags.all()), {kept, added})
+
+        res = self.client.get(STATS_URL)
+        by_tag = {tag["id"]: tag["count"] for tag in res.data["tags"]}
+        self.assertEqual(by_tag, {kept.id: 1, added.id: 1})
+
+    def test_update_links_added_concurrently(self):
+        """Test links added since the recipe was fetched aren't added again"""
+
+        tag = sample_tag(user=self.user)
+        recipe = Recipe.objects.prefetch_related("tags").get(
+            pk=sample_recipe(user=self.user).pk
+        )
+        # Another request links the tag after this one fetched the recipe
+        Recipe.objects.get(pk=recipe.pk).tags.add(tag)
+
+        request = Request(APIRequestFactory().patch(detail_url(recipe.id)))
+        request.user = self.user
+        serializer = RecipeSerializer(
+            recipe, data={"tags": [tag.id]}, partial=True,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(list(recipe.tags.all()), [tag])
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+
+    def test_unchanged_update_writes_nothing(self):
+        """Test saving a recipe as it is doesn't write to the database"""
+
+        tag = sample_tag(user=self.user)
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        writes = self.writes("put", detail_url(recipe.id), {
+            "title": recipe.title,
+            "time_minutes": recipe.time_minutes,
+            "price": "30.00",
+            "tags": [tag.id],
+            "ingredients": [],
+        })
+
+        self.assertEqual(writes, [])
+
+    def test_filter_recipes_matching_several_tags_once(self):
+        """Test a recipe matching several tag IDs is returned once"""
+
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name="Veg")
+        tag2 = sample_tag(user=self.user, name="Spicy")
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPES_URL, {"tags": f"{tag1.id},{tag2.id}"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_filter_recipes_matching_all_tags(self):
+        """Test match=all only returns recipes linked to every tag"""
+
+        tag1 = sample_tag(user=self.user, name="Veg")
+        tag2 = sample_tag(user=self.user, name="Spicy")
+        recipe1 = sample_recipe(user=self.user, title="Paneer Tikka")
+        recipe1.tags.add(tag1, tag2)
+        recipe2 = sample_recipe(user=self.user, title="Dal")
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {"tags": f"{tag1.id},{tag2.id}", "match": "all"}
+        )
+
+        ids = [recipe["id"] for recipe in res.data["results"]]
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_filter_recipes_invalid_ids(self):
+        """Test filtering with IDs that aren't integers is rejected"""
+
+        res = self.client.get(RECIPES_URL, {"tags": "1,abc"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes_ranked(self):
+        """Test searching matches titles, tags and ingredients by rank"""
+
+        spicy = sample_tag(user=self.user, name="Spicy")
+        tomato = sample_ingredient(user=self.user, name="Tomatoes")
+        by_title = sample_recipe(user=self.user, title="Spicy Tomato Soup")
+        by_links = sample_recipe(user=self.user, title="Chilli Paneer")
+        by_links.tags.add(spicy)
+        by_links.ingredients.add(tomato)
+        sample_recipe(user=self.user, title="Spicy Dal")
+        other = get_user_model().objects.create_user(
+            "other@django.com", "django123"
+        )
+        sample_recipe(user=other, title="Spicy Tomato Curry")
+
+        res = self.client.get(RECIPES_URL, {"search": "spicy tomato"})
+
+        ids = [recipe["id"] for recipe in res.data["results"]]
+        self.assertEqual(ids, [by_title.id, by_links.id])
+
+    def test_search_follows_renamed_ingredients(self):
+        """Test the search vector is kept up to date with linked names"""
+
+        ingredient = sample_ingredient(user=self.user, name="Paneer")
+        recipe = sample_recipe(user=self.user, title="Tikka")
+        recipe.ingredients.add(ingredient)
+        ingredient.name = "Tofu"
+        ingredient.save()
+
+        res = self.client.get(RECIPES_URL, {"search": "tofu"})
+        self.assertEqual(len(res.data["results"]), 1)
+
+        recipe.ingredients.clear()
+        res = self.client.get(RECIPES_URL, {"search": "tofu"})
+        self.assertEqual(len(res.data["results"]), 0)
+
+    def test_search_recipes_paginated(self):
+        """Test search results page through cursors without repeats"""
+
+        for i in range(5):
+            sample_recipe(user=self.user, title=f"Tomato {'Soup ' * i}")
+
+        res = self.client.get(RECIPES_URL, {"search": "soup", "page_size": 2})
+        ids = [recipe["id"] for recipe in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [recipe["id"] for recipe in res.data["results"]]
+
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_filter_recipes_by_ranges(self):
+        """Test filtering by price and time ranges and a title prefix"""
+
+        cheap = sample_recipe(
+            user=self.user, title="Dal Fry", price=5, time_minutes=20
+        )
+        sample_recipe(user=self.user, title="Dal Makhani", price=15)
+        sample_recipe(user=self.user, title="Fried Dal", price=5)
+        sample_recipe(
+            user=self.user, title="Dal Tadka", price=5, time_minutes=90
+        )
+
+        res = self.client.get(RECIPES_URL, {
+            "price_min": "1", "price_max": "10.50", "time_max": 30,
+            "title": "Dal",
+        })
+
+        ids = [recipe["id"] for recipe in res.data["results"]]
+        self.assertEqual(ids, [cheap.id])
+
+    def test_filter_recipes_invalid_ranges(self):
+        """Test ranges that aren't numbers the columns hold are rejected"""
+
+        for params in ({"price_min": "cheap"}, {"price_max": "NaN"},
+                       {"time_max": "1.5"}, {"price_min": "1e999999"},
+                       {"price_max": "10000"}, {"time_max": "-1"}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_recipes(self):
+        """Test ordering by a field pages through ties by ID"""
+
+        recipes = [
+            sample_recipe(user=self.user, title=title, price=price)
+            for title, price in (("C", 2), ("A", 1), ("B", 2), ("D", 3))
+        ]
+
+        res = self.client.get(
+            RECIPES_URL, {"ordering": "-price", "page_size": 2}
+        )
+        ids = [recipe["id"] for recipe in res.data["results"]]
+        res = self.client.get(res.data["next"])
+        ids += [recipe["id"] for recipe in res.data["results"]]
+        self.assertEqual(ids, [recipes[i].id for i in (3, 2, 0, 1)])
+
+        res = self.client.get(RECIPES_URL, {"ordering": "title"})
+        titles = [recipe["title"] for recipe in res.data["results"]]
+        self.assertEqual(titles, ["A", "B", "C", "D"])
+
+    def test_order_recipes_invalid_field(self):
+        """Test ordering by fields without an index is rejected"""
+
+        for ordering in ("link", "price,title", "--price"):
+            res = self.client.get(RECIPES_URL, {"ordering": ordering})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_recipes(self):
+        """Test creating many recipes with their links in one request"""
+
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                "title": "Tomato Soup",
+                "time_minutes": 20,
+                "price": "5.00",
+                "tags": [tag.id],
+                "ingredients": [ingredient.id],
+            },
+            {"title": "Toast", "time_minutes": 5, "price": "1.00"},
+            {"title": "", "time_minutes": 5, "price": "1.00"},
+        ]
+
+        res = self.client.post(BULK_RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertEqual(res.data["errors"][0]["index"], 2)
+        self.assertEqual(res.data["results"][0]["tags"], [tag.id])
+
+        recipe = Recipe.objects.get(id=res.data["results"][0]["id"])
+        self.assertEqual(recipe.user, self.user)
+        self.assertEqual(list(recipe.ingredients.all()), [ingredient])
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_export_recipes_json(self):
+        """Test exporting streams every recipe as a JSON array"""
+
+        for i in range(3):
+            recipe = sample_recipe(user=self.user, title=f"Recipe {i}")
+            recipe.tags.add(sample_tag(user=self.user, name=f"Tag {i}"))
+        sample_recipe(
+            user=get_user_model().objects.create_user(
+                email="test2@django.com",
+                password="django123",
+            )
+        )
+
+        with patch.object(RecipeViewSet, "export_chunk_size", 2):
+            # The recipes, then the tags and ingredients of each chunk
+            with self.assertNumQueries(5):
+                res = self.client.get(EXPORT_URL)
+                content = b"".join(res.streaming_content)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by("-id")
+        serializer = RecipeSerializer(recipes, many=True)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/json")
+        self.assertEqual(
+            json.loads(content),
+            json.loads(json.dumps(serializer.data))
+        )
+
+    def test_export_recipes_ndjson(self):
+        """Test exporting as NDJSON streams one recipe per line"""
+
+        sample_recipe(user=self.user, title="Dal")
+        sample_recipe(user=self.user, title="Rice")
+
+        res = self.client.get(EXPORT_URL, {"output": "ndjson"})
+        lines = b"".join(res.streaming_content).splitlines()
+
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            [json.loads(line)["title"] for line in lines],
+            ["Rice", "Dal"]
+        )
+
+    def test_export_empty_library(self):
+        """Test exporting without recipes streams an empty array"""
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(json.loads(b"".join(res.streaming_content)), [])
+
 
 class RecipeImageUploadTest(TestCase):
 
@@ -253,7 +691,21 @@ class RecipeImageUploadTest(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
         self.recipe.image.delete()
+        self.recipe.image_thumbnail.delete()
+        self.recipe.image_medium.delete()
+
+    def upload(self, size=(10, 10)):
+        """Upload a JPEG of the given size to the recipe"""
+
+        url = upload_image_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            img = Image.new("RGB", size)
+            img.save(ntf, format="JPEG")
+            ntf.seek(0)
+
+            return self.client.post(url, {"image": ntf}, format="multipart")
 
     def test_uploading_image(self):
         """Test that uploading image is successfull"""
@@ -268,10 +720,64 @@ class RecipeImageUploadTest(TestCase):
 
             self.recipe.refresh_from_db()
 
-            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
             self.assertIn("image", res.data)
+            self.assertEqual(res.data["image_status"], Recipe.IMAGE_PENDING)
             self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    @override_settings(IMAGE_PIPELINE={"EAGER": True})
+    def test_uploading_image_creates_renditions(self):
+        """Test the uploaded image is resized into its renditions"""
+
+        self.upload(size=(1600, 1000))
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        with Image.open(self.recipe.image_medium.path) as medium:
+            self.assertEqual(medium.size, (800, 500))
+        with Image.open(self.recipe.image_thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (200, 125))
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertTrue(res.data["image_thumbnail"].endswith(
+            self.recipe.image_thumbnail.name
+        ))
+
+    def test_processing_unreadable_image_fails(self):
+        """Test an image that can't be decoded is marked as failed"""
+
+        self.recipe.image.save("broken.jpg", ContentFile(b"not an image"))
+
+        with self.assertLogs("core.images", "ERROR") as logs:
+            process_recipe_image(self.recipe.id)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(
+            logs.output[0].splitlines()[0],
+            f"ERROR:core.images:Failed to process image of recipe "
+            f"{self.recipe.id}",
+        )
+        self.assertIn("cannot identify image file", logs.output[0])
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertFalse(self.recipe.image_thumbnail)
+
+    def test_processing_malformed_exif_fails(self):
+        """Test an image whose EXIF can't be applied is marked as failed"""
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", (10, 10)).save(ntf, format="JPEG")
+            ntf.seek(0)
+            self.recipe.image.save("exif.jpg", ContentFile(ntf.read()))
+
+        with patch("core.images.ImageOps.exif_transpose",
+                   side_effect=KeyError(274)), \
+                self.assertLogs("core.images", "ERROR") as logs:
+            process_recipe_image(self.recipe.id)
+        self.recipe.refresh_from_db()
+
+        self.assertIn("KeyError: 274", logs.output[0])
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
     def test_uploading_invalid_image(self):
         """Test uploading and invalid image"""
 
@@ -300,9 +806,9 @@ class RecipeImageUploadTest(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
 
     def test_filter_recipes_by_ingredients(self):
         """Test filter recipes by ingredients"""
@@ -324,6 +830,65 @@ class RecipeImageUploadTest(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer3.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer3.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
+
+
+class RecipeQueryPlanTest(TestCase):
+    """Test filtered and ordered recipe pages are read from indexes"""
+
+    FILTERS = (
+        {},
+        {"price_min": "5", "price_max": "50"},
+        {"time_max": "30"},
+        {"title": "Dal"},
+    )
+    ORDERINGS = (None, "price", "-price", "time_minutes", "title", "-title")
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=self.user, title=f"Dal {i}", time_minutes=i % 120,
+                price=i % 100,
+            )
+            for i in range(500)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_recipe")
+            # Make a table scan a last resort, as on a large library
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def page_query(self, params):
+        """Return the query of the first page of the recipe list"""
+
+        request = Request(APIRequestFactory().get(RECIPES_URL, params))
+        request.user = self.user
+        view = RecipeViewSet(
+            request=request, action="list", format_kwarg=None, kwargs={}
+        )
+        queryset = view.filter_queryset(view.get_queryset())
+        ordering = view.paginator.get_ordering(request, queryset, view)
+
+        return queryset.order_by(*ordering)[:11]
+
+    def test_pages_use_index_scans(self):
+        """Test every filter and ordering combination scans an index"""
+
+        for filters in self.FILTERS:
+            for ordering in self.ORDERINGS:
+                params = dict(filters)
+                if ordering:
+                    params["ordering"] = ordering
+
+                with self.subTest(**params):
+                    plan = self.page_query(params).explain()
+
+                    self.assertIn("Index", plan)
+                    self.assertNotIn("Seq Scan", plan)
+                    # The index returns the rows in order, nothing to sort
+                    self.assertNotIn("Sort", plan)
@@ -0,0 +1,156 @@
+from unittest.mock import patch
+
+from ..similarity import refresh_similar
+from core.models import Tag, Ingredient, Recipe, SimilarRecipe
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+def similar_url(recipe_id):
+    """Return the URL of the recipes similar to a recipe"""
+
+    return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
+def sample_library(user):
+    """Create recipes sharing some of their tags and ingredients"""
+
+    curry = Tag.objects.create(user=user, name="Curry")
+    dessert = Tag.objects.create(user=user, name="Dessert")
+    rice, dal, paneer, sugar = (
+        Ingredient.objects.create(user=user, name=name)
+        for name in ("Rice", "Dal", "Paneer", "Sugar")
+    )
+    recipes = {}
+    for title, tags, ingredients in (
+        ("Dal Rice", (curry,), (rice, dal)),
+        ("Dal Fry", (curry,), (dal,)),
+        ("Paneer Rice", (curry,), (rice, paneer)),
+        ("Kheer", (dessert,), (rice, sugar)),
+        ("Halwa", (dessert,), (sugar,)),
+    ):
+        recipe = Recipe.objects.create(
+            user=user, title=title, time_minutes=20, price=5
+        )
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+        recipes[title] = recipe
+
+    return recipes
+
+
+def titles(res):
+    return [match["recipe"]["title"] for match in res.data["results"]]
+
+
+@override_settings(SIMILAR_RECIPES={"K": 3, "EAGER": True})
+class SimilarRecipesAPITests(TestCase):
+    """Test listing the recipes most like a recipe"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipes = sample_library(self.user)
+
+    def test_similar_ranked(self):
+        """Test recipes are ranked by their shared tags and ingredients"""
+
+        res = self.client.get(similar_url(self.recipes["Dal Rice"].id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(titles(res), ["Dal Fry", "Paneer Rice", "Kheer"])
+        scores = [match["score"] for match in res.data["results"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertLess(scores[0], 1)
+
+    def test_similar_follows_links(self):
+        """Test the neighbours are refreshed when links change"""
+
+        sugar = Ingredient.objects.get(name="Sugar")
+        dessert = Tag.objects.get(name="Dessert")
+        self.recipes["Dal Rice"].ingredients.add(sugar)
+        self.recipes["Dal Rice"].tags.add(dessert)
+
+        res = self.client.get(similar_url(self.recipes["Halwa"].id))
+        self.assertEqual(titles(res), ["Kheer", "Dal Rice"])
+        before = res.data["results"][1]["score"]
+
+        dessert.delete()
+        res = self.client.get(similar_url(self.recipes["Halwa"].id))
+        self.assertEqual(titles(res), ["Kheer", "Dal Rice"])
+        self.assertLess(res.data["results"][1]["score"], before)
+
+    def test_deleted_recipe_replaced(self):
+        """Test a deleted recipe leaves the lists it was in"""
+
+        refresh_similar(self.user.pk, [self.recipes["Dal Rice"].id])
+        self.recipes["Paneer Rice"].delete()
+
+        res = self.client.get(similar_url(self.recipes["Dal Rice"].id))
+
+        self.assertEqual(titles(res), ["Dal Fry", "Kheer"])
+
+    def test_empty_list_not_recomputed(self):
+        """Test a recipe like no other is only scored once"""
+
+        toast = Recipe.objects.create(
+            user=self.user, title="Toast", time_minutes=5, price=1
+        )
+        res = self.client.get(similar_url(toast.id))
+        self.assertEqual(titles(res), [])
+
+        with patch("recipe.similarity.refresh_similar") as refresh:
+            res = self.client.get(similar_url(toast.id))
+        self.assertEqual(titles(res), [])
+        refresh.assert_not_called()
+
+        toast.ingredients.add(Ingredient.objects.get(name="Sugar"))
+        res = self.client.get(similar_url(toast.id))
+        self.assertEqual(titles(res), ["Halwa", "Kheer"])
+
+    def test_recipes_limited_to_user(self):
+        """Test other users' recipes are never similar"""
+
+        other = get_user_model().objects.create_user(
+            "other@django.com", "django123"
+        )
+        sample_library(other)
+
+        res = self.client.get(similar_url(self.recipes["Halwa"].id))
+
+        self.assertEqual(titles(res), ["Kheer"])
+
+    def test_other_users_recipe(self):
+        """Test the similar recipes of another user's recipe are hidden"""
+
+        other = get_user_model().objects.create_user(
+            "other@django.com", "django123"
+        )
+        recipe = Recipe.objects.create(
+            user=other, title="Other", time_minutes=5, price=1
+        )
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_top_k_stored(self):
+        """Test only the K closest recipes are kept per recipe"""
+
+        refresh_similar(
+            self.user.pk, [recipe.id for recipe in self.recipes.values()]
+        )
+
+        for recipe in self.recipes.values():
+            self.assertLessEqual(
+                SimilarRecipe.objects.filter(recipe=recipe).count(), 3
+            )
@@ -0,0 +1,137 @@
+from core.models import Tag, Ingredient, Recipe
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+import json
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+EXPORT_URL = reverse("recipe:recipe-export")
+
+
+def detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class SparseFieldsTests(TestCase):
+    """Test reading only the fields asked for"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name="Rice"
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Khichdi", time_minutes=30, price=5,
+            link="https://example.com/khichdi",
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def get(self, url, params):
+        """Return the response and the SQL run to serve it"""
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, " ".join(query["sql"] for query in queries)
+
+    def test_list_fields(self):
+        """Test the list renders and selects only the fields asked for"""
+
+        res, sql = self.get(RECIPES_URL, {"fields": "title,id"})
+
+        self.assertEqual(
+            res.data["results"], [{"id": self.recipe.id, "title": "Khichdi"}]
+        )
+        self.assertNotIn('"link"', sql)
+        self.assertNotIn("core_recipe_tags", sql)
+        self.assertNotIn("core_recipe_ingredients", sql)
+
+    def test_list_exclude(self):
+        """Test excluded fields and relations are skipped"""
+
+        res, sql = self.get(RECIPES_URL, {"exclude": "link,ingredients"})
+
+        recipe = res.data["results"][0]
+        self.assertNotIn("link", recipe)
+        self.assertNotIn("ingredients", recipe)
+        self.assertEqual(recipe["tags"], [self.tag.id])
+        self.assertNotIn("core_recipe_ingredients", sql)
+
+    def test_list_ordered_by_unrequested_field(self):
+        """Test ordering by a field that isn't rendered still pages"""
+
+        Recipe.objects.create(
+            user=self.user, title="Dal", time_minutes=30, price=2
+        )
+
+        res, _ = self.get(RECIPES_URL, {
+            "fields": "title", "ordering": "price", "page_size": 1,
+        })
+        res, _ = self.get(res.data["next"], {})
+
+        self.assertEqual(res.data["results"], [{"title": "Khichdi"}])
+
+    def test_retrieve_fields(self):
+        """Test the detail skips the prefetches of unrequested relations"""
+
+        res, sql = self.get(
+            detail_url(self.recipe.id), {"fields": "id,tags"}
+        )
+
+        self.assertEqual(res.data, {
+            "id": self.recipe.id,
+            "tags": [{"id": self.tag.id, "name": "Vegan"}],
+        })
+        self.assertNotIn('"link"', sql)
+        self.assertNotIn("core_ingredient", sql)
+
+    def test_tags_fields(self):
+        """Test tags and ingredients accept fields too"""
+
+        res, _ = self.get(TAGS_URL, {"fields": "name"})
+
+        self.assertEqual(res.data["results"], [{"name": "Vegan"}])
+
+    def test_export_fields(self):
+        """Test exports only stream the fields asked for"""
+
+        res = self.client.get(EXPORT_URL, {"fields": "id,tags"})
+        data = json.loads(b"".join(res.streaming_content))
+
+        self.assertEqual(data, [{"id": self.recipe.id, "tags": [self.tag.id]}])
+
+    def test_unknown_fields(self):
+        """Test asking for fields the serializer doesn't have is rejected"""
+
+        for params in ({"fields": "id,user"}, {"exclude": "secret"}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_render_every_field(self):
+        """Test fields don't narrow what is validated and returned on write"""
+
+        res = self.client.patch(
+            f"{detail_url(self.recipe.id)}?fields=id", {"title": "Pongal"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["title"], "Pongal")
+        self.assertIn("link", res.data)
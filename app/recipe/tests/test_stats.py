@@ -0,0 +1,149 @@
+from ..stats import rebuild_stats, user_stats
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+STATS_URL = reverse("recipe:recipe-stats")
+
+
+def snapshot(user):
+    """Return the stored stats of the user comparable between builds"""
+
+    return {
+        (row.scope, row.key): (
+            row.count, row.price_total, row.time_total,
+            row.price_histogram, row.time_histogram,
+        )
+        for row in RecipeStats.objects.filter(user=user, count__gt=0)
+    }
+
+
+class RecipeStatsTests(TestCase):
+    """Test the stats kept by the recipe signals"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@django.com",
+            password="django123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.curry = Tag.objects.create(user=self.user, name="Curry")
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.rice = Ingredient.objects.create(user=self.user, name="Rice")
+        self.dal = Ingredient.objects.create(user=self.user, name="Dal")
+
+        self.recipes = []
+        for title, minutes, price in (
+            ("Dal Rice", 25, "4.00"),
+            ("Dal Fry", 40, "6.00"),
+            ("Biryani", 90, "12.50"),
+        ):
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=minutes,
+                price=price,
+            )
+            recipe.tags.add(self.curry)
+            recipe.ingredients.add(self.rice)
+            self.recipes.append(recipe)
+
+    def test_stats(self):
+        """Test the stats summarize the recipes"""
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes = res.data["recipes"]
+        self.assertEqual(recipes["count"], 3)
+        self.assertEqual(recipes["price"]["average"], 7.5)
+        self.assertEqual(recipes["time_minutes"]["average"], 51.7)
+        self.assertEqual(sum(recipes["time_minutes"]["histogram"]), 3)
+        self.assertTrue(6 <= recipes["price"]["median"] < 8)
+
+        self.assertEqual(
+            [(tag["name"], tag["count"]) for tag in res.data["tags"]],
+            [("Curry", 3)],
+        )
+        self.assertEqual(
+            [(i["name"], i["count"]) for i in res.data["ingredients"]],
+            [("Rice", 3)],
+        )
+
+    def test_stats_follow_changes(self):
+        """Test updates, links and deletions match a rebuild"""
+
+        dal_rice, dal_fry, biryani = self.recipes
+        dal_rice.price = "5.50"
+        dal_rice.save()
+        dal_fry.tags.add(self.vegan)
+        dal_fry.tags.remove(self.curry, self.vegan, self.vegan)
+        dal_fry.ingredients.clear()
+        self.dal.recipe_set.add(dal_rice, dal_fry)
+        self.rice.recipe_set.remove(biryani)
+        self.vegan.recipe_set.add(biryani)
+        self.curry.recipe_set.clear()
+        biryani.delete()
+        self.dal.delete()
+
+        live = snapshot(self.user)
+        rebuild_stats()
+
+        self.assertEqual(live, snapshot(self.user))
+        self.assertEqual(user_stats(self.user)["recipes"]["count"], 2)
+
+    def test_bulk_create_counted(self):
+        """Test recipes created in bulk are counted in one statement"""
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(reverse("recipe:recipe-bulk-create"), [
+                {"title": "Khichdi", "time_minutes": 30, "price": "3.00",
+                 "tags": [self.curry.id], "ingredients": [self.rice.id]},
+                {"title": "Dal", "time_minutes": 20, "price": "2.00",
+                 "ingredients": [self.dal.id]},
+            ] * 10, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        stats_writes = [
+            query["sql"] for query in queries
+            if RecipeStats._meta.db_table in query["sql"]
+        ]
+        self.assertEqual(len(stats_writes), 1)
+
+        live = snapshot(self.user)
+        rebuild_stats()
+
+        self.assertEqual(live, snapshot(self.user))
+
+    def test_stats_limited_to_user(self):
+        """Test the stats only count the user's own recipes"""
+
+        other = get_user_model().objects.create_user(
+            "other@django.com", "django123"
+        )
+        Recipe.objects.create(
+            user=other, title="Other", time_minutes=5, price=1
+        )
+        other.delete()
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["recipes"]["count"], 3)
+
+    def test_empty_stats(self):
+        """Test a user without recipes gets empty stats"""
+
+        Recipe.objects.filter(user=self.user).delete()
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["recipes"]["count"], 0)
+        self.assertIsNone(res.data["recipes"]["price"]["median"])
+        self.assertEqual(res.data["tags"], [])
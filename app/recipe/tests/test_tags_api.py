@@ -1,14 +1,18 @@
+import time
+
 from core.models import Tag, Recipe
 from ..serializers import TagSerializer
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
+from django.utils.http import http_date
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 TAGS_URL = reverse("recipe:tag-list")
+BULK_TAGS_URL = reverse("recipe:tag-bulk-create")
 
 
 class PublicTagsAPITest(TestCase):
@@ -53,7 +57,7 @@ class PrivateTagsAPITest(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_tag_limited_to_logged_user(self):
         """Test that tags returned only created by logged user"""
@@ -64,8 +68,8 @@ class PrivateTagsAPITest(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], tag.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], tag.name)
 
     def test_create_tag_successfull(self):
         """Test creating a tag"""
@@ -107,5 +111,130 @@ class PrivateTagsAPITest(TestCase):
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
+
+    def test_retrieve_tags_assigned_unique(self):
+        """Test filtering tags by assigned returns unique items"""
+
+        tag = Tag.objects.create(user=self.user, name="Breakfast")
+        Tag.objects.create(user=self.user, name="Lunch")
+        recipe1 = Recipe.objects.create(
+            title="Poha",
+            time_minutes=5,
+            price=3.00,
+            user=self.user,
+        )
+        recipe1.tags.add(tag)
+        recipe2 = Recipe.objects.create(
+            title="Upma",
+            time_minutes=10,
+            price=2.00,
+            user=self.user,
+        )
+        recipe2.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_retrieve_tags_cached(self):
+        """Test listing tags again is served without querying"""
+
+        Tag.objects.create(user=self.user, name="Vegan")
+        self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_create_tag_invalidates_cache(self):
+        """Test a created tag is listed even after the list was cached"""
+
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {"name": "Dessert"})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_assigning_tag_invalidates_assigned_cache(self):
+        """Test linking a tag to a recipe invalidates the assigned list"""
+
+        tag = Tag.objects.create(user=self.user, name="Breakfast")
+        recipe = Recipe.objects.create(
+            title="Dosa",
+            time_minutes=20,
+            price=4.00,
+            user=self.user,
+        )
+        self.client.get(TAGS_URL, {"assigned_only": 1})
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_retrieve_tags_not_modified(self):
+        """Test a list matching the client's ETag returns 304"""
+
+        Tag.objects.create(user=self.user, name="Vegan")
+        res = self.client.get(TAGS_URL)
+
+        cached = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+        Tag.objects.create(user=self.user, name="Dessert")
+        changed = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_tags_modified_since_ignored(self):
+        """Test lists aren't validated by dates, which miss quick changes"""
+
+        res = self.client.get(TAGS_URL)
+        Tag.objects.create(user=self.user, name="Vegan")
+        changed = self.client.get(
+            TAGS_URL, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+
+        self.assertNotIn("Last-Modified", res)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(changed.data["results"]), 1)
+
+    def test_bulk_create_tags_upserts_by_name(self):
+        """Test bulk creating tags reuses the names the user already has"""
+
+        existing = Tag.objects.create(user=self.user, name="Vegan")
+        Tag.objects.create(user=self.user2, name="Dessert")
+        payload = [{"name": "Vegan"}, {"name": "Dessert"}, {"name": "Dessert"}]
+
+        res = self.client.post(BULK_TAGS_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["results"][0]["id"], existing.id)
+        self.assertEqual(
+            res.data["results"][1]["id"], res.data["results"][2]["id"]
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_tags_reports_item_errors(self):
+        """Test invalid items are reported without aborting the batch"""
+
+        payload = [{"name": "Vegan"}, {"name": ""}]
+
+        res = self.client.post(BULK_TAGS_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["errors"][0]["index"], 1)
+        self.assertIn("name", res.data["errors"][0]["errors"])
+        self.assertTrue(Tag.objects.filter(name="Vegan").exists())
+
+    def test_bulk_create_tags_all_invalid(self):
+        """Test a batch without any valid item is rejected"""
+
+        res = self.client.post(BULK_TAGS_URL, [{"name": ""}], format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.exists())
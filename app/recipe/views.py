@@ -1,29 +1,70 @@
+from .caching import CachedListMixin
+from .export import stream_recipes, CONTENT_TYPES, JSON
+from .fast import FastListMixin
+from .filters import AssignedOnlyFilter, LinkedFilter, RecipeRangeFilter,\
+    RecipeSearchFilter, RecipeOrderingFilter, params_to_ints
+from .pantry import rank_recipes
 from .serializers import TagSerializer, IngredientSerializer,\
-    RecipeSerializer, RecipeDetailSerializer, RecipeImageSerializer
-from core.models import Tag, Ingredient, Recipe
+    RecipeSerializer, RecipeDetailSerializer, RecipeImageSerializer,\
+    BulkCreateListSerializer, expanded_serializer
+from .similarity import similar_recipes
+from .sparse import SparseFieldsMixin
+from .stats import user_stats
+from core.authentication import CachedTokenAuthentication
+from core.images import schedule_recipe_image
+from core.metrics import registry
+from core.models import Tag, Ingredient, Recipe, RecipeQuerySet
+
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext as _
 
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 
-class BaseRecipeViewSet(viewsets.GenericViewSet,
+class BulkCreateMixin:
+    """Create many objects from a single list payload"""
+
+    @action(methods=["POST"], detail=False, url_path="bulk")
+    def bulk_create(self, request):
+        """Create the valid items of the list and report the invalid ones"""
+
+        serializer = BulkCreateListSerializer(
+            child=self.get_serializer(),
+            data=request.data,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=self.request.user)
+
+        data = {"results": serializer.data, "errors": serializer.item_errors}
+        if not serializer.instance:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class BaseRecipeViewSet(BulkCreateMixin,
+                        CachedListMixin,
+                        SparseFieldsMixin,
+                        FastListMixin,
+                        viewsets.GenericViewSet,
                         mixins.ListModelMixin,
                         mixins.CreateModelMixin):
     """Base ViewSet for user owned recipe"""
 
-    authentication_classes = TokenAuthentication,
+    authentication_classes = CachedTokenAuthentication,
     permission_classes = IsAuthenticated,
+    filter_backends = AssignedOnlyFilter, RecipeOrderingFilter,
+    ordering = "-name", "-id",
+    ordering_fields = "name", "recipe_count",
 
     def get_queryset(self):
-        assigned_only = bool(self.request.query_params.get("assigned_only"))
-        queryset = self.queryset
-
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by("-name")
+        return self.queryset.filter(user=self.request.user)\
+            .order_by(*self.ordering)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -41,29 +82,69 @@ class IngredientViewSet(BaseRecipeViewSet):
     queryset = Ingredient.objects.all()
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    authentication_classes = TokenAuthentication,
+class RecipeViewSet(BulkCreateMixin,
+                    SparseFieldsMixin,
+                    FastListMixin,
+                    viewsets.ModelViewSet):
+    authentication_classes = CachedTokenAuthentication,
     permission_classes = IsAuthenticated,
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
+    filter_backends = LinkedFilter, RecipeRangeFilter, RecipeSearchFilter,\
+        RecipeOrderingFilter,
+    linked_fields = "tags", "ingredients",
+    ordering = "-id",
+    ordering_fields = "id", "price", "time_minutes", "title",
 
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to list of ints"""
-
-        return[int(str_id) for str_id in qs.split(",")]
+    # Actions whose serializer only renders the IDs of the relations
+    id_actions = "list", "create", "update", "partial_update", "pantry",\
+        "similar",
+    # Relations the list nests the names of with ?expand=
+    expandable_fields = "tags", "ingredients",
+    export_chunk_size = 500
 
     def get_queryset(self):
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
-        queryset = self.queryset
-
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)\
+            .order_by(*self.ordering)
+
+        return self._prefetch_for_action(queryset)
+
+    def _prefetch_for_action(self, queryset):
+        """Prefetch only the relations the action's serializer renders"""
+
+        expanded = self.get_expanded_fields()
+        if expanded:
+            return queryset.prefetch_related(*(
+                names if ids.prefetch_to in expanded else ids
+                for ids, names in zip(
+                    RecipeQuerySet.related_ids_lookups(),
+                    RecipeQuerySet.related_names_lookups(),
+                )
+            ))
+        elif self.action in self.id_actions:
+            return queryset.prefetch_related_ids()
+        elif self.action == "retrieve":
+            return queryset.prefetch_related_names()
+
+        return queryset
+
+    def get_expanded_fields(self):
+        """Return the relations the list is asked to nest"""
+
+        value = self.request.query_params.get("expand")
+        if self.action != "list" or not value:
+            return ()
+
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        if not names <= set(self.expandable_fields):
+            raise ValidationError({
+                "expand": _("Expected one of: {choices}.").format(
+                    choices=", ".join(self.expandable_fields)
+                ),
+            })
+        return tuple(
+            name for name in self.expandable_fields if name in names
+        )
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -71,6 +152,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         elif self.action == "upload_image":
             return RecipeImageSerializer
 
+        expanded = self.get_expanded_fields()
+        if expanded:
+            return expanded_serializer(self.serializer_class, expanded)
         return self.serializer_class
 
     def perform_create(self, serializer):
@@ -78,7 +162,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
-        """Upload an image to the recipe"""
+        """Upload an image to the recipe and resize it in the background"""
 
         recipe = self.get_object()
         serializer = self.get_serializer(
@@ -87,7 +171,98 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
-            return Response(data=serializer.data, status=status.HTTP_200_OK)
+            serializer.save(
+                image_status=Recipe.IMAGE_PENDING,
+                image_thumbnail=None,
+                image_medium=None,
+            )
+            schedule_recipe_image(recipe.pk)
+            registry.inc("image_upload_bytes_total", recipe.image.size)
+            return Response(
+                data=serializer.data,
+                status=status.HTTP_202_ACCEPTED
+            )
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        """Stream all the user's recipes as a JSON array or NDJSON"""
+
+        output = request.query_params.get("output", JSON)
+        if output not in CONTENT_TYPES:
+            raise ValidationError({
+                "output": _("Expected one of: {choices}.").format(
+                    choices=", ".join(CONTENT_TYPES)
+                ),
+            })
+
+        stream = stream_recipes(
+            self.filter_queryset(self.get_queryset()),
+            self.serializer_class,
+            self.get_serializer_context(),
+            chunk_size=self.export_chunk_size,
+            output=output,
+            fields=self.get_requested_fields(),
+        )
+        return StreamingHttpResponse(
+            stream,
+            content_type=CONTENT_TYPES[output]
+        )
+
+    @action(methods=["GET"], detail=False)
+    def pantry(self, request):
+        """Rank recipes by how many of their ingredients are on hand"""
+
+        ingredient_ids = params_to_ints(
+            request.query_params.get("ingredients", "")
+        )
+        matches = rank_recipes(
+            request.user.pk,
+            ingredient_ids,
+            self.paginator.get_page_size(request),
+        )
+        recipes = self.get_queryset().in_bulk(
+            [match.recipe_id for match in matches]
+        )
+
+        results = []
+        for match in matches:
+            # The index may be a moment behind a deleted recipe
+            if match.recipe_id not in recipes:
+                continue
+            results.append({
+                "recipe": self.get_serializer(recipes[match.recipe_id]).data,
+                "coverage": match.coverage,
+                "missing_count": len(match.missing),
+                "missing": match.missing,
+            })
+
+        return Response({"results": results})
+
+    @action(methods=["GET"], detail=True)
+    def similar(self, request, pk=None):
+        """List the recipes most like this one by tags and ingredients"""
+
+        recipe = self.get_object()
+        neighbours = similar_recipes(
+            recipe, self.paginator.get_page_size(request)
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in neighbours]
+        )
+
+        return Response({"results": [
+            {
+                "recipe": self.get_serializer(recipes[recipe_id]).data,
+                "score": score,
+            }
+            for recipe_id, score in neighbours
+            if recipe_id in recipes
+        ]})
+
+    @action(methods=["GET"], detail=False)
+    def stats(self, request):
+        """Summarize the user's recipes from their running totals"""
+
+        return Response(user_stats(request.user))
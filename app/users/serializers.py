@@ -1,10 +1,12 @@
 from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import ugettext as _
 
+from core.timing import TimedSerializerMixin
+
 from rest_framework import serializers
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the User model"""
 
     class Meta:
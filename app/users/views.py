@@ -1,6 +1,7 @@
 from .serializers import UserSerializer, AuthTokenSerializer
+from core.authentication import CachedTokenAuthentication
 
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
@@ -20,7 +21,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
 
     serializer_class = UserSerializer
-    authentication_classes = authentication.TokenAuthentication,
+    authentication_classes = CachedTokenAuthentication,
     permission_classes = permissions.IsAuthenticated,
 
     def get_object(self):